@@ -0,0 +1,25 @@
+import time
+from typing import Any, Callable
+
+
+def time_per_call(
+    func: Callable[[], Any], number: int = 100, repeat: int = 5
+) -> float:
+    """
+    Time a function call
+
+    Args:
+        func: The function to time
+        number: The number of calls in each repeat
+        repeat: The number of repeats
+
+    Returns:
+        The best mean time per call in seconds across the repeats
+    """
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for _ in range(number):
+            func()
+        best = min(best, (time.perf_counter() - start) / number)
+    return best
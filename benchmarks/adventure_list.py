@@ -0,0 +1,63 @@
+# Set up Django before importing the models
+from .database import seed_adventures, test_database  # isort: split
+
+import argparse
+import time
+from typing import Callable, Dict
+
+from rest_framework.renderers import JSONRenderer
+from rest_framework.test import APIClient
+
+from core import models, serializers
+
+
+def list_all() -> bytes:
+    """Render the adventure list as it used to be, all full adventures"""
+    return JSONRenderer().render(
+        serializers.AdventureSerializer(
+            models.Adventure.objects.all(), many=True
+        ).data
+    )
+
+
+def measure(name: str, render: Callable[[], bytes], repeat: int):
+    """Print the size and best latency of a rendered response"""
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        content = render()
+        best = min(best, time.perf_counter() - start)
+    print(f"{name:<20} {len(content):>12} {best * 1e3:>10.1f}")
+
+
+def main():
+    """Compare the adventure list response size and latency"""
+    parser = argparse.ArgumentParser(description=main.__doc__)
+    parser.add_argument("--adventures", type=int, default=100_000)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    with test_database():
+        user = models.User.objects.create(
+            username="benchmark", is_whitelisted=True
+        )
+        seed_adventures(user, args.adventures)
+
+        client = APIClient()
+        client.force_authenticate(user)
+        cursor = client.get("/adventure/").data["next"]
+
+        renders: Dict[str, Callable[[], bytes]] = {
+            "unpaginated (old)": list_all,
+            "first page": lambda: client.get("/adventure/").content,
+            "next page": lambda: client.get(cursor).content,
+        }
+
+        print(f"{args.adventures} adventures")
+        print(f"{'response':<20} {'bytes':>12} {'ms':>10}")
+        for name, render in renders.items():
+            measure(name, render, args.repeat)
+
+
+if __name__ == "__main__":
+    main()
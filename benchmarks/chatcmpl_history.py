@@ -0,0 +1,93 @@
+# Set up Django before importing the models
+from .database import test_database  # isort: split
+
+import argparse
+import re
+from collections import Counter
+
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
+from config.convo import convo_config
+from core import models
+from core.couplers.convo import ConvoCoupler
+from engine import models as engine_models
+
+
+def build_chatcmpl(turn: int) -> engine_models.Chatcmpl:
+    """Build the API response of a turn"""
+    return engine_models.Chatcmpl.model_validate(
+        {
+            "id": f"chatcmpl-benchmark-{turn}",
+            "object": "chat.completion",
+            "created": 1696000000,
+            "model": "model",
+            "choices": [
+                {
+                    "index": 0,
+                    "message": {"role": "assistant", "content": "Response."},
+                    "finish_reason": "stop",
+                }
+            ],
+            "usage": {
+                "prompt_tokens": 100,
+                "completion_tokens": 20,
+                "total_tokens": 120,
+            },
+        }
+    )
+
+
+def main():
+    """
+    Measure the rows written per conversation turn
+
+    The history links are the rows the old `Chatcmpl.messages` through
+    table held for the same conversation, which are no longer written.
+    """
+    parser = argparse.ArgumentParser(description=main.__doc__)
+    parser.add_argument("--turns", type=int, default=200)
+    args = parser.parse_args()
+
+    with test_database():
+        user = models.User.objects.create(username="benchmark")
+        adventure = models.Adventure.objects.create(user=user)
+        coupler = ConvoCoupler(adventure)
+
+        with CaptureQueriesContext(connection) as context:
+            for turn in range(args.turns):
+                coupler.save_user_response(
+                    engine_models.Message(
+                        role=engine_models.Role.USER, content="Hello."
+                    )
+                )
+                coupler.save_api_response(build_chatcmpl(turn))
+
+        writes = Counter(
+            re.match(r"(INSERT|UPDATE|DELETE)", q["sql"]).group(1)
+            for q in context.captured_queries
+            if re.match(r"(INSERT|UPDATE|DELETE)", q["sql"])
+        )
+        rows = {
+            "message": models.Message.objects.count(),
+            "chatcmpl": models.Chatcmpl.objects.count(),
+            "choice": models.Choice.objects.count(),
+        }
+        links = sum(c.messages.count() for c in models.Chatcmpl.objects.all())
+
+    inserted = sum(rows.values())
+    print(
+        f"{args.turns} turns, history length {convo_config.history_length}"
+    )
+    for table, count in rows.items():
+        print(f"{table:<16} {count:>8} rows")
+    print(f"{'history links':<16} {links:>8} rows (old through table)")
+    print(f"write statements {dict(writes)}")
+    print(
+        f"rows inserted per turn: {inserted / args.turns:.1f},"
+        f" with the old through table {(inserted + links) / args.turns:.1f}"
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,93 @@
+import argparse
+import time
+from typing import List
+
+from data.scene.power_plant import scene as scene_data
+from engine import openai_api
+from engine.cassette import Cassette
+from engine.convo import Convo
+from engine.models import Message, Role
+from engine.scene import Scene
+from standalone.couplers.scene import SceneCoupler
+
+QUESTIONS: List[str] = [
+    "Where were you when the alarm went off?",
+    "Who else was in the control room?",
+    "What did you see on the reactor readings?",
+    "Why was the coolant valve left open?",
+    "Is there anything you have not told me?",
+]
+
+
+def run_session(npcs: int, turns: int) -> int:
+    """
+    Run a scripted scene session of the standalone flow
+
+    Args:
+        npcs: The number of NPCs to talk to
+        turns: The number of questions asked to each NPC
+
+    Returns:
+        The number of tokens used
+    """
+    scene_coupler = SceneCoupler()
+    scene = Scene(scene_coupler, scene_data)
+    scene.init_scene()
+
+    for turn in range(turns):
+        for index in range(npcs):
+            convo = Convo(scene_coupler.get_npc_user_flow(index))
+            convo.process_user_response(
+                Message(
+                    role=Role.USER, content=QUESTIONS[turn % len(QUESTIONS)]
+                )
+            )
+            convo.process_api_response()
+            convo.summarize()
+
+    return scene_coupler.token_used
+
+
+def count_calls() -> int:
+    """Count the API calls made through the deployment pool"""
+    return sum(stats.requests for stats in openai_api.get_deployment_stats())
+
+
+def main():
+    """Run a scripted scene session recorded to or replayed from a cassette"""
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--cassette", type=str, default="cassette.jsonl.gz")
+    parser.add_argument(
+        "--record",
+        action="store_true",
+        help="Call the API and record the responses to the cassette.",
+    )
+    parser.add_argument(
+        "--latency",
+        type=float,
+        default=0.0,
+        help="Simulated API latency in seconds when replaying.",
+    )
+    parser.add_argument("--npcs", type=int, default=len(scene_data.npcs))
+    parser.add_argument("--turns", type=int, default=len(QUESTIONS))
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    cassette = Cassette(
+        args.cassette, "record" if args.record else "replay", args.latency
+    )
+    openai_api.cassette = cassette
+
+    print(f"{'run':>4} {'seconds':>9} {'calls':>6} {'tokens':>7}")
+    for run in range(1 if args.record else args.repeat):
+        cassette.rewind()
+        calls = count_calls()
+        start = time.perf_counter()
+        tokens = run_session(args.npcs, args.turns)
+        seconds = time.perf_counter() - start
+        calls = count_calls() - calls
+        print(f"{run:>4} {seconds:>9.3f} {calls:>6} {tokens:>7}")
+
+
+if __name__ == "__main__":
+    main()
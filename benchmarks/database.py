@@ -0,0 +1,145 @@
+import os
+from contextlib import contextmanager
+from typing import Iterator, List
+
+import django
+
+os.environ.setdefault("DJANGO_SETTINGS_MODULE", "verbose_adventure.settings")
+django.setup()
+
+from django.db import connection  # noqa: E402
+from django.db.models import OuterRef, Subquery  # noqa: E402
+from django.test.utils import (  # noqa: E402
+    setup_test_environment,
+    teardown_test_environment,
+)
+from django.utils import timezone  # noqa: E402
+
+from core import enums, models  # noqa: E402
+
+BATCH_SIZE: int = 5000
+
+
+@contextmanager
+def test_database() -> Iterator[None]:
+    """
+    Use a fresh test database for the duration of a benchmark
+
+    The test database is created from the configured database the same way
+    as the Django test runner, and destroyed afterwards.
+    """
+    setup_test_environment()
+    old_name = connection.creation.create_test_db(verbosity=0)
+    try:
+        yield
+    finally:
+        connection.creation.destroy_test_db(old_name, verbosity=0)
+        teardown_test_environment()
+
+
+def seed_adventures(
+    user: models.User, count: int, messages: int = 1
+) -> List[models.Adventure]:
+    """
+    Seed adventures of a user with messages and a chat completion each
+
+    Args:
+        user: The user
+        count: The number of adventures
+        messages: The number of messages in each adventure
+
+    Returns:
+        The seeded adventures
+    """
+    seeded = []
+    for start in range(0, count, BATCH_SIZE):
+        size = min(BATCH_SIZE, count - start)
+        adventures = models.Adventure.objects.bulk_create(
+            [models.Adventure(user=user, iteration=1) for _ in range(size)]
+        )
+        models.Message.objects.bulk_create(
+            [
+                models.Message(
+                    adventure=adventure,
+                    role=enums.Role.ASSISTANT,
+                    content="You wake up in the reactor control room.",
+                )
+                for adventure in adventures
+                for _ in range(messages)
+            ]
+        )
+        models.Chatcmpl.objects.bulk_create(
+            [
+                models.Chatcmpl(
+                    id=f"chatcmpl-{adventure.id}",
+                    adventure=adventure,
+                    kind=enums.ChatcmplKind.MESSAGE,
+                    object_name="chat.completion",
+                    created_at=timezone.now(),
+                    model="model",
+                    completion_tokens=20,
+                    prompt_tokens=100,
+                )
+                for adventure in adventures
+            ]
+        )
+        seeded.extend(adventures)
+
+    models.Adventure.objects.filter(user=user).update(
+        latest_message=Subquery(
+            models.Message.objects.filter(adventure=OuterRef("pk"))
+            .order_by("-id")
+            .values("id")[:1]
+        )
+    )
+
+    return seeded
+
+
+def seed_scene_runners(
+    user: models.User, count: int, npcs: int = 3
+) -> List[models.SceneRunner]:
+    """
+    Seed scene runners of a user on a new scene with an adventure per NPC
+
+    Args:
+        user: The user
+        count: The number of scene runners
+        npcs: The number of NPCs in the scene
+
+    Returns:
+        The seeded scene runners
+    """
+    scene, _ = models.Scene.objects.get_or_create(
+        id="benchmark", defaults={"name": "Benchmark", "system_message": ""}
+    )
+    scene_npcs = [
+        models.SceneNpc.objects.get_or_create(
+            id=f"benchmark-{i}",
+            defaults={
+                "name": f"NPC {i}",
+                "title": "",
+                "character": "",
+                "scene": scene,
+                "index": i,
+            },
+        )[0]
+        for i in range(npcs)
+    ]
+
+    runners = models.SceneRunner.objects.bulk_create(
+        [models.SceneRunner(user=user, scene=scene) for _ in range(count)]
+    )
+    adventures = iter(seed_adventures(user, count * npcs))
+    models.SceneNpcAdventurePair.objects.bulk_create(
+        [
+            models.SceneNpcAdventurePair(
+                runner=runner, npc=npc, adventure=next(adventures)
+            )
+            for runner in runners
+            for npc in scene_npcs
+        ],
+        batch_size=BATCH_SIZE,
+    )
+
+    return runners
@@ -0,0 +1,134 @@
+from typing import Any, Callable, Dict, List, Tuple
+
+from pydantic import TypeAdapter
+
+from engine.models import (
+    REQUEST_DEFAULTS,
+    Chatcmpl,
+    ChatcmplRequest,
+    Message,
+    Role,
+)
+
+from . import time_per_call
+
+TARGET: Dict[str, Any] = {"deployment_id": "deployment", "model": "model"}
+
+
+def build_messages() -> List[Message]:
+    """Build the messages of a typical request"""
+    return [
+        Message(role=Role.SYSTEM, content="You are a DnD Dungeon Master."),
+        *[
+            Message(
+                role=Role.USER if i % 2 == 0 else Role.ASSISTANT,
+                content=f"Message {i} of the conversation history.",
+            )
+            for i in range(5)
+        ],
+    ]
+
+
+def build_response() -> Dict[str, Any]:
+    """Build the response of a typical request"""
+    return {
+        "id": "chatcmpl-benchmark",
+        "object": "chat.completion",
+        "created": 1696000000,
+        "model": "model",
+        "choices": [
+            {
+                "index": 0,
+                "message": {"role": "assistant", "content": "Response."},
+                "finish_reason": "stop",
+            }
+        ],
+        "usage": {
+            "prompt_tokens": 100,
+            "completion_tokens": 20,
+            "total_tokens": 120,
+        },
+    }
+
+
+def main():
+    """
+    Compare the candidate model paths to build, serialize and parse requests
+
+    The first candidate of each case is the one used by the engine.
+    """
+    messages = build_messages()
+    response = build_response()
+    stored = [(Role.USER, "Stored message.", None)] * 5
+    messages_adapter = TypeAdapter(List[Message])
+    chatcmpl_adapter = TypeAdapter(Chatcmpl)
+
+    cases: List[Tuple[str, List[Tuple[str, Callable[[], Any]]]]] = [
+        (
+            "build request",
+            [
+                (
+                    "static dict merge",
+                    lambda: TARGET
+                    | REQUEST_DEFAULTS
+                    | {"messages": [m.model_dump() for m in messages]},
+                ),
+                (
+                    "ChatcmplRequest",
+                    lambda: ChatcmplRequest(
+                        **TARGET, messages=[m.model_dump() for m in messages]
+                    ).model_dump(),
+                ),
+            ],
+        ),
+        (
+            "serialize messages",
+            [
+                ("model_dump", lambda: [m.model_dump() for m in messages]),
+                (
+                    "TypeAdapter",
+                    lambda: messages_adapter.dump_python(messages),
+                ),
+            ],
+        ),
+        (
+            "parse response",
+            [
+                ("model_validate", lambda: Chatcmpl.model_validate(response)),
+                ("kwargs", lambda: Chatcmpl(**response)),
+                (
+                    "TypeAdapter",
+                    lambda: chatcmpl_adapter.validate_python(response),
+                ),
+            ],
+        ),
+        (
+            "stored messages",
+            [
+                (
+                    "validate",
+                    lambda: [
+                        Message(role=r, content=c, name=n)
+                        for r, c, n in stored
+                    ],
+                ),
+                (
+                    "model_construct",
+                    lambda: [
+                        Message.model_construct(role=r, content=c, name=n)
+                        for r, c, n in stored
+                    ],
+                ),
+            ],
+        ),
+    ]
+
+    print(f"{'case':<20} {'candidate':<20} {'us/call':>8}")
+    for case, candidates in cases:
+        for candidate, func in candidates:
+            seconds = time_per_call(func, number=2000)
+            print(f"{case:<20} {candidate:<20} {seconds * 1e6:>8.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,285 @@
+# Set up Django before importing the models
+from .database import (  # isort: split
+    seed_adventures,
+    seed_scene_runners,
+    test_database,
+)
+
+import argparse
+import sys
+from io import StringIO
+from typing import Any, Dict, List, NamedTuple, Optional
+
+import openai
+from django.core.management import call_command
+from django.urls import URLPattern, URLResolver, reverse
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.tokens import AccessToken
+
+import core.urls
+from config.query_budget import query_budget_config
+from config.quota import quota_config
+from core import models
+from core.query_budget import (
+    check_query_budget,
+    count_queries,
+    fingerprint,
+    get_query_budget,
+)
+from data.scene.power_plant import scene as scene_data
+
+from .suite import stub_chat_completion
+
+
+class BudgetRequest(NamedTuple):
+    """A request to a URL of `core.urls` checked against its budget"""
+
+    name: str
+    method: str
+    kwargs: Dict[str, Any] = {}
+    data: Optional[Dict[str, Any]] = None
+
+
+def get_url_patterns(patterns: List[Any]) -> Dict[str, URLPattern]:
+    """
+    Get the named URL patterns, including the included ones
+
+    Args:
+        patterns: The URL patterns and resolvers
+
+    Returns:
+        The URL patterns by name
+    """
+    named = {}
+    for pattern in patterns:
+        if isinstance(pattern, URLResolver):
+            named |= get_url_patterns(pattern.url_patterns)
+        elif pattern.name is not None:
+            named[pattern.name] = pattern
+    return named
+
+
+def get_requests(
+    user: models.User, other: models.User, scene: models.Scene
+) -> List[BudgetRequest]:
+    """
+    Seed the conversations and get the requests covering `core.urls`
+
+    The requests are made in order, so the deletions are last.
+
+    Args:
+        user: The user making the requests
+        other: The user managed by the user
+        scene: The scene to run
+
+    Returns:
+        The requests
+    """
+    client = get_client(user)
+
+    adventure_id = client.post("/adventure/", {}, format="json").data["id"]
+    client.post(f"/convo/start/{adventure_id}/", format="json")
+    for i in range(5):
+        client.post(
+            f"/convo/respond/{adventure_id}/",
+            {"user_response": f"I look around the room for clue {i}."},
+            format="json",
+        )
+    adventure = models.Adventure.objects.get(id=adventure_id)
+    adventure.summary = models.Summary.objects.create(
+        summary="You woke up in the control room.",
+        message_id=adventure.latest_message_id,
+    )
+    adventure.save()
+
+    new_adventure = models.Adventure.objects.create(user=user)
+    runner_id = client.post(
+        f"/scene-runner/create/{scene.id}/", format="json"
+    ).data["id"]
+    npc_id = scene_data.npcs[0].id
+
+    return [
+        BudgetRequest("user-list", "get"),
+        BudgetRequest(
+            "user-list",
+            "post",
+            data={"username": "budget-new", "password": "password"},
+        ),
+        BudgetRequest("user-detail", "get", {"pk": other.id}),
+        BudgetRequest(
+            "user-detail", "patch", {"pk": other.id}, {"first_name": "Other"}
+        ),
+        BudgetRequest("adventure-list", "get"),
+        BudgetRequest("adventure-list", "post", data={}),
+        BudgetRequest("adventure-detail", "get", {"pk": adventure_id}),
+        BudgetRequest(
+            "adventure-detail",
+            "patch",
+            {"pk": adventure_id},
+            {"start_message": "You wake up."},
+        ),
+        BudgetRequest("scene-list", "get"),
+        BudgetRequest("scene-detail", "get", {"pk": scene.id}),
+        BudgetRequest("whitelist", "post", data={"username": other.username}),
+        BudgetRequest(
+            "unwhitelist", "post", data={"username": other.username}
+        ),
+        BudgetRequest("user-me", "get"),
+        BudgetRequest("user-details", "get", {"id": user.id}),
+        BudgetRequest("user-quota", "get", {"id": other.id}),
+        BudgetRequest(
+            "user-quota", "patch", {"id": other.id}, {"tokens_per_day": 1000}
+        ),
+        BudgetRequest("convo-start", "post", {"id": new_adventure.id}),
+        BudgetRequest(
+            "convo-respond",
+            "post",
+            {"id": adventure_id},
+            {"user_response": "I ask the operator what happened."},
+        ),
+        BudgetRequest("convo-history", "get", {"id": adventure_id}),
+        BudgetRequest("convo-summary", "get", {"id": adventure_id}),
+        BudgetRequest("convo-token-count", "get", {"id": adventure_id}),
+        BudgetRequest("convo-total-token-count", "get"),
+        BudgetRequest("scene-runner-scene", "get", {"id": runner_id}),
+        BudgetRequest("scene-runner-create", "post", {"scene_id": scene.id}),
+        BudgetRequest(
+            "scene-runner-respond",
+            "post",
+            {"runner_id": runner_id, "npc_id": npc_id},
+            {"user_response": "Where were you when the alarm went off?"},
+        ),
+        BudgetRequest(
+            "scene-runner-broadcast",
+            "post",
+            {"runner_id": runner_id},
+            {
+                "user_response": "Who else was in the control room?",
+                "npcs": [npc_id],
+            },
+        ),
+        BudgetRequest("ping", "get"),
+        BudgetRequest("deployment-stats", "get"),
+        BudgetRequest("export", "get"),
+        BudgetRequest("summary-policy-stats", "get"),
+        BudgetRequest("single-flight-stats", "get"),
+        BudgetRequest("user-detail", "delete", {"pk": other.id}),
+    ]
+
+
+def get_client(user: models.User) -> APIClient:
+    """Get a client authenticated by a token, as the API is used"""
+    client = APIClient()
+    client.credentials(
+        HTTP_AUTHORIZATION=f"Bearer {AccessToken.for_user(user)}"
+    )
+    return client
+
+
+def check(
+    client: APIClient,
+    request: BudgetRequest,
+    pattern: URLPattern,
+    verbose: bool,
+) -> bool:
+    """
+    Make a request and check its queries against the budget of its view
+
+    Args:
+        client: The client
+        request: The request
+        pattern: The URL pattern of the request
+        verbose: Print the query fingerprints of all requests
+
+    Returns:
+        True if the request succeeded within the budget, False otherwise
+    """
+    path = reverse(request.name, kwargs=request.kwargs)
+    with count_queries() as counter:
+        response = getattr(client, request.method)(
+            path, request.data, format="json"
+        )
+        # The streaming responses query as they are consumed
+        if getattr(response, "streaming", False):
+            b"".join(response.streaming_content)
+
+    budget = get_query_budget(pattern.callback)
+    report = (
+        check_query_budget(budget, counter.queries)
+        if budget is not None
+        else None
+    )
+    passed = (
+        budget is not None and report is None and response.status_code < 400
+    )
+
+    print(
+        f"{request.name:<26} {request.method:<7} {response.status_code:>6}"
+        f" {len(counter.queries):>8} {str(budget):>7}"
+        f" {'ok' if passed else 'FAIL':>6}"
+    )
+    if report is not None:
+        print(report)
+    elif verbose:
+        for sql in counter.queries:
+            print(f"  {fingerprint(sql)}")
+
+    return passed
+
+
+def main():
+    """Check the query budgets of the views of every URL in `core.urls`"""
+    parser = argparse.ArgumentParser(description=main.__doc__)
+    parser.add_argument(
+        "--adventures",
+        type=int,
+        default=10,
+        help="Seeded adventures and scene runners, to expose N+1 queries.",
+    )
+    parser.add_argument("--verbose", action="store_true")
+    args = parser.parse_args()
+
+    openai.ChatCompletion.create = stub_chat_completion
+    # The queries are checked here instead of by the middleware
+    query_budget_config.enabled = False
+    # The turns are taken faster than the quotas allow
+    quota_config.requests_per_minute = 0
+    quota_config.tokens_per_day = 0
+
+    patterns = get_url_patterns(core.urls.urlpatterns)
+
+    with test_database():
+        user = models.User.objects.create(
+            username="budget",
+            is_whitelisted=True,
+            is_staff=True,
+            is_superuser=True,
+        )
+        other = models.User.objects.create(username="budget-other")
+        call_command("load_data", stdout=StringIO())
+        seed_adventures(user, args.adventures, messages=3)
+        seed_scene_runners(user, args.adventures)
+        scene = models.Scene.objects.get(id=scene_data.id)
+
+        requests = get_requests(user, other, scene)
+        client = get_client(user)
+
+        print(
+            f"{'url':<26} {'method':<7} {'status':>6} {'queries':>8}"
+            f" {'budget':>7} {'result':>6}"
+        )
+        passed = [
+            check(client, request, patterns[request.name], args.verbose)
+            for request in requests
+        ]
+
+    uncovered = sorted(set(patterns) - {r.name for r in requests})
+    if uncovered:
+        print(f"Not covered: {', '.join(uncovered)}")
+
+    if uncovered or not all(passed):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
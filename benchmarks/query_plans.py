@@ -0,0 +1,175 @@
+# Set up Django before importing the models
+from .database import (  # isort: split
+    seed_adventures,
+    seed_scene_runners,
+    test_database,
+)
+
+import argparse
+import re
+import sys
+from typing import Callable, Dict, List
+
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APIClient
+
+from core import models
+from core.couplers.scene import SceneCoupler
+
+LARGE_TABLES: List[str] = [
+    "core_adventure",
+    "core_message",
+    "core_chatcmpl",
+    "core_scenenpcadventurepair",
+]
+
+# Totals over all adventures read the whole table
+FULL_SCANS_ALLOWED: Dict[str, List[str]] = {
+    "convo total token count": ["core_chatcmpl"],
+}
+
+FULL_SCAN_PATTERNS: Dict[str, str] = {
+    "postgresql": r"Seq Scan on (\w+)",
+    "sqlite": r"\bSCAN (\w+)$",
+}
+
+
+def explain(sql: str) -> str:
+    """
+    Get the query plan of a SQL query
+
+    Args:
+        sql: The SQL query with its parameters interpolated
+
+    Returns:
+        The query plan text
+    """
+    with connection.cursor() as cursor:
+        cursor.execute(f"{connection.ops.explain_query_prefix()} {sql}")
+        return "\n".join(str(row[-1]) for row in cursor.fetchall())
+
+
+def get_full_scans(plan: str, allowed: List[str]) -> List[str]:
+    """
+    Get the large tables fully scanned in a query plan
+
+    Args:
+        plan: The query plan text
+        allowed: The tables allowed to be fully scanned
+
+    Returns:
+        The fully scanned large tables not allowed
+    """
+    pattern = FULL_SCAN_PATTERNS[connection.vendor]
+    return [
+        table
+        for table in re.findall(pattern, plan, re.MULTILINE)
+        if table in LARGE_TABLES and table not in allowed
+    ]
+
+
+def check(name: str, run: Callable[[], object], verbose: bool) -> bool:
+    """
+    Run a code path and check the query plans of its queries
+
+    Args:
+        name: The name of the code path
+        run: The function running the code path
+        verbose: Print the plans of all queries
+
+    Returns:
+        True if no large table is fully scanned, False otherwise
+    """
+    with CaptureQueriesContext(connection) as context:
+        run()
+
+    # Queries differing only by literals share a plan
+    queries = {
+        re.sub(r"\d+", "0", q["sql"]): q["sql"]
+        for q in context.captured_queries
+    }
+
+    passed = True
+    for sql in queries.values():
+        plan = explain(sql)
+        scans = get_full_scans(plan, FULL_SCANS_ALLOWED.get(name, []))
+        if scans or verbose:
+            print(f"[{name}] {sql}\n{plan}\n")
+        if scans:
+            print(f"[{name}] FAIL: full scan on {', '.join(scans)}\n")
+            passed = False
+
+    print(f"{name:<28} {len(queries):>8} {'ok' if passed else 'FAIL':>6}")
+    return passed
+
+
+def main():
+    """Check the query plans of the hot code paths on seeded tables"""
+    parser = argparse.ArgumentParser(description=main.__doc__)
+    parser.add_argument("--users", type=int, default=50)
+    parser.add_argument("--adventures", type=int, default=200)
+    parser.add_argument("--scene-runners", type=int, default=50)
+    parser.add_argument("--messages", type=int, default=10)
+    parser.add_argument("--verbose", action="store_true")
+    args = parser.parse_args()
+
+    if connection.vendor not in FULL_SCAN_PATTERNS:
+        sys.exit(f"Query plans of {connection.vendor} are not supported")
+
+    with test_database():
+        users = [
+            models.User.objects.create(
+                username=f"benchmark-{i}",
+                is_whitelisted=True,
+                is_staff=True,
+            )
+            for i in range(args.users)
+        ]
+        for user in users:
+            seed_adventures(user, args.adventures, args.messages)
+            seed_scene_runners(user, args.scene_runners)
+
+        with connection.cursor() as cursor:
+            cursor.execute("ANALYZE")
+
+        user = users[0]
+        adventure = models.Adventure.objects.filter(user=user).last()
+        runner = models.SceneRunner.objects.filter(user=user).last()
+
+        client = APIClient()
+        client.force_authenticate(user)
+
+        paths: Dict[str, Callable[[], object]] = {
+            "adventure list": lambda: client.get("/adventure/"),
+            "user details": lambda: client.get(
+                f"/user-utils/details/{user.id}/"
+            ),
+            "convo history": lambda: client.get(
+                f"/convo/history/{adventure.id}/"
+            ),
+            "convo token count": lambda: client.get(
+                f"/convo/token-count/{adventure.id}/"
+            ),
+            "convo total token count": lambda: client.get(
+                "/convo/token-count/"
+            ),
+            "unsummarized messages": lambda: (
+                models.Message.objects.get_unsummarized_messages(adventure, 20)
+            ),
+            "npc user flow": lambda: SceneCoupler(runner).get_npc_user_flow(
+                1
+            ),
+        }
+
+        print(f"{'code path':<28} {'queries':>8} {'plan':>6}")
+        passed = [
+            check(name, run, args.verbose) for name, run in paths.items()
+        ]
+
+    if not all(passed):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
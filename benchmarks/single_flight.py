@@ -0,0 +1,142 @@
+# Set up Django for the cache sharing the flights
+from . import database  # noqa: F401  # isort: split
+
+import argparse
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, List
+
+import openai
+
+from core.single_flight import CacheFlightStore
+from data.scene.power_plant import scene as scene_data
+from engine import models as engine_models
+from engine import openai_api
+from engine.knowledge import KnowledgeSchema
+from engine.single_flight import SingleFlight
+
+from .suite import stub_chat_completion
+
+calls: List[float] = []
+
+
+def get_slow_stub(latency: float):
+    """Get a stub of the API answering after a latency"""
+
+    def create(**request: Any) -> Dict[str, Any]:
+        calls.append(time.perf_counter())
+        time.sleep(latency)
+        return stub_chat_completion(**request)
+
+    return create
+
+
+def select_knowledge(coalesce: bool) -> str:
+    """
+    Select the knowledge of an NPC for the same question
+
+    Args:
+        coalesce: Share the call of an identical selection in flight
+
+    Returns:
+        The ID of the chat completion
+    """
+    schema = KnowledgeSchema(scene_data.npcs[0].knowledges)
+    return openai_api.call_api_function(
+        [
+            engine_models.Message(
+                role=engine_models.Role.USER,
+                content="Where were you when the alarm went off?",
+            )
+        ],
+        schema.function_dump,
+        coalesce=coalesce,
+    ).id
+
+
+def run_concurrently(call: Callable[[int], Any], workers: int) -> List[Any]:
+    """
+    Run a call in concurrent workers
+
+    Args:
+        call: The call, given the index of the worker
+        workers: The number of workers
+
+    Returns:
+        The results of the workers
+    """
+    with ThreadPoolExecutor(workers) as executor:
+        return list(executor.map(call, range(workers)))
+
+
+def report(name: str, workers: int, expected_calls: int) -> bool:
+    """
+    Print the API calls of a scenario and check them
+
+    Args:
+        name: The name of the scenario
+        workers: The number of workers making the identical call
+        expected_calls: The number of API calls expected
+
+    Returns:
+        True if the API calls are as expected, False otherwise
+    """
+    passed = len(calls) == expected_calls
+    print(
+        f"{name}: {workers} calls, {len(calls)} API calls"
+        f" {'ok' if passed else 'FAIL'}"
+    )
+    return passed
+
+
+def main():
+    """Check identical concurrent API calls share one upstream call"""
+    parser = argparse.ArgumentParser(description=main.__doc__)
+    parser.add_argument("--workers", type=int, default=8)
+    parser.add_argument(
+        "--latency",
+        type=float,
+        default=0.2,
+        help="Simulated API latency in seconds.",
+    )
+    args = parser.parse_args()
+
+    stub = get_slow_stub(args.latency)
+    openai.ChatCompletion.create = stub
+    passed = []
+
+    calls.clear()
+    ids = run_concurrently(lambda i: select_knowledge(True), args.workers)
+    passed.append(report("coalesced", args.workers, 1))
+    # The chat completions are saved by their IDs
+    if len(set(ids)) != len(ids):
+        print(f"  shared IDs are not unique: {ids}")
+        passed.append(False)
+
+    calls.clear()
+    run_concurrently(lambda i: select_knowledge(False), args.workers)
+    passed.append(report("not coalesced", args.workers, args.workers))
+
+    # Two single-flights sharing a store stand in for two processes
+    store = CacheFlightStore(args.latency * 10, args.latency / 20)
+    processes = [SingleFlight(store), SingleFlight(store)]
+    calls.clear()
+    run_concurrently(
+        lambda i: processes[i % 2].do(
+            "benchmark", lambda: stub(model="benchmark")
+        ),
+        args.workers,
+    )
+    passed.append(report("coalesced across processes", args.workers, 1))
+
+    for process in processes:
+        print(f"  {process.stats()}")
+    print(f"  {openai_api.get_single_flight_stats()}")
+
+    if not all(passed):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,420 @@
+# Set up Django before importing the models
+from .database import test_database  # isort: split
+
+import argparse
+import itertools
+import json
+import os
+import statistics
+import sys
+import time
+from io import StringIO
+from typing import Any, Callable, Dict, List, Optional
+
+import openai
+from django.core.management import call_command
+from django.db import connection
+from django.db.models import Subquery
+from django.http import JsonResponse
+from django.test import RequestFactory
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APIClient
+
+from config.adventure import adventure_config
+from config.convo import convo_config
+from config.quota import quota_config
+from core import models, serializers
+from core.couplers.convo import ConvoCoupler
+from core.middlewares import RequestLogMiddleware
+from data.scene.power_plant import scene as scene_data
+from engine import models as engine_models
+
+BASELINE_DIRECTORY: str = os.path.join(os.path.dirname(__file__), "baselines")
+HISTORY_TURNS: int = 20
+
+Result = Dict[str, float]
+
+ids = itertools.count()
+
+
+def stub_chat_completion(**request: Any) -> Dict[str, Any]:
+    """Return a canned chat completion instead of calling the API"""
+    if request.get("functions"):
+        function = request["functions"][0]
+        message = {
+            "role": "assistant",
+            "content": None,
+            "function_call": {
+                "name": function["name"],
+                "arguments": json.dumps(
+                    {k: True for k in function["parameters"]["properties"]}
+                ),
+            },
+        }
+    else:
+        message = {
+            "role": "assistant",
+            "content": (
+                "The control room lights flicker as the alarm keeps ringing."
+            ),
+        }
+
+    return build_chatcmpl_dict(message)
+
+
+def build_chatcmpl_dict(message: Dict[str, Any]) -> Dict[str, Any]:
+    """Build a chat completion response with a unique ID"""
+    return {
+        "id": f"chatcmpl-suite-{next(ids)}",
+        "object": "chat.completion",
+        "created": 1696000000,
+        "model": "model",
+        "choices": [{"index": 0, "message": message, "finish_reason": "stop"}],
+        "usage": {
+            "prompt_tokens": 100,
+            "completion_tokens": 20,
+            "total_tokens": 120,
+        },
+    }
+
+
+def build_chatcmpl() -> engine_models.Chatcmpl:
+    """Build an engine chat completion with a unique ID"""
+    return engine_models.Chatcmpl.model_validate(
+        build_chatcmpl_dict({"role": "assistant", "content": "Response."})
+    )
+
+
+def measure(run: Callable[[], object], iterations: int, warmup: int) -> Result:
+    """
+    Measure the latency and the database queries of a code path
+
+    Args:
+        run: The function running the code path
+        iterations: The number of measured calls
+        warmup: The number of calls before measuring
+
+    Returns:
+        The latency statistics in milliseconds and the queries per call
+    """
+    for _ in range(warmup):
+        run()
+
+    seconds = []
+    with CaptureQueriesContext(connection) as context:
+        for _ in range(iterations):
+            start = time.perf_counter()
+            run()
+            seconds.append(time.perf_counter() - start)
+
+    milliseconds = sorted(s * 1e3 for s in seconds)
+    p95 = milliseconds[min(iterations - 1, iterations * 95 // 100)]
+    return {
+        "min_ms": round(milliseconds[0], 4),
+        "median_ms": round(statistics.median(milliseconds), 4),
+        "p95_ms": round(p95, 4),
+        "queries": round(len(context.captured_queries) / iterations, 2),
+    }
+
+
+def get_cases(user: models.User) -> Dict[str, Callable[[], object]]:
+    """
+    Seed the database and get the code paths to measure
+
+    Args:
+        user: The user running the code paths
+
+    Returns:
+        The functions running the code paths by name
+    """
+    client = APIClient()
+    client.force_authenticate(user)
+
+    call_command("load_data", stdout=StringIO())
+    scene = models.Scene.objects.get(id=scene_data.id)
+
+    adventure_id = client.post("/adventure/", {}, format="json").data["id"]
+    client.post(f"/convo/start/{adventure_id}/", format="json")
+    for i in range(HISTORY_TURNS):
+        client.post(
+            f"/convo/respond/{adventure_id}/",
+            {"user_response": f"I look around the room for clue {i}."},
+            format="json",
+        )
+
+    def get_adventure() -> models.Adventure:
+        return models.Adventure.objects.get(id=adventure_id)
+
+    def create_chatcmpl() -> models.Chatcmpl:
+        adventure = get_adventure()
+        chatcmpl = models.Chatcmpl.objects.create_from_engine_chatcmpl(
+            adventure,
+            adventure.summary,
+            models.Message.objects.get_latest_n_messages(
+                adventure, convo_config.history_length
+            ),
+            build_chatcmpl(),
+            is_summary=False,
+            choice_index=adventure_config.default_choice_index,
+        )
+        # The next message links to the latest one, which must be unique
+        models.Adventure.objects.filter(id=adventure_id).update(
+            latest_message=Subquery(
+                models.Message.objects.filter(adventure_id=adventure_id)
+                .order_by("-id")
+                .values("id")[:1]
+            )
+        )
+        return chatcmpl
+
+    middleware = RequestLogMiddleware(lambda request: JsonResponse({}))
+    factory = RequestFactory()
+
+    def log_request() -> object:
+        request = factory.post(
+            f"/convo/respond/{adventure_id}/",
+            {"user_response": "I open the door."},
+            content_type="application/json",
+        )
+        request.user = user
+        return middleware(request)
+
+    return {
+        "get_latest_n_messages": lambda: (
+            models.Message.objects.get_latest_n_messages(
+                get_adventure(), convo_config.history_length
+            )
+        ),
+        "ConvoCoupler.get_built_messages": lambda: ConvoCoupler(
+            get_adventure()
+        ).get_built_messages(convo_config.history_length),
+        "ConvoCoupler.save_api_response": lambda: ConvoCoupler(
+            get_adventure()
+        ).save_api_response(build_chatcmpl()),
+        "create_from_engine_chatcmpl": create_chatcmpl,
+        "SceneRunner creation": lambda: client.post(
+            f"/scene-runner/create/{scene.id}/", format="json"
+        ),
+        "SceneSerializer": lambda: serializers.SceneSerializer(
+            models.Scene.objects.with_npcs().get(pk=scene.pk)
+        ).data,
+        "RequestLogMiddleware": log_request,
+        "convo/respond": lambda: client.post(
+            f"/convo/respond/{adventure_id}/",
+            {"user_response": "I ask the operator what happened."},
+            format="json",
+        ),
+    }
+
+
+def run_suite(
+    names: List[str],
+    iterations: int,
+    warmup: int,
+    remeasure: Optional[Callable[[Dict[str, Result]], List[str]]] = None,
+) -> Dict[str, Result]:
+    """
+    Run the benchmark suite on a test database with a stubbed API
+
+    Other processes may slow down a whole run, so the code paths picked by
+    `remeasure` from the results are measured once more.
+
+    Args:
+        names: The names of the code paths to measure, all if empty
+        iterations: The number of measured calls of each code path
+        warmup: The number of calls of each code path before measuring
+        remeasure: The function picking the code paths to measure again
+
+    Returns:
+        The results by code path name
+    """
+    openai.ChatCompletion.create = stub_chat_completion
+    # The code paths are called faster than the quotas allow
+    quota_config.requests_per_minute = 0
+    quota_config.tokens_per_day = 0
+    # The opening pool refills in a background thread, writing to the
+    # database while the code paths are measured
+    adventure_config.opening_pool_size = 0
+
+    results = {}
+    with test_database():
+        user = models.User.objects.create(
+            username="benchmark", is_whitelisted=True, is_staff=True
+        )
+        cases = get_cases(user)
+
+        for name, run in cases.items():
+            if names and name not in names:
+                continue
+            results[name] = measure(run, iterations, warmup)
+
+        again = remeasure(results) if remeasure is not None else []
+        if again:
+            print(f"Measuring again: {', '.join(again)}")
+        for name in again:
+            results[name] = measure(cases[name], iterations, warmup)
+
+    return results
+
+
+def is_regressed(
+    result: Result, base: Result, tolerance: float, min_ms: float
+) -> bool:
+    """
+    Return if a code path regressed compared to its baseline
+
+    Args:
+        result: The result of the code path
+        base: The baseline result of the code path
+        tolerance: The allowed relative growth of the minimum latency
+        min_ms: The smallest minimum latency growth flagged, in milliseconds
+
+    Returns:
+        True if the code path regressed, False otherwise
+    """
+    change = result["min_ms"] / base["min_ms"] - 1
+    return result["queries"] > base["queries"] or (
+        change > tolerance and result["min_ms"] - base["min_ms"] > min_ms
+    )
+
+
+def compare(
+    results: Dict[str, Result],
+    baseline: Dict[str, Result],
+    tolerance: float,
+    min_ms: float,
+) -> List[str]:
+    """
+    Compare results to a baseline
+
+    A code path regresses if it makes more queries per call, or if its
+    minimum latency grows by more than the tolerance and `min_ms`. The
+    minimum is compared as it is the least affected by noise.
+
+    Args:
+        results: The results
+        baseline: The baseline results
+        tolerance: The allowed relative growth of the minimum latency
+        min_ms: The smallest minimum latency growth flagged, in milliseconds
+
+    Returns:
+        The names of the regressed code paths
+    """
+    print(
+        f"{'code path':<34} {'base ms':>9} {'ms':>9} {'change':>8}"
+        f" {'base q':>7} {'q':>7}"
+    )
+
+    regressions = []
+    for name, result in results.items():
+        base = baseline.get(name)
+        if base is None:
+            print(f"{name:<34} {'(new)':>9} {result['min_ms']:>9.3f}")
+            continue
+
+        change = result["min_ms"] / base["min_ms"] - 1
+        regressed = is_regressed(result, base, tolerance, min_ms)
+        if regressed:
+            regressions.append(name)
+
+        print(
+            f"{name:<34} {base['min_ms']:>9.3f}"
+            f" {result['min_ms']:>9.3f} {change:>+8.0%}"
+            f" {base['queries']:>7} {result['queries']:>7}"
+            + ("  REGRESSION" if regressed else "")
+        )
+
+    return regressions
+
+
+def print_results(results: Dict[str, Result]):
+    """Print the results as a table"""
+    print(
+        f"{'code path':<34} {'min ms':>9} {'median ms':>10} {'p95 ms':>9}"
+        f" {'queries':>8}"
+    )
+    for name, result in results.items():
+        print(
+            f"{name:<34} {result['min_ms']:>9.3f}"
+            f" {result['median_ms']:>10.3f} {result['p95_ms']:>9.3f}"
+            f" {result['queries']:>8}"
+        )
+
+
+def main():
+    """Run the benchmark suite of the request hot paths"""
+    parser = argparse.ArgumentParser(description=main.__doc__)
+    parser.add_argument(
+        "command",
+        choices=["run", "compare"],
+        help="Run the suite, or run it and compare it to the baseline.",
+    )
+    parser.add_argument(
+        "--cases", nargs="+", default=[], help="Only run these code paths."
+    )
+    parser.add_argument("--iterations", type=int, default=50)
+    parser.add_argument("--warmup", type=int, default=3)
+    parser.add_argument(
+        "--baseline",
+        type=str,
+        default=os.path.join(BASELINE_DIRECTORY, f"{connection.vendor}.json"),
+    )
+    parser.add_argument(
+        "--save",
+        action="store_true",
+        help="Save the results as the baseline.",
+    )
+    parser.add_argument(
+        "--results",
+        type=str,
+        default=None,
+        help="Compare these saved results instead of running the suite.",
+    )
+    parser.add_argument("--output", type=str, default=None)
+    # Whole runs on a shared machine vary by up to half in latency, while
+    # the queries per call catch the N+1 regressions exactly
+    parser.add_argument("--tolerance", type=float, default=0.6)
+    parser.add_argument("--min-ms", type=float, default=0.25)
+    args = parser.parse_args()
+
+    remeasure = None
+    if args.command == "compare":
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+
+        def remeasure(results: Dict[str, Result]) -> List[str]:
+            return [
+                name
+                for name, result in results.items()
+                if name in baseline
+                and is_regressed(
+                    result, baseline[name], args.tolerance, args.min_ms
+                )
+            ]
+
+    if args.results is not None:
+        with open(args.results) as f:
+            results = json.load(f)
+    else:
+        results = run_suite(
+            args.cases, args.iterations, args.warmup, remeasure
+        )
+
+    if args.command == "run":
+        print_results(results)
+    else:
+        regressions = compare(results, baseline, args.tolerance, args.min_ms)
+        if regressions:
+            print(f"Regressed: {', '.join(regressions)}")
+            sys.exit(1)
+
+    for path in [args.output, args.baseline if args.save else None]:
+        if path is not None:
+            os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+            with open(path, "w") as f:
+                json.dump(results, f, indent=4)
+                f.write("\n")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,62 @@
+from typing import Callable, Dict, List
+
+from engine.models import Message, Role
+from engine.transcript import encode_transcript, estimate_tokens
+
+from . import time_per_call
+
+HISTORY_LENGTHS: List[int] = [5, 50, 500]
+
+
+def build_history(length: int) -> List[Message]:
+    """Build a conversation history of the given length"""
+    return [
+        Message(
+            role=Role.USER if i % 2 == 0 else Role.ASSISTANT,
+            content=(
+                f"Message {i}: I walk into the reactor control room and ask"
+                " Maya what she remembers about the morning of the accident."
+            ),
+        )
+        for i in range(length)
+    ]
+
+
+def encode_repr(messages: List[Message]) -> str:
+    """Encode messages as the summary prompt used to, the repr of models"""
+    return f"{messages}"
+
+
+def encode_dump_repr(messages: List[Message]) -> str:
+    """Encode messages as the knowledge prompt used to, the repr of dicts"""
+    return f"{[m.model_dump() for m in messages]}"
+
+
+ENCODERS: Dict[str, Callable[[List[Message]], str]] = {
+    "repr (old summary)": encode_repr,
+    "dump repr (old knowledge)": encode_dump_repr,
+    "transcript": encode_transcript,
+}
+
+
+def main():
+    """Compare the prompt size and build time of history encoders"""
+    print(
+        f"{'history':>8} {'encoder':<26} {'chars':>8} {'~tokens':>8}"
+        f" {'us/call':>9}"
+    )
+    for length in HISTORY_LENGTHS:
+        history = build_history(length)
+        for name, encoder in ENCODERS.items():
+            text = encoder(history)
+            seconds = time_per_call(
+                lambda: encoder(history), number=max(1, 2000 // length)
+            )
+            print(
+                f"{length:>8} {name:<26} {len(text):>8}"
+                f" {estimate_tokens(text):>8} {seconds * 1e6:>9.1f}"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,182 @@
+# Set up Django before importing the models
+from .database import test_database  # isort: split
+
+import argparse
+import os
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List
+
+import openai
+from django.db import connection
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.tokens import AccessToken
+
+from config.adventure import adventure_config
+from core import models
+
+from .suite import stub_chat_completion
+
+calls: List[float] = []
+
+
+def get_slow_stub(latency: float):
+    """Get a stub of the API answering after a latency"""
+
+    def create(**request: Any) -> Dict[str, Any]:
+        calls.append(time.perf_counter())
+        time.sleep(latency)
+        return stub_chat_completion(**request)
+
+    return create
+
+
+def respond(user: models.User, adventure_id: int, content: str) -> int:
+    """
+    Respond to an adventure in a thread of its own
+
+    Args:
+        user: The user
+        adventure_id: The ID of the adventure
+        content: The user response
+
+    Returns:
+        The status code of the response
+    """
+    client = APIClient(raise_request_exception=False)
+    client.credentials(
+        HTTP_AUTHORIZATION=f"Bearer {AccessToken.for_user(user)}"
+    )
+    try:
+        return client.post(
+            f"/convo/respond/{adventure_id}/",
+            {"user_response": content},
+            format="json",
+        ).status_code
+    finally:
+        connection.close()
+
+
+def respond_concurrently(
+    user: models.User, adventure_id: int, turns: int
+) -> List[int]:
+    """
+    Respond to an adventure concurrently
+
+    Args:
+        user: The user
+        adventure_id: The ID of the adventure
+        turns: The number of concurrent responses
+
+    Returns:
+        The status codes of the responses
+    """
+    with ThreadPoolExecutor(turns) as executor:
+        return list(
+            executor.map(
+                lambda i: respond(user, adventure_id, f"I try door {i}."),
+                range(turns),
+            )
+        )
+
+
+def check_history(adventure_id: int) -> List[str]:
+    """
+    Check the messages of an adventure form one chain of turns
+
+    Args:
+        adventure_id: The ID of the adventure
+
+    Returns:
+        The problems found
+    """
+    adventure = models.Adventure.objects.get(id=adventure_id)
+    messages = list(
+        models.Message.objects.filter(adventure=adventure).order_by("id")
+    )
+
+    problems = []
+    prev_id = None
+    for message in messages:
+        if message.prev_id != prev_id:
+            problems.append(
+                f"message {message.id} follows {message.prev_id},"
+                f" not {prev_id}"
+            )
+        prev_id = message.id
+    if adventure.latest_message_id != prev_id:
+        problems.append(f"latest message is {adventure.latest_message_id}")
+    if adventure.iteration != len(messages):
+        problems.append(
+            f"iteration is {adventure.iteration}, not {len(messages)}"
+        )
+    return problems
+
+
+def main():
+    """Check concurrent turns of an adventure are taken one at a time"""
+    parser = argparse.ArgumentParser(description=main.__doc__)
+    parser.add_argument("--turns", type=int, default=4)
+    parser.add_argument(
+        "--latency",
+        type=float,
+        default=0.5,
+        help="Simulated API latency in seconds.",
+    )
+    args = parser.parse_args()
+
+    openai.ChatCompletion.create = get_slow_stub(args.latency)
+    adventure_config.opening_pool_size = 0
+
+    # In-memory SQLite test databases lock tables across threads
+    if connection.vendor == "sqlite":
+        connection.settings_dict["TEST"]["NAME"] = os.path.join(
+            tempfile.gettempdir(), "turn_lock.sqlite3"
+        )
+
+    passed = True
+    with test_database():
+        user = models.User.objects.create(
+            username="turn-lock", is_whitelisted=True
+        )
+        adventure = models.Adventure.objects.create(user=user)
+        client = APIClient()
+        client.force_authenticate(user)
+        client.post(f"/convo/start/{adventure.id}/", format="json")
+
+        calls.clear()
+        start = time.perf_counter()
+        statuses = respond_concurrently(user, adventure.id, args.turns)
+        seconds = time.perf_counter() - start
+        problems = check_history(adventure.id)
+        print(
+            f"{args.turns} concurrent turns: {statuses} in {seconds:.2f} s,"
+            f" {len(calls)} API calls"
+        )
+        for problem in problems:
+            print(f"  {problem}")
+        if problems or any(status != 200 for status in statuses):
+            passed = False
+
+        adventure_config.turn_lock_timeout = args.latency / 5
+        calls.clear()
+        statuses = respond_concurrently(user, adventure.id, 2)
+        problems = check_history(adventure.id)
+        print(
+            f"2 concurrent turns timing out: {sorted(statuses)},"
+            f" {len(calls)} API calls"
+        )
+        for problem in problems:
+            print(f"  {problem}")
+        if problems or sorted(statuses) != [200, 409] or len(calls) != 1:
+            passed = False
+
+    print("ok" if passed else "FAIL")
+    if not passed:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
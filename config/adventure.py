@@ -43,6 +43,12 @@ class AdventureConfig(BaseSettings):
         " the user's message."
     )
     default_choice_index: int = Field(0)
+    opening_pool_size: int = Field(3)
+    opening_pool_ttl: int = Field(24 * 60 * 60)
+    list_page_size: int = Field(20)
+    list_page_size_max: int = Field(100)
+    broadcast_max_workers: int = Field(4)
+    turn_lock_timeout: float = Field(30.0)
 
     @property
     def summary_system_message(self) -> str:
@@ -0,0 +1,33 @@
+from pydantic import Field, model_validator
+from pydantic_settings import BaseSettings
+
+from .logger import logger_config
+
+
+class ArchiveConfig(BaseSettings):
+    """Configurations for adventure archival"""
+
+    log_level: str = Field(logger_config.level)
+    idle_days: int = Field(90)
+    batch_size: int = Field(100)
+    storage: str = Field("database")
+    directory: str = Field("archive")
+    compression: str = Field("gzip")
+
+    @model_validator(mode="after")
+    def validate_archive(self) -> "ArchiveConfig":
+        """Validate the archive storage and compression"""
+        if self.storage not in ["database", "disk"]:
+            raise ValueError(f"Unknown archive storage {self.storage}")
+        if self.compression not in ["gzip", "zstd"]:
+            raise ValueError(
+                f"Unknown archive compression {self.compression}"
+            )
+        return self
+
+    class Config:
+        env_prefix = "ARCHIVE_"
+        env_file = ".env"
+
+
+archive_config = ArchiveConfig()
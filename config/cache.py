@@ -0,0 +1,28 @@
+from typing import Any, Dict
+
+from pydantic import Field
+from pydantic_settings import BaseSettings
+
+
+class CacheConfig(BaseSettings):
+    """Cache configuration"""
+
+    backend: str = Field("django.core.cache.backends.locmem.LocMemCache")
+    location: str = Field("verbose-adventure")
+    scene_max_age: int = Field(24 * 60 * 60)
+    scene_timeout: int = Field(7 * 24 * 60 * 60)
+
+    def to_settings(self) -> Dict[str, Any]:
+        """Convert to Django settings format"""
+        return {
+            "BACKEND": self.backend,
+            "LOCATION": self.location,
+        }
+
+    class Config:
+        env_file = ".env"
+        env_file_encoding = "utf-8"
+        env_prefix = "CACHE_"
+
+
+cache_config = CacheConfig()
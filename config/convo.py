@@ -10,6 +10,12 @@ class ConvoConfig(BaseSettings):
     log_level: str = Field(logger_config.level)
     summary_interval: int = Field(5)
     history_length: int = Field(5)
+    history_page_size_max: int = Field(50)
+    summary_policy: str = Field("token_budget")
+    summary_token_threshold: int = Field(400)
+    summary_max_length: int = Field(20)
+    prompt_token_budget: int = Field(2000)
+    summary_min_token_fraction: float = Field(0.5)
 
     class Config:
         env_prefix = "CONVO_"
@@ -0,0 +1,20 @@
+from pydantic import Field
+from pydantic_settings import BaseSettings
+
+from .logger import logger_config
+
+
+class IdempotencyConfig(BaseSettings):
+    """Configurations for the idempotency keys of requests"""
+
+    log_level: str = Field(logger_config.level)
+    header: str = Field("Idempotency-Key")
+    ttl: int = Field(24 * 60 * 60)
+    batch_size: int = Field(1000)
+
+    class Config:
+        env_prefix = "IDEMPOTENCY_"
+        env_file = ".env"
+
+
+idempotency_config = IdempotencyConfig()
@@ -1,16 +1,94 @@
-from pydantic import Field
+from typing import List, Optional
+
+from pydantic import BaseModel, Field, model_validator
 from pydantic_settings import BaseSettings
 
+from .logger import logger_config
 
-class OpenAIConfig(BaseSettings):
-    """Configurations for OpenAI API"""
 
-    api_type: str = Field("azure")
-    version: str = Field("2023-08-01-preview")
+class DeploymentConfig(BaseModel):
+    """Configurations for a single OpenAI API deployment"""
+
+    name: str
     key: str
     url: str
     model: str
     deployment: str
+    api_type: Optional[str] = Field(None)
+    version: Optional[str] = Field(None)
+    weight: float = Field(1.0, gt=0)
+    kinds: List[str] = Field(["message", "summary", "knowledge"])
+
+
+class OpenAIConfig(BaseSettings):
+    """Configurations for OpenAI API"""
+
+    log_level: str = Field(logger_config.level)
+    api_type: str = Field("azure")
+    version: str = Field("2023-08-01-preview")
+    key: Optional[str] = Field(None)
+    url: Optional[str] = Field(None)
+    model: Optional[str] = Field(None)
+    deployment: Optional[str] = Field(None)
+    deployments: List[DeploymentConfig] = Field([])
+    routing_strategy: str = Field("least_outstanding")
+    ewma_alpha: float = Field(0.3)
+    eject_failures: int = Field(3)
+    eject_seconds: float = Field(30.0)
+    cassette_mode: str = Field("off")
+    cassette_path: str = Field("cassette.jsonl.gz")
+    cassette_latency: float = Field(0.0, ge=0)
+    single_flight: bool = Field(True)
+    single_flight_shared: bool = Field(False)
+    single_flight_timeout: float = Field(120.0, gt=0)
+    single_flight_poll_interval: float = Field(0.05, gt=0)
+
+    @model_validator(mode="after")
+    def validate_deployments(self) -> "OpenAIConfig":
+        """Validate that at least one deployment is configured"""
+        single = [self.key, self.url, self.model, self.deployment]
+        if not self.deployments and None in single:
+            raise ValueError(
+                "Either OPENAI_DEPLOYMENTS or all of OPENAI_KEY, OPENAI_URL,"
+                " OPENAI_MODEL and OPENAI_DEPLOYMENT must be set"
+            )
+        if self.routing_strategy not in ["least_outstanding", "ewma_latency"]:
+            raise ValueError(
+                f"Unknown routing strategy {self.routing_strategy}"
+            )
+        if self.cassette_mode not in ["off", "record", "replay"]:
+            raise ValueError(f"Unknown cassette mode {self.cassette_mode}")
+        return self
+
+    def get_deployments(self) -> List[DeploymentConfig]:
+        """
+        Get the deployments in the pool
+
+        The single deployment configured by `url`, `key`, `model` and
+        `deployment` is used when `deployments` is empty.
+
+        Returns:
+            The list of deployments with API type and version filled in
+        """
+        deployments = self.deployments or [
+            DeploymentConfig(
+                name="default",
+                key=self.key,
+                url=self.url,
+                model=self.model,
+                deployment=self.deployment,
+            )
+        ]
+
+        return [
+            d.model_copy(
+                update={
+                    "api_type": d.api_type or self.api_type,
+                    "version": d.version or self.version,
+                }
+            )
+            for d in deployments
+        ]
 
     class Config:
         env_prefix = "OPENAI_"
@@ -0,0 +1,30 @@
+from pydantic import Field, model_validator
+from pydantic_settings import BaseSettings
+
+from .logger import logger_config
+
+
+class ProfilerConfig(BaseSettings):
+    """Configurations for the on-demand request profiler"""
+
+    log_level: str = Field(logger_config.level)
+    enabled: bool = Field(True)
+    header: str = Field("X-Profile")
+    query_param: str = Field("profile")
+    profiler: str = Field("cprofile")
+    directory: str = Field("profiles")
+    stats_limit: int = Field(50)
+
+    @model_validator(mode="after")
+    def validate_profiler(self) -> "ProfilerConfig":
+        """Validate the profiler"""
+        if self.profiler not in ["cprofile", "pyinstrument"]:
+            raise ValueError(f"Unknown profiler {self.profiler}")
+        return self
+
+    class Config:
+        env_prefix = "PROFILER_"
+        env_file = ".env"
+
+
+profiler_config = ProfilerConfig()
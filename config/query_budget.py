@@ -0,0 +1,30 @@
+from typing import Optional
+
+from pydantic import Field
+from pydantic_settings import BaseSettings
+
+from .django import django_config
+from .logger import logger_config
+
+
+class QueryBudgetConfig(BaseSettings):
+    """Configurations for the per-view database query budgets"""
+
+    log_level: str = Field(logger_config.level)
+    enabled: bool = Field(True)
+    strict: Optional[bool] = Field(None)
+    fingerprint_limit: int = Field(5)
+
+    @property
+    def is_strict(self) -> bool:
+        """Return if exceeding a budget raises, by default in debug mode"""
+        if self.strict is None:
+            return django_config.debug
+        return self.strict
+
+    class Config:
+        env_prefix = "QUERY_BUDGET_"
+        env_file = ".env"
+
+
+query_budget_config = QueryBudgetConfig()
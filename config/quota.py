@@ -0,0 +1,22 @@
+from pydantic import Field
+from pydantic_settings import BaseSettings
+
+from .logger import logger_config
+
+
+class QuotaConfig(BaseSettings):
+    """Configurations for the per-user request and token quotas"""
+
+    log_level: str = Field(logger_config.level)
+    enabled: bool = Field(True)
+    # The default limits, 0 for no limit
+    requests_per_minute: int = Field(20)
+    tokens_per_day: int = Field(200000)
+    limits_timeout: int = Field(5 * 60)
+
+    class Config:
+        env_prefix = "QUOTA_"
+        env_file = ".env"
+
+
+quota_config = QuotaConfig()
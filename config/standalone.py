@@ -0,0 +1,23 @@
+from typing import Optional
+
+from pydantic import Field
+from pydantic_settings import BaseSettings
+
+from .logger import logger_config
+
+
+class StandaloneConfig(BaseSettings):
+    """Configurations for the standalone program"""
+
+    log_level: str = Field(logger_config.level)
+    history_window_size: int = Field(50)
+    history_directory: Optional[str] = Field(None)
+    journal_path: Optional[str] = Field(None)
+    journal_sync_every: int = Field(32)
+
+    class Config:
+        env_prefix = "STANDALONE_"
+        env_file = ".env"
+
+
+standalone_config = StandaloneConfig()
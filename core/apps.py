@@ -6,3 +6,13 @@ class CoreConfig(AppConfig):
 
     default_auto_field = "django.db.models.BigAutoField"
     name = "core"
+
+    def ready(self):
+        """Share the API calls in flight across processes if configured"""
+        from config.openai import open_ai_config
+        from engine import openai_api
+
+        from .single_flight import CacheFlightStore
+
+        if open_ai_config.single_flight_shared:
+            openai_api.flights.store = CacheFlightStore.from_config()
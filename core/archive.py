@@ -0,0 +1,187 @@
+import gzip
+import json
+import os
+from datetime import datetime
+from itertools import groupby
+from typing import Any, Iterable, Iterator
+
+from django.core import serializers
+from django.core.serializers.base import DeserializedObject
+from django.db.models import Model
+
+from config.archive import archive_config
+
+
+def encode_value(value: Any) -> Any:
+    """Encode a field value not supported by JSON"""
+    if isinstance(value, datetime):
+        # Keep the microseconds Django's JSON encoder drops
+        return value.isoformat()
+    raise TypeError(f"Cannot encode {type(value)} in an archive")
+
+
+def dump_rows(rows: Iterable[Model]) -> bytes:
+    """
+    Dump model rows as JSONL
+
+    Args:
+        rows: The model rows
+
+    Returns:
+        The JSONL of the rows
+    """
+    return "".join(
+        json.dumps(
+            row,
+            default=encode_value,
+            ensure_ascii=False,
+            separators=(",", ":"),
+        )
+        + "\n"
+        for row in serializers.serialize("python", rows)
+    ).encode()
+
+
+def load_rows(data: bytes) -> Iterator[DeserializedObject]:
+    """
+    Load model rows from JSONL
+
+    Args:
+        data: The JSONL of the rows
+
+    Returns:
+        The deserialized rows in the dumped order
+    """
+    return serializers.deserialize(
+        "python", (json.loads(line) for line in data.splitlines())
+    )
+
+
+def save_rows(rows: Iterable[DeserializedObject]):
+    """
+    Save loaded model rows in bulk
+
+    The rows must be grouped by model in the order they refer to each other,
+    as they are dumped. `bulk_create` sets the `auto_now_add` fields, so
+    they are updated back to the loaded values.
+
+    Args:
+        rows: The deserialized rows
+    """
+    for model, group in groupby((row.object for row in rows), key=type):
+        objects = list(group)
+        fields = [
+            field.attname
+            for field in model._meta.concrete_fields
+            if getattr(field, "auto_now_add", False)
+        ]
+        loaded = [[getattr(obj, f) for f in fields] for obj in objects]
+
+        model.objects.bulk_create(objects)
+
+        if fields:
+            for obj, values in zip(objects, loaded):
+                for field, value in zip(fields, values):
+                    setattr(obj, field, value)
+            model.objects.bulk_update(objects, fields)
+
+
+def compress(data: bytes, compression: str) -> bytes:
+    """
+    Compress an archive
+
+    The `zstd` compression requires the `zstandard` package.
+
+    Args:
+        data: The archive data
+        compression: The compression, `gzip` or `zstd`
+
+    Returns:
+        The compressed data
+    """
+    if compression == "zstd":
+        import zstandard
+
+        return zstandard.ZstdCompressor().compress(data)
+
+    return gzip.compress(data)
+
+
+def decompress(data: bytes, compression: str) -> bytes:
+    """
+    Decompress an archive
+
+    Args:
+        data: The compressed data
+        compression: The compression, `gzip` or `zstd`
+
+    Returns:
+        The archive data
+    """
+    if compression == "zstd":
+        import zstandard
+
+        return zstandard.ZstdDecompressor().decompress(data)
+
+    return gzip.decompress(data)
+
+
+def get_path(adventure_id: int, compression: str) -> str:
+    """
+    Get the path of an adventure archive on disk
+
+    Args:
+        adventure_id: The ID of the adventure
+        compression: The compression, `gzip` or `zstd`
+
+    Returns:
+        The path of the archive
+    """
+    extension = "zst" if compression == "zstd" else "gz"
+    return os.path.join(
+        archive_config.directory, f"adventure-{adventure_id}.jsonl.{extension}"
+    )
+
+
+def write_file(path: str, data: bytes):
+    """
+    Write an archive to disk
+
+    The archive is written to a temporary file first, so a partially
+    written archive is never read.
+
+    Args:
+        path: The path of the archive
+        data: The compressed data
+    """
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(f"{path}.tmp", "wb") as f:
+        f.write(data)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(f"{path}.tmp", path)
+
+
+def read_file(path: str) -> bytes:
+    """
+    Read an archive from disk
+
+    Args:
+        path: The path of the archive
+
+    Returns:
+        The compressed data
+    """
+    with open(path, "rb") as f:
+        return f.read()
+
+
+def remove_file(path: str):
+    """
+    Remove an archive from disk if it exists
+
+    Args:
+        path: The path of the archive
+    """
+    if os.path.exists(path):
+        os.remove(path)
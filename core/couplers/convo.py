@@ -1,14 +1,16 @@
 import json
 import logging
-from typing import List
+from typing import List, Optional
 
 from config.adventure import adventure_config
 from config.convo import convo_config
 from engine import models as engine_models
 from engine.convo import BaseConvoCoupler
+from engine.knowledge import get_knowledge_schema
 from engine.openai_api import call_api_function
+from engine.transcript import encode_transcript, estimate_tokens
 
-from .. import models
+from .. import models, quotas
 
 
 class ConvoCoupler(BaseConvoCoupler):
@@ -41,6 +43,42 @@ class ConvoCoupler(BaseConvoCoupler):
             ),
         )
 
+    def get_prestarted_response(self) -> Optional[engine_models.Chatcmpl]:
+        """
+        Take a pre-generated API response from the opening pool
+
+        Only the default template is pooled, and its pool is refilled in the
+        background. Custom templates are rarely reused, so pooling them
+        would only spend API calls on openings expiring unused.
+
+        Returns:
+            The pre-generated API response, None if the pool is empty or the
+            adventure has a custom template
+        """
+        if adventure_config.opening_pool_size <= 0:
+            return None
+
+        system_message = self.adventure.system_message
+        start_message = self.adventure.start_message
+        if (system_message, start_message) != (
+            adventure_config.system_message,
+            adventure_config.start_message,
+        ):
+            return None
+
+        chatcmpl = models.PrestartedOpening.objects.pop(
+            system_message, start_message
+        )
+        models.PrestartedOpening.objects.refill_async(
+            system_message, start_message, self.get_init_message()
+        )
+
+        self.logger.info(
+            "Opening pool "
+            + ("hit" if chatcmpl is not None else "missed")
+        )
+        return chatcmpl
+
     def save_api_response(
         self, chatcmpl: engine_models.Chatcmpl
     ) -> engine_models.Message:
@@ -67,7 +105,7 @@ class ConvoCoupler(BaseConvoCoupler):
             choice_index=adventure_config.default_choice_index,
         )
 
-        chosen = chatcmpl_model.choice_set.get(
+        chosen = chatcmpl_model.choice_set.select_related("message").get(
             index=adventure_config.default_choice_index
         )
         self.adventure.latest_message = chosen.message
@@ -139,10 +177,10 @@ class ConvoCoupler(BaseConvoCoupler):
         self, history_length: int
     ) -> List[engine_models.Message]:
         """
-        Get the message history and previous summary for the summary
+        Get the messages since the previous summary and the previous summary
 
         Args:
-            n: The number of messages to build from history
+            n: The maximum number of messages since the previous summary
 
         Returns:
             The list of messages (summary system message, summary message,
@@ -176,12 +214,9 @@ class ConvoCoupler(BaseConvoCoupler):
                 )
             )
 
-        json_history_messages = [
-            m.to_engine_message()
-            for m in models.Message.objects.get_latest_n_messages(
-                self.adventure, history_length
-            )
-        ]
+        json_history_messages = encode_transcript(
+            self.get_unsummarized_messages(history_length)
+        )
         messages.append(
             engine_models.Message(
                 role=engine_models.Role.ASSISTANT,
@@ -193,6 +228,43 @@ class ConvoCoupler(BaseConvoCoupler):
 
         return messages
 
+    def get_unsummarized_messages(
+        self, max_length: int
+    ) -> List[engine_models.Message]:
+        """
+        Get the messages since the previous summary
+
+        Args:
+            max_length: The maximum number of latest messages to get
+
+        Returns:
+            The list of messages not covered by the previous summary
+        """
+        return [
+            m.to_engine_message()
+            for m in models.Message.objects.get_unsummarized_messages(
+                self.adventure, max_length
+            )
+        ]
+
+    def estimate_prompt_tokens(self, history_length: int) -> int:
+        """
+        Estimate the number of tokens of the next prompt
+
+        Extra system message content added by subclasses is not included.
+
+        Args:
+            history_length: The number of messages to build from history
+
+        Returns:
+            The estimated number of tokens
+        """
+        return estimate_tokens(
+            encode_transcript(
+                ConvoCoupler.get_built_messages(self, history_length)
+            )
+        )
+
     def save_summary_response(
         self, chatcmpl: engine_models.Chatcmpl
     ) -> engine_models.Message:
@@ -207,8 +279,8 @@ class ConvoCoupler(BaseConvoCoupler):
         """
         adventure = self.adventure
         summary = adventure.summary
-        messages = models.Message.objects.get_latest_n_messages(
-            adventure, convo_config.history_length
+        messages = models.Message.objects.get_unsummarized_messages(
+            adventure, convo_config.summary_max_length
         )
         chatcmpl_model = models.Chatcmpl.objects.create_from_engine_chatcmpl(
             adventure,
@@ -219,7 +291,7 @@ class ConvoCoupler(BaseConvoCoupler):
             choice_index=adventure_config.default_choice_index,
         )
 
-        chosen = chatcmpl_model.choice_set.get(
+        chosen = chatcmpl_model.choice_set.select_related("message").get(
             index=adventure_config.default_choice_index
         )
 
@@ -326,23 +398,9 @@ class SceneNpcConvoCoupler(ConvoCoupler):
         self.logger.info("Getting knowledge to use")
 
         # Prepare the function and messages
-        function = engine_models.Function(
-            name="get_knowledge",
-            description=(
-                "Get the assistant's knowledge to use for responding the"
-                " user's message. The assistant and user refer to the"
-                " conversation messages in the JSON list."
-            ),
-            parameters=engine_models.Parameters(
-                parameters={
-                    k.name: engine_models.Parameter(
-                        type="boolean",
-                        description=k.description,
-                        required=True,
-                    )
-                    for k in self.npc_adv_pair.npc.knowledges.all()
-                }
-            ),
+        npc = self.npc_adv_pair.npc
+        schema = get_knowledge_schema(
+            npc.id, npc.knowledge_version, npc.get_scene_data_knowledges
         )
 
         messages = []
@@ -354,7 +412,7 @@ class SceneNpcConvoCoupler(ConvoCoupler):
             )
         )
 
-        json_convo_messages = [m.model_dump() for m in convo_messages]
+        json_convo_messages = encode_transcript(convo_messages)
 
         messages.append(
             engine_models.Message(
@@ -366,14 +424,21 @@ class SceneNpcConvoCoupler(ConvoCoupler):
             )
         )
 
-        response = call_api_function(messages, function)
+        response = call_api_function(messages, schema.function_dump)
 
         self.npc_adv_pair.knowledge_selection_token_count += (
             response.usage.total_tokens
         )
+        if not response.shared:
+            quotas.record_tokens(
+                self.adventure.user_id, response.usage.total_tokens
+            )
 
         # Parse the arguments
-        if response.choices[0].message.function_call.name != function.name:
+        if (
+            response.choices[0].message.function_call.name
+            != schema.FUNCTION_NAME
+        ):
             self.logger.warning("Function is not called.")
             return ""
 
@@ -383,8 +448,4 @@ class SceneNpcConvoCoupler(ConvoCoupler):
         self.logger.info(f"Arguments parsed: {arguments}")
 
         # Get the knowledge
-        return " ".join(
-            k.knowledge
-            for k in self.npc_adv_pair.npc.knowledges.all()
-            if arguments[k.name]
-        )
+        return schema.select(arguments)
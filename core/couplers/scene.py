@@ -1,6 +1,8 @@
 import logging
 from typing import List, Optional
 
+from django.db import connection
+
 import data.scene
 from config.adventure import adventure_config
 from core import models
@@ -36,9 +38,13 @@ class SceneCoupler(BaseSceneCoupler):
 
         npc_adv_pair: Optional[
             models.SceneNpcAdventurePair
-        ] = self.scene_runner.scenenpcadventurepair_set.filter(
-            npc__index=index
-        ).first()
+        ] = (
+            self.scene_runner.scenenpcadventurepair_set.select_related(
+                "npc", "adventure__summary"
+            )
+            .filter(npc__index=index)
+            .first()
+        )
 
         if npc_adv_pair is None:
             return None
@@ -63,14 +69,16 @@ class SceneCoupler(BaseSceneCoupler):
             start_message="",
         )
 
-        npc: models.SceneNpc = models.SceneNpc.objects.get(id=npc.id)
-
         models.SceneNpcAdventurePair.objects.create(
             runner=self.scene_runner,
-            npc=npc,
+            npc_id=npc.id,
             adventure=adventure,
         )
 
+    def end_broadcast_turn(self):
+        """Closes the database connection of the broadcast worker thread."""
+        connection.close()
+
     def get_npcs(self) -> List[data.scene.SceneNpc]:
         """
         Gets the list of NPCs in the SceneCoupler.
@@ -80,7 +88,11 @@ class SceneCoupler(BaseSceneCoupler):
         """
         self.logger.info("Getting NPCs")
 
-        npc_adv_pair_set = self.scene_runner.scenenpcadventurepair_set.all()
+        npc_adv_pair_set = (
+            self.scene_runner.scenenpcadventurepair_set.select_related(
+                "npc"
+            ).prefetch_related("npc__knowledges")
+        )
         return [
             npc_adv_pair.npc.to_scene_data_npc()
             for npc_adv_pair in npc_adv_pair_set
@@ -0,0 +1,294 @@
+import logging
+import time
+from collections import Counter
+from typing import Callable, Dict, List, Optional
+
+from django.db import transaction
+from django.db.models import Q, QuerySet
+
+from config.adventure import adventure_config
+
+from . import models
+from .archive import remove_file
+
+
+def raw_delete(queryset: QuerySet) -> int:
+    """
+    Delete the rows of a queryset in one statement
+
+    Unlike `QuerySet.delete`, the rows are not collected in Python and
+    nothing is cascaded, so the rows referencing them must be deleted
+    first.
+
+    Args:
+        queryset: The queryset
+
+    Returns:
+        The number of deleted rows
+    """
+    return queryset._raw_delete(queryset.db)
+
+
+class BatchDeleter:
+    """
+    Deletes adventures with their conversations bottom-up in batches
+
+    Every chunk of at most `batch_size` rows is deleted and committed in its
+    own transaction, so locks are held briefly and the deletion can be
+    resumed if interrupted.
+    """
+
+    logger: logging.Logger
+    batch_size: int
+    dry_run: bool
+    progress: Callable[[str], None]
+    counts: Counter
+    seconds: float
+
+    def __init__(
+        self,
+        batch_size: int = 1000,
+        dry_run: bool = False,
+        progress: Optional[Callable[[str], None]] = None,
+    ):
+        self.logger = logging.getLogger(__name__)
+        self.logger.setLevel(adventure_config.log_level)
+
+        self.batch_size = batch_size
+        self.dry_run = dry_run
+        self.progress = progress or self.logger.info
+        self.counts = Counter()
+        self.seconds = 0.0
+
+    @property
+    def throughput(self) -> float:
+        """
+        Return the number of rows deleted per second
+
+        Returns:
+            The throughput
+        """
+        if self.seconds == 0:
+            return 0.0
+        return sum(self.counts.values()) / self.seconds
+
+    def delete_chunks(self, table: str, queryset: QuerySet) -> int:
+        """
+        Delete the rows of a queryset in chunks in queryset order
+
+        Args:
+            table: The name of the table to count the rows under
+            queryset: The queryset
+
+        Returns:
+            The number of deleted rows
+        """
+        if self.dry_run:
+            count = queryset.count()
+            self.counts[table] += count
+            return count
+
+        deleted = 0
+        while True:
+            pks = list(
+                queryset.values_list("pk", flat=True)[: self.batch_size]
+            )
+            if not pks:
+                return deleted
+
+            start = time.perf_counter()
+            with transaction.atomic():
+                count = raw_delete(queryset.model.objects.filter(pk__in=pks))
+            self.seconds += time.perf_counter() - start
+
+            self.counts[table] += count
+            deleted += count
+
+    def delete_adventure_batch(self, ids: List[int]):
+        """
+        Delete a batch of adventures with their conversations
+
+        Args:
+            ids: The IDs of the adventures
+        """
+        summary_ids = list(
+            models.Summary.objects.filter(
+                Q(adventure__id__in=ids)
+                | Q(chatcmpl__adventure_id__in=ids)
+                | Q(choice__chatcmpl__adventure_id__in=ids)
+            )
+            .values_list("id", flat=True)
+            .distinct()
+        )
+
+        if not self.dry_run:
+            with transaction.atomic():
+                models.Adventure.objects.filter(id__in=ids).update(
+                    summary=None, latest_message=None
+                )
+
+        self.delete_chunks(
+            "choice",
+            models.Choice.objects.filter(chatcmpl__adventure_id__in=ids),
+        )
+        self.delete_chunks(
+            "chatcmpl", models.Chatcmpl.objects.filter(adventure_id__in=ids)
+        )
+        self.delete_chunks(
+            "summary", models.Summary.objects.filter(id__in=summary_ids)
+        )
+        # Newest first, so no remaining message refers to a deleted one
+        self.delete_chunks(
+            "message",
+            models.Message.objects.filter(adventure_id__in=ids).order_by(
+                "-id"
+            ),
+        )
+
+        archives = models.AdventureArchive.objects.filter(
+            adventure_id__in=ids
+        )
+        paths = [p for p in archives.values_list("path", flat=True) if p]
+        self.delete_chunks("archive", archives)
+
+        if self.dry_run:
+            self.counts["scenenpcadventurepair"] += (
+                models.SceneNpcAdventurePair.objects.filter(
+                    adventure_id__in=ids
+                ).count()
+            )
+            self.counts["adventure"] += len(ids)
+            return
+
+        for path in paths:
+            remove_file(path)
+
+        start = time.perf_counter()
+        with transaction.atomic():
+            self.counts["scenenpcadventurepair"] += raw_delete(
+                models.SceneNpcAdventurePair.objects.filter(
+                    adventure_id__in=ids
+                )
+            )
+            self.counts["adventure"] += raw_delete(
+                models.Adventure.objects.filter(id__in=ids)
+            )
+        self.seconds += time.perf_counter() - start
+
+    def delete_adventures(self, adventures: QuerySet):
+        """
+        Delete adventures with their conversations in batches
+
+        Args:
+            adventures: The queryset of adventures
+        """
+        total = adventures.count()
+        done = 0
+        last_id = 0
+        while True:
+            ids = list(
+                adventures.filter(id__gt=last_id)
+                .order_by("id")
+                .values_list("id", flat=True)[: self.batch_size]
+            )
+            if not ids:
+                break
+
+            self.delete_adventure_batch(ids)
+
+            done += len(ids)
+            last_id = ids[-1]
+            self.progress(
+                f"{'Counted' if self.dry_run else 'Deleted'} {done}/{total}"
+                f" adventures, {sum(self.counts.values())} rows"
+                + (
+                    ""
+                    if self.dry_run
+                    else f" at {self.throughput:.0f} rows/s"
+                )
+            )
+
+    def delete_scene(self, scene_id: str) -> Dict[str, int]:
+        """
+        Delete a scene with its scene runners and their conversations
+
+        Knowledges no longer used by any NPC are deleted as well.
+
+        Args:
+            scene_id: The ID of the scene
+
+        Returns:
+            The number of rows deleted, or to delete in a dry run, by table
+        """
+        self.delete_adventures(
+            models.Adventure.objects.filter(
+                scenenpcadventurepair__npc__scene_id=scene_id
+            )
+        )
+        self.delete_chunks(
+            "scenerunner",
+            models.SceneRunner.objects.filter(scene_id=scene_id),
+        )
+
+        npcs = models.SceneNpc.objects.filter(scene_id=scene_id)
+        scene = models.Scene.objects.filter(id=scene_id)
+        if self.dry_run:
+            self.counts["scenenpc"] += npcs.count()
+            self.counts["knowledge"] += (
+                models.Knowledge.objects.filter(npcs__scene_id=scene_id)
+                .exclude(
+                    npcs__in=models.SceneNpc.objects.exclude(
+                        scene_id=scene_id
+                    )
+                )
+                .distinct()
+                .count()
+            )
+            self.counts["scene"] += scene.count()
+            return dict(self.counts)
+
+        # The scene definition is small, the collector handles the relations
+        with transaction.atomic():
+            self.counts["scenenpc"] += npcs.delete()[1].get(
+                models.SceneNpc._meta.label, 0
+            )
+            self.counts["knowledge"] += (
+                models.Knowledge.objects.filter(npcs=None)
+                .delete()[1]
+                .get(models.Knowledge._meta.label, 0)
+            )
+            self.counts["scene"] += scene.delete()[1].get(
+                models.Scene._meta.label, 0
+            )
+
+        return dict(self.counts)
+
+    def delete_user(self, user_id: int) -> Dict[str, int]:
+        """
+        Delete a user with their adventures and scene runners
+
+        Args:
+            user_id: The ID of the user
+
+        Returns:
+            The number of rows deleted, or to delete in a dry run, by table
+        """
+        self.delete_adventures(
+            models.Adventure.objects.filter(user_id=user_id)
+        )
+        self.delete_chunks(
+            "scenerunner", models.SceneRunner.objects.filter(user_id=user_id)
+        )
+
+        user = models.User.objects.filter(id=user_id)
+        if self.dry_run:
+            self.counts["user"] += user.count()
+            return dict(self.counts)
+
+        # The remaining relations of the user are small
+        with transaction.atomic():
+            self.counts["user"] += user.delete()[1].get(
+                models.User._meta.label, 0
+            )
+
+        return dict(self.counts)
@@ -0,0 +1,53 @@
+from rest_framework import response, status
+from rest_framework.request import Request
+
+
+def format_etag(value: str) -> str:
+    """
+    Format a value as a strong ETag
+
+    Args:
+        value: The value identifying the representation
+
+    Returns:
+        The quoted ETag
+    """
+    return f'"{value}"'
+
+
+def matches_if_none_match(request: Request, etag: str) -> bool:
+    """
+    Return if the If-None-Match header of the request matches the ETag
+
+    Args:
+        request: The request
+        etag: The quoted ETag of the current representation
+
+    Returns:
+        True if the client already has the representation, False otherwise
+    """
+    header = request.headers.get("If-None-Match")
+    if header is None:
+        return False
+
+    if header.strip() == "*":
+        return True
+
+    # Weak comparison, as for GET requests
+    tags = [t.strip().removeprefix("W/") for t in header.split(",")]
+    return etag in tags
+
+
+def not_modified(etag: str) -> response.Response:
+    """
+    Create a 304 Not Modified response
+
+    Args:
+        etag: The quoted ETag of the current representation
+
+    Returns:
+        The response without body
+    """
+    return response.Response(
+        status=status.HTTP_304_NOT_MODIFIED, headers={"ETag": etag}
+    )
@@ -9,6 +9,14 @@ class AdventureStartedException(exceptions.APIException):
     default_code = "adventure_started"
 
 
+class AdventureTurnInProgressException(exceptions.APIException):
+    """Exception for when another turn of the adventure is in progress."""
+
+    status_code = 409
+    default_detail = "Another turn of the adventure is in progress."
+    default_code = "adventure_turn_in_progress"
+
+
 class AdventureNotOwnedByUserException(exceptions.APIException):
     """Exception for when the adventure is not owned by the user."""
 
@@ -31,3 +39,26 @@ class SceneRunnerNotOwnedByUserException(exceptions.APIException):
     status_code = 400
     default_detail = "Scene runner is not owned by the user."
     default_code = "scene_runner_not_owned_by_user"
+
+
+class InvalidIdempotencyKeyException(exceptions.APIException):
+    """Exception for when the idempotency key is invalid."""
+
+    status_code = 400
+    default_detail = "Idempotency key is invalid."
+    default_code = "invalid_idempotency_key"
+
+
+class IdempotencyKeyReusedException(exceptions.APIException):
+    """Exception for when the idempotency key was used by another request."""
+
+    status_code = 422
+    default_detail = "Idempotency key was used for a different request."
+    default_code = "idempotency_key_reused"
+
+
+class QuotaExceededException(exceptions.Throttled):
+    """Exception for when the user exceeded a quota."""
+
+    default_detail = "Quota exceeded."
+    default_code = "quota_exceeded"
@@ -0,0 +1,159 @@
+import json
+from datetime import datetime
+from itertools import islice
+from typing import Any, Dict, Iterator, List, Optional
+
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db.models import F, Q, QuerySet
+from django.db.models.functions import Coalesce
+
+from . import models
+
+KINDS: List[str] = ["message", "chatcmpl", "summary"]
+FORMATS: List[str] = ["jsonl", "columnar"]
+CHUNK_SIZE: int = 2000
+
+
+def get_queryset(
+    kind: str,
+    user_id: Optional[int] = None,
+    scene_id: Optional[str] = None,
+    since: Optional[datetime] = None,
+    until: Optional[datetime] = None,
+) -> QuerySet:
+    """
+    Get the rows of a kind to export as dicts
+
+    Summaries are filtered by the latest message they cover, or without one
+    by the adventure they are the summary of. The replaced summaries without
+    a message have a null `adventure_id` and are only exported unfiltered.
+    Conversations of archived adventures are not exported.
+
+    Args:
+        kind: The kind of rows, one of `KINDS`
+        user_id: Only export the adventures of this user
+        scene_id: Only export the adventures of NPCs in this scene
+        since: Only export the rows created at or after this time
+        until: Only export the rows created before this time
+
+    Returns:
+        The queryset of row dicts ordered by ID
+    """
+    if kind == "message":
+        adventures = ["adventure"]
+        created_at = "timestamp"
+        queryset = models.Message.objects.values(
+            "id",
+            "adventure_id",
+            "prev_id",
+            "timestamp",
+            "role",
+            "content",
+            "name",
+        )
+    elif kind == "chatcmpl":
+        adventures = ["adventure"]
+        created_at = "created_at"
+        queryset = models.Chatcmpl.objects.values(
+            "id",
+            "adventure_id",
+            "summary_id",
+            "kind",
+            "created_at",
+            "model",
+            "completion_tokens",
+            "prompt_tokens",
+            "history_start",
+            "history_end",
+        )
+    elif kind == "summary":
+        adventures = ["message__adventure", "adventure"]
+        created_at = "message__timestamp"
+        queryset = models.Summary.objects.values(
+            "id",
+            "message_id",
+            "summary",
+            adventure_id=Coalesce(
+                F("message__adventure_id"), F("adventure__id")
+            ),
+        )
+    else:
+        raise ValueError(f"Unknown export kind {kind}")
+
+    adventure_filters = Q()
+    for adventure in adventures:
+        filters: Dict[str, Any] = {}
+        if user_id is not None:
+            filters[f"{adventure}__user_id"] = user_id
+        if scene_id is not None:
+            filters[f"{adventure}__scenenpcadventurepair__npc__scene_id"] = (
+                scene_id
+            )
+        adventure_filters |= Q(**filters)
+
+    filters = {}
+    if since is not None:
+        filters[f"{created_at}__gte"] = since
+    if until is not None:
+        filters[f"{created_at}__lt"] = until
+
+    return queryset.filter(adventure_filters, **filters).order_by("id")
+
+
+def dump_line(data: Dict[str, Any]) -> str:
+    """Dump a dict as a JSONL line"""
+    return (
+        json.dumps(
+            data,
+            cls=DjangoJSONEncoder,
+            ensure_ascii=False,
+            separators=(",", ":"),
+        )
+        + "\n"
+    )
+
+
+def export(
+    kinds: List[str],
+    export_format: str = "jsonl",
+    chunk_size: int = CHUNK_SIZE,
+    **filters: Any,
+) -> Iterator[str]:
+    """
+    Export rows as a stream of JSONL lines
+
+    The rows are read with server-side cursors in chunks, so the memory
+    used does not grow with the number of rows.
+
+    In `jsonl` format each line is a row with its kind as `type`. In
+    `columnar` format each line is a chunk of rows of a kind, with the
+    values of each column in a list.
+
+    Args:
+        kinds: The kinds of rows to export
+        export_format: The export format, one of `FORMATS`
+        chunk_size: The number of rows read per chunk
+        **filters: The filters of `get_queryset`
+
+    Yields:
+        The JSONL lines
+    """
+    for kind in kinds:
+        rows = get_queryset(kind, **filters).iterator(chunk_size=chunk_size)
+
+        if export_format == "jsonl":
+            for row in rows:
+                yield dump_line({"type": kind} | row)
+            continue
+
+        while chunk := list(islice(rows, chunk_size)):
+            yield dump_line(
+                {
+                    "type": kind,
+                    "length": len(chunk),
+                    "columns": {
+                        column: [row[column] for row in chunk]
+                        for column in chunk[0]
+                    },
+                }
+            )
@@ -0,0 +1,124 @@
+import hashlib
+import json
+import logging
+from typing import Optional
+
+from django.db import IntegrityError, transaction
+from rest_framework import response
+from rest_framework.request import Request
+
+from config.idempotency import idempotency_config
+
+from . import exceptions, models
+
+MAX_KEY_LENGTH: int = 255
+REPLAYED_HEADER: str = "Idempotent-Replayed"
+
+
+def get_idempotency_key(request: Request) -> Optional[str]:
+    """
+    Get the idempotency key of a request
+
+    Args:
+        request: The request
+
+    Returns:
+        The idempotency key, None if the request has none
+
+    Raises:
+        InvalidIdempotencyKeyException: If the key is empty or too long
+    """
+    key = request.headers.get(idempotency_config.header)
+    if key is None:
+        return None
+
+    key = key.strip()
+    if not key or len(key) > MAX_KEY_LENGTH:
+        raise exceptions.InvalidIdempotencyKeyException(
+            f"{idempotency_config.header} must be 1 to {MAX_KEY_LENGTH}"
+            " characters."
+        )
+    return key
+
+
+def get_fingerprint(request: Request) -> str:
+    """
+    Get the fingerprint of a request, to tell the reuses of a key apart
+
+    Args:
+        request: The request
+
+    Returns:
+        The SHA-256 hex digest of the method, path, and data of the request
+    """
+    data = json.dumps(request.data, sort_keys=True, default=str)
+    return hashlib.sha256(
+        f"{request.method} {request.path}\n{data}".encode()
+    ).hexdigest()
+
+
+def replay_response(request: Request) -> Optional[response.Response]:
+    """
+    Get the stored response of a request with an idempotency key
+
+    It must be called while holding the turn of the adventure, so a repeat
+    of an in-flight request waits for its response instead of taking the
+    turn again.
+
+    Args:
+        request: The request
+
+    Returns:
+        The stored response, None if the request has no key or the key has
+        no unexpired response
+
+    Raises:
+        InvalidIdempotencyKeyException: If the key is empty or too long
+        IdempotencyKeyReusedException: If the key was used for a different
+            request
+    """
+    key = get_idempotency_key(request)
+    if key is None:
+        return None
+
+    record = models.IdempotencyRecord.objects.get_unexpired(request.user, key)
+    if record is None:
+        return None
+
+    if record.fingerprint != get_fingerprint(request):
+        raise exceptions.IdempotencyKeyReusedException()
+
+    return response.Response(
+        record.response,
+        status=record.status_code,
+        headers={REPLAYED_HEADER: "true"},
+    )
+
+
+def save_response(request: Request, resp: response.Response):
+    """
+    Store the response of a request with an idempotency key
+
+    Args:
+        request: The request
+        resp: The response to replay to the repeats of the request
+    """
+    key = get_idempotency_key(request)
+    if key is None:
+        return
+
+    logger = logging.getLogger(__name__)
+    logger.setLevel(idempotency_config.log_level)
+
+    try:
+        with transaction.atomic():
+            models.IdempotencyRecord.objects.create(
+                user=request.user,
+                key=key,
+                fingerprint=get_fingerprint(request),
+                status_code=resp.status_code,
+                response=resp.data,
+            )
+    except IntegrityError:
+        # Another request with the key stored its response first
+        logger.warning("Idempotency key %s already stored", key)
@@ -0,0 +1,160 @@
+import threading
+from contextlib import ExitStack, contextmanager
+from typing import Dict, Generator, Iterable, Iterator, List
+
+from django.db import OperationalError, connection
+
+from config.adventure import adventure_config
+
+from . import exceptions
+
+# The most queries to acquire and release a lock on PostgreSQL
+LOCK_QUERIES: int = 5
+
+
+class LockTimeout(TimeoutError):
+    """A lock was not acquired before the timeout"""
+
+    pass
+
+
+class LocalLock:
+    """Process-local lock with the number of threads holding or waiting"""
+
+    lock: threading.Lock
+    users: int
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.users = 0
+
+
+local_locks: Dict[int, LocalLock] = {}
+local_locks_lock = threading.Lock()
+
+
+@contextmanager
+def advisory_lock(key: int, timeout: float) -> Iterator[None]:
+    """
+    Hold an exclusive lock on a key, waiting for it up to a timeout
+
+    On PostgreSQL it is a session-level advisory lock, so it is held across
+    the processes and released with the database connection. On the other
+    databases it is a lock of this process.
+
+    Args:
+        key: The key to lock
+        timeout: The most seconds to wait for the lock
+
+    Raises:
+        LockTimeout: If the lock is not acquired before the timeout
+    """
+    if connection.vendor == "postgresql":
+        lock = pg_advisory_lock
+    else:
+        lock = local_lock
+
+    with lock(key, timeout):
+        yield
+
+
+@contextmanager
+def pg_advisory_lock(key: int, timeout: float) -> Iterator[None]:
+    """Hold a PostgreSQL advisory lock, see `advisory_lock`"""
+    with connection.cursor() as cursor:
+        cursor.execute("SELECT pg_try_advisory_lock(%s)", [key])
+        if not cursor.fetchone()[0]:
+            # Wait for the lock only when it is taken
+            cursor.execute(
+                "SELECT set_config('lock_timeout', %s, false)",
+                [f"{int(timeout * 1000)}ms"],
+            )
+            try:
+                cursor.execute("SELECT pg_advisory_lock(%s)", [key])
+            except OperationalError as e:
+                raise LockTimeout(f"Lock {key} not acquired") from e
+            finally:
+                cursor.execute("RESET lock_timeout")
+
+    try:
+        yield
+    finally:
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT pg_advisory_unlock(%s)", [key])
+
+
+@contextmanager
+def local_lock(key: int, timeout: float) -> Iterator[None]:
+    """Hold a lock of this process, see `advisory_lock`"""
+    with local_locks_lock:
+        local = local_locks.setdefault(key, LocalLock())
+        local.users += 1
+
+    try:
+        if not local.lock.acquire(timeout=timeout):
+            raise LockTimeout(f"Lock {key} not acquired")
+        try:
+            yield
+        finally:
+            local.lock.release()
+    finally:
+        with local_locks_lock:
+            local.users -= 1
+            if local.users == 0:
+                del local_locks[key]
+
+
+@contextmanager
+def adventure_turn(adventure_ids: Iterable[int]) -> Iterator[None]:
+    """
+    Hold the turns of adventures, so their turns are taken one at a time
+
+    A turn must be held before reading the latest message of its adventure,
+    as a turn creates a message following it. The adventures are locked in
+    ID order, so turns holding several adventures do not deadlock.
+
+    Args:
+        adventure_ids: The IDs of the adventures
+
+    Raises:
+        AdventureTurnInProgressException: If another turn of an adventure
+            is not done within `ADVENTURE_TURN_LOCK_TIMEOUT` seconds
+    """
+    ids: List[int] = sorted(set(adventure_ids))
+    with ExitStack() as stack:
+        for adventure_id in ids:
+            try:
+                stack.enter_context(
+                    advisory_lock(
+                        adventure_id, adventure_config.turn_lock_timeout
+                    )
+                )
+            except LockTimeout:
+                raise exceptions.AdventureTurnInProgressException()
+        yield
+
+
+class ReleasingStream:
+    """
+    Lines of a streaming response releasing held locks once it is closed
+
+    The response is closed even if it is never iterated, unlike a generator,
+    which runs its cleanup only once started.
+    """
+
+    lines: Generator
+    locks: ExitStack
+
+    def __init__(self, lines: Generator, locks: ExitStack):
+        self.lines = lines
+        self.locks = locks
+
+    def __iter__(self) -> Iterator:
+        return self.lines
+
+    def close(self):
+        """Close the lines and release the locks"""
+        try:
+            self.lines.close()
+        finally:
+            self.locks.close()
@@ -0,0 +1,94 @@
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from config.archive import archive_config
+from core.models import Adventure, AdventureArchive
+
+
+class Command(BaseCommand):
+    """Command class for archive_adventures."""
+
+    help = "Archive the conversations of idle adventures."
+
+    def add_arguments(self, parser):
+        """Add arguments to the command."""
+        parser.add_argument(
+            "--idle-days",
+            type=int,
+            default=archive_config.idle_days,
+        )
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=archive_config.batch_size,
+        )
+        parser.add_argument(
+            "--limit",
+            type=int,
+            default=None,
+            help="Maximum number of adventures to archive.",
+        )
+        parser.add_argument(
+            "--dry-run",
+            action="store_true",
+            help="Only count the idle adventures.",
+        )
+
+    def handle(self, *args, **options):
+        """Handle command."""
+        idle_before = timezone.now() - timedelta(days=options["idle_days"])
+        idle = Adventure.objects.get_idle(idle_before)
+
+        total = idle.count()
+        if options["limit"] is not None:
+            total = min(total, options["limit"])
+
+        if options["dry_run"]:
+            self.stdout.write(f"{total} adventures to archive")
+            return
+
+        archived = 0
+        messages = 0
+        size = 0
+        last_id = 0
+        try:
+            while archived < total:
+                ids = list(
+                    idle.filter(id__gt=last_id)
+                    .order_by("id")
+                    .values_list("id", flat=True)[
+                        : min(options["batch_size"], total - archived)
+                    ]
+                )
+                if not ids:
+                    break
+
+                for adventure_id in ids:
+                    archive = AdventureArchive.objects.archive(
+                        adventure_id, idle_before
+                    )
+                    if archive is None:
+                        continue
+
+                    archived += 1
+                    messages += archive.message_count
+                    size += archive.size
+
+                last_id = ids[-1]
+                self.stdout.write(
+                    f"Archived {archived}/{total} adventures,"
+                    f" {messages} messages in {size} bytes"
+                )
+        except Exception as e:
+            import traceback
+
+            traceback.print_exc()
+            raise CommandError(e)
+
+        self.stdout.write(
+            self.style.SUCCESS(
+                "Successfully archived %d adventures" % archived
+            )
+        )
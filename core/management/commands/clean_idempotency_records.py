@@ -0,0 +1,46 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from config.idempotency import idempotency_config
+from core.models import IdempotencyRecord
+
+
+class Command(BaseCommand):
+    """Command class for clean_idempotency_records."""
+
+    help = "Delete the stored responses of expired idempotency keys."
+
+    def add_arguments(self, parser):
+        """Add arguments to the command."""
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=idempotency_config.batch_size,
+        )
+        parser.add_argument(
+            "--dry-run",
+            action="store_true",
+            help="Only count the expired records.",
+        )
+
+    def handle(self, *args, **options):
+        """Handle command."""
+        if options["dry_run"]:
+            total = IdempotencyRecord.objects.get_expired().count()
+            self.stdout.write(f"{total} idempotency records to delete")
+            return
+
+        try:
+            deleted = IdempotencyRecord.objects.delete_expired(
+                options["batch_size"]
+            )
+        except Exception as e:
+            import traceback
+
+            traceback.print_exc()
+            raise CommandError(e)
+
+        self.stdout.write(
+            self.style.SUCCESS(
+                "Successfully deleted %d idempotency records" % deleted
+            )
+        )
@@ -0,0 +1,89 @@
+import sys
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils.dateparse import parse_datetime
+
+from core import export
+
+
+class Command(BaseCommand):
+    """Command class for export_convos."""
+
+    help = (
+        "Export the messages, chat completion usage and summaries as JSONL."
+    )
+
+    def add_arguments(self, parser):
+        """Add arguments to the command."""
+        parser.add_argument(
+            "--kinds",
+            nargs="+",
+            choices=export.KINDS,
+            default=export.KINDS,
+        )
+        parser.add_argument(
+            "--format",
+            choices=export.FORMATS,
+            default="jsonl",
+        )
+        parser.add_argument(
+            "--chunk-size",
+            type=int,
+            default=export.CHUNK_SIZE,
+        )
+        parser.add_argument("--user", type=int, default=None)
+        parser.add_argument("--scene", type=str, default=None)
+        parser.add_argument(
+            "--since",
+            type=parse_datetime,
+            default=None,
+            help="ISO 8601 time, inclusive.",
+        )
+        parser.add_argument(
+            "--until",
+            type=parse_datetime,
+            default=None,
+            help="ISO 8601 time, exclusive.",
+        )
+        parser.add_argument(
+            "--output",
+            type=str,
+            default=None,
+            help="Output file, standard output if not given.",
+        )
+
+    def handle(self, *args, **options):
+        """Handle command."""
+        lines = export.export(
+            options["kinds"],
+            export_format=options["format"],
+            chunk_size=options["chunk_size"],
+            user_id=options["user"],
+            scene_id=options["scene"],
+            since=options["since"],
+            until=options["until"],
+        )
+
+        try:
+            if options["output"] is None:
+                count = self.write_lines(sys.stdout, lines)
+            else:
+                with open(options["output"], "w", encoding="utf-8") as f:
+                    count = self.write_lines(f, lines)
+        except Exception as e:
+            import traceback
+
+            traceback.print_exc()
+            raise CommandError(e)
+
+        self.stderr.write(
+            self.style.SUCCESS("Successfully exported %d lines" % count)
+        )
+
+    def write_lines(self, f, lines) -> int:
+        """Write the export lines to a file and return the line count."""
+        count = 0
+        for line in lines:
+            f.write(line)
+            count += 1
+        return count
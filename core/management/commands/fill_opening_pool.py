@@ -0,0 +1,49 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from config.adventure import adventure_config
+from core.couplers.convo import ConvoCoupler
+from core.models import Adventure, PrestartedOpening
+
+
+class Command(BaseCommand):
+    """Command class for fill_opening_pool."""
+
+    help = "Fill the pool of pre-generated adventure openings."
+
+    def add_arguments(self, parser):
+        """Add arguments to the command."""
+        parser.add_argument(
+            "--system-message",
+            type=str,
+            default=adventure_config.system_message,
+        )
+        parser.add_argument(
+            "--start-message",
+            type=str,
+            default=adventure_config.start_message,
+        )
+
+    def handle(self, *args, **options):
+        """Handle command."""
+        try:
+            system_message = options["system_message"]
+            start_message = options["start_message"]
+
+            # Unsaved adventure to build the initial message with
+            adventure = Adventure(
+                system_message=system_message, start_message=start_message
+            )
+            init_message = ConvoCoupler(adventure).get_init_message()
+
+            count = PrestartedOpening.objects.refill(
+                system_message, start_message, init_message
+            )
+        except Exception as e:
+            import traceback
+
+            traceback.print_exc()
+            raise CommandError(e)
+
+        self.stdout.write(
+            self.style.SUCCESS("Successfully generated %d openings" % count)
+        )
@@ -1,6 +1,7 @@
 from django.core.management.base import BaseCommand, CommandError
 
-from core.models import Knowledge, Scene, SceneNpc, SceneNpcAdventurePair
+from core.deletion import BatchDeleter
+from core.models import Scene
 
 
 class Command(BaseCommand):
@@ -11,36 +12,52 @@ class Command(BaseCommand):
     def add_arguments(self, parser):
         """Add arguments to the command."""
         parser.add_argument("id", type=str)
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=1000,
+            help="Maximum number of rows deleted per transaction.",
+        )
+        parser.add_argument(
+            "--dry-run",
+            action="store_true",
+            help="Only count the rows to delete.",
+        )
 
     def handle(self, *args, **options):
         """Handle command."""
         try:
             id = options["id"]
-            self.stdout.write(self.style.SUCCESS("Removing %s" % id))
-            scene: Scene = Scene.objects.get(id=id)
+            if not Scene.objects.filter(id=id).exists():
+                raise Scene.DoesNotExist(f"Scene {id} does not exist")
 
-            # Remove scene npcs
-            scene_npcs: SceneNpc = SceneNpc.objects.filter(scene=scene)
-            scene_npcs.delete()
-
-            # Remove redundant knowledge
-            knowledge: Knowledge = Knowledge.objects.filter(npcs=None)
-            knowledge.delete()
-
-            # Remove scene npcs adventure pairs
-            scene_npc_adventure_pairs: SceneNpcAdventurePair = (
-                SceneNpcAdventurePair.objects.filter(npc=None)
+            self.stdout.write(self.style.SUCCESS("Removing %s" % id))
+            deleter = BatchDeleter(
+                batch_size=options["batch_size"],
+                dry_run=options["dry_run"],
+                progress=self.stdout.write,
             )
-            scene_npc_adventure_pairs.delete()
-
-            # Remove scene
-            scene.delete()
+            counts = deleter.delete_scene(id)
         except Exception as e:
             import traceback
 
             traceback.print_exc()
             raise CommandError(e)
 
+        for table, count in counts.items():
+            self.stdout.write(f"{table}: {count}")
+
+        if options["dry_run"]:
+            self.stdout.write(
+                self.style.SUCCESS(
+                    "Counted %d rows to remove" % sum(counts.values())
+                )
+            )
+            return
+
         self.stdout.write(
-            self.style.SUCCESS("Successfully removed scene %s" % id)
+            self.style.SUCCESS(
+                "Successfully removed scene %s, %d rows at %.0f rows/s"
+                % (id, sum(counts.values()), deleter.throughput)
+            )
         )
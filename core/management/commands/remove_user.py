@@ -0,0 +1,63 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from core.deletion import BatchDeleter
+from core.models import User
+
+
+class Command(BaseCommand):
+    """Command class for remove_user."""
+
+    help = "Remove a user with their adventures from the database."
+
+    def add_arguments(self, parser):
+        """Add arguments to the command."""
+        parser.add_argument("id", type=int)
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=1000,
+            help="Maximum number of rows deleted per transaction.",
+        )
+        parser.add_argument(
+            "--dry-run",
+            action="store_true",
+            help="Only count the rows to delete.",
+        )
+
+    def handle(self, *args, **options):
+        """Handle command."""
+        try:
+            id = options["id"]
+            if not User.objects.filter(id=id).exists():
+                raise User.DoesNotExist(f"User {id} does not exist")
+
+            self.stdout.write(self.style.SUCCESS("Removing %s" % id))
+            deleter = BatchDeleter(
+                batch_size=options["batch_size"],
+                dry_run=options["dry_run"],
+                progress=self.stdout.write,
+            )
+            counts = deleter.delete_user(id)
+        except Exception as e:
+            import traceback
+
+            traceback.print_exc()
+            raise CommandError(e)
+
+        for table, count in counts.items():
+            self.stdout.write(f"{table}: {count}")
+
+        if options["dry_run"]:
+            self.stdout.write(
+                self.style.SUCCESS(
+                    "Counted %d rows to remove" % sum(counts.values())
+                )
+            )
+            return
+
+        self.stdout.write(
+            self.style.SUCCESS(
+                "Successfully removed user %s, %d rows at %.0f rows/s"
+                % (id, sum(counts.values()), deleter.throughput)
+            )
+        )
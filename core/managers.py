@@ -1,20 +1,149 @@
-from datetime import datetime
-from typing import TYPE_CHECKING, List, Optional
-
-from django.db.models import Manager
-
+import logging
+import threading
+from datetime import datetime, timedelta
+from itertools import chain
+from typing import TYPE_CHECKING, List, Optional, Set, Tuple
+
+from django.db import connection, transaction
+from django.db.models import (
+    F,
+    Manager,
+    OuterRef,
+    Prefetch,
+    Q,
+    QuerySet,
+    Subquery,
+    Sum,
+)
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from config.adventure import adventure_config
+from config.archive import archive_config
+from config.idempotency import idempotency_config
 from data.scene import Scene as SceneData
 from engine import models as engine_models
+from engine.openai_api import call_api
 
+from . import quotas
 from .enums import ChatcmplKind
 
 if TYPE_CHECKING:
-    from .models import Adventure, Chatcmpl, Choice, Message, Scene, Summary
+    from .models import (
+        Adventure,
+        AdventureArchive,
+        Chatcmpl,
+        Choice,
+        IdempotencyRecord,
+        Message,
+        Scene,
+        Summary,
+        User,
+    )
+
+
+class AdventureManager(Manager):
+    """Manager for Adventure"""
+
+    def get_token_count_subquery(self, adventure: str = "pk") -> Coalesce:
+        """
+        Get the subquery summing the chat completion tokens of adventures
+
+        The archived token count is not included.
+
+        Args:
+            adventure: The field of the outer query referencing the adventure
+
+        Returns:
+            The expression of the token count
+        """
+        from .models import Chatcmpl
+
+        total_tokens = (
+            Chatcmpl.objects.filter(adventure=OuterRef(adventure))
+            .order_by()
+            .values("adventure")
+            .annotate(
+                total_tokens=Sum(F("completion_tokens") + F("prompt_tokens"))
+            )
+            .values("total_tokens")
+        )
+        return Coalesce(Subquery(total_tokens), 0)
+
+    def get_list(self, user: "User") -> QuerySet:
+        """
+        Get the adventures of a user with only the fields for listing
+
+        The latest message timestamp is joined and the token count is
+        annotated as `total_tokens` by a subquery, so a page is fetched in
+        one query.
+
+        Args:
+            user: The user
+
+        Returns:
+            The queryset of adventures
+        """
+        return (
+            self.filter(user=user)
+            .select_related("latest_message")
+            .only(
+                "id", "iteration", "archived_at", "latest_message__timestamp"
+            )
+            .annotate(
+                total_tokens=self.get_token_count_subquery()
+                + F("archived_token_count")
+            )
+        )
+
+    def get_idle(self, idle_before: datetime) -> QuerySet:
+        """
+        Get the unarchived adventures idle since before a time
+
+        Adventures of scene runners are not archived, as they are loaded
+        with their scene runner.
+
+        Args:
+            idle_before: The time before which the latest message was sent
+
+        Returns:
+            The queryset of adventures
+        """
+        return self.filter(
+            archived_at=None,
+            latest_message__timestamp__lt=idle_before,
+            scenenpcadventurepair=None,
+        )
 
 
 class SceneManager(Manager):
     """Manager for Scene"""
 
+    def get_npcs_prefetch(self) -> Prefetch:
+        """
+        Get the prefetch of the NPCs of scenes by index with their knowledges
+
+        Returns:
+            The prefetch
+        """
+        from .models import SceneNpc
+
+        return Prefetch(
+            "npcs",
+            queryset=SceneNpc.objects.order_by("index").prefetch_related(
+                "knowledges"
+            ),
+        )
+
+    def with_npcs(self) -> QuerySet:
+        """
+        Get the scenes with their NPCs and knowledges prefetched
+
+        Returns:
+            The queryset of scenes
+        """
+        return self.prefetch_related(self.get_npcs_prefetch())
+
     def initialize_scene(self, data: SceneData) -> "Scene":
         """
         Initialize a scene from scene data
@@ -77,24 +206,82 @@ class MessageManager(Manager):
         """
         Get the latest n messages for an adventure
 
+        The messages of an adventure are created in order, so the latest
+        ones are fetched in one query by ID instead of following the chain
+        of previous messages.
+
         Args:
             adventure: The adventure
             n: The number of messages
 
         Returns:
-            The list of messages
+            The list of messages in chronological order
         """
-        curr = adventure.latest_message
-        if curr is None:
+        if adventure.latest_message_id is None or n <= 0:
             return []
 
-        messages = []
-        for _ in range(n):
-            messages.append(curr)
-            curr = curr.prev
-            if curr is None:
-                break
-        return messages[::-1]
+        return list(
+            self.filter(
+                adventure=adventure, id__lte=adventure.latest_message_id
+            ).order_by("-id")[:n]
+        )[::-1]
+
+    def get_page(
+        self,
+        adventure: "Adventure",
+        length: int,
+        before: Optional[int] = None,
+        after: Optional[int] = None,
+    ) -> Tuple[List["Message"], bool]:
+        """
+        Get a page of messages for an adventure by message ID cursors
+
+        Without cursors, the page is the latest messages.
+
+        Args:
+            adventure: The adventure
+            length: The number of messages in the page
+            before: Get the messages before this message ID
+            after: Get the messages after this message ID
+
+        Returns:
+            The messages in chronological order, and whether there are more
+            messages beyond the page in the paging direction
+        """
+        messages = self.filter(adventure=adventure)
+
+        if after is not None:
+            messages = list(
+                messages.filter(id__gt=after).order_by("id")[: length + 1]
+            )
+            return messages[:length], len(messages) > length
+
+        if before is not None:
+            messages = messages.filter(id__lt=before)
+
+        messages = list(messages.order_by("-id")[: length + 1])
+        return messages[:length][::-1], len(messages) > length
+
+    def get_unsummarized_messages(
+        self, adventure: "Adventure", max_length: int
+    ) -> List["Message"]:
+        """
+        Get the latest messages not covered by the adventure summary
+
+        Args:
+            adventure: The adventure
+            max_length: The maximum number of messages
+
+        Returns:
+            The list of messages
+        """
+        messages = self.filter(adventure=adventure)
+
+        summary = adventure.summary
+        if summary is not None and summary.message_id is not None:
+            messages = messages.filter(id__gt=summary.message_id)
+
+        return list(messages.order_by("-id")[:max_length])[::-1]
 
 
 class SummaryManager(Manager):
@@ -115,7 +302,7 @@ class SummaryManager(Manager):
         """
         from .models import Summary
 
-        summary = Summary.from_engine_summary(adventure.id, summary)
+        summary = Summary.from_engine_summary(adventure, summary)
         summary.save()
         return summary
 
@@ -169,7 +356,7 @@ class ChatcmplManager(Manager):
         Args:
             adventure: The adventure
             summary: The summary
-            messages: The messages
+            messages: The consecutive history messages in chronological order
             chatcmpl: The engine Chatcmpl
             is_summary: It is a summary if True, else it is a message
             choice_index: The index of the chosen choice
@@ -190,8 +377,13 @@ class ChatcmplManager(Manager):
             model=chatcmpl.model,
             completion_tokens=chatcmpl.usage.completion_tokens,
             prompt_tokens=chatcmpl.usage.prompt_tokens,
+            history_start=messages[0].id if messages else None,
+            history_end=messages[-1].id if messages else None,
         )
-        chatcmpl_model.messages.set(messages)
+        if not chatcmpl.shared:
+            quotas.record_tokens(
+                adventure.user_id, chatcmpl.usage.total_tokens
+            )
 
         for i, choice in enumerate(chatcmpl.choices):
             # Create messages if it is selected
@@ -213,3 +405,348 @@ class ChatcmplManager(Manager):
             )
 
         return chatcmpl_model
+
+
+class PrestartedOpeningManager(Manager):
+    """Manager for PrestartedOpening"""
+
+    refilling: Set[str] = set()
+    refilling_lock = threading.Lock()
+
+    def get_expiry(self) -> datetime:
+        """
+        Get the creation time before which openings are expired
+
+        Returns:
+            The expiry time
+        """
+        return timezone.now() - timedelta(
+            seconds=adventure_config.opening_pool_ttl
+        )
+
+    def pop(
+        self, system_message: str, start_message: str
+    ) -> Optional[engine_models.Chatcmpl]:
+        """
+        Atomically take the oldest alive opening of the template
+
+        Args:
+            system_message: The system message of the template
+            start_message: The start message of the template
+
+        Returns:
+            The opening API response, None if the pool is empty
+        """
+        from .models import PrestartedOpening
+
+        template = PrestartedOpening.get_template(
+            system_message, start_message
+        )
+
+        with transaction.atomic():
+            opening = (
+                self.select_for_update(skip_locked=True)
+                .filter(template=template, created_at__gte=self.get_expiry())
+                .order_by("created_at")
+                .first()
+            )
+            if opening is None:
+                return None
+
+            opening.delete()
+
+        return engine_models.Chatcmpl.model_validate(opening.chatcmpl)
+
+    def refill(
+        self,
+        system_message: str,
+        start_message: str,
+        init_message: engine_models.Message,
+    ) -> int:
+        """
+        Fill the pool of the template up to the configured size
+
+        Args:
+            system_message: The system message of the template
+            start_message: The start message of the template
+            init_message: The initial message to generate openings with
+
+        Returns:
+            The number of openings generated
+        """
+        from .models import PrestartedOpening
+
+        template = PrestartedOpening.get_template(
+            system_message, start_message
+        )
+
+        expiry = self.get_expiry()
+        self.filter(template=template, created_at__lt=expiry).delete()
+
+        missing = (
+            adventure_config.opening_pool_size
+            - self.filter(template=template, created_at__gte=expiry).count()
+        )
+        for _ in range(missing):
+            # Not shared with the openings in flight, so the pool varies
+            chatcmpl = call_api([init_message], coalesce=False)
+            self.create(
+                template=template,
+                system_message=system_message,
+                start_message=start_message,
+                chatcmpl=chatcmpl.model_dump(mode="json"),
+            )
+
+        return max(missing, 0)
+
+    def refill_async(
+        self,
+        system_message: str,
+        start_message: str,
+        init_message: engine_models.Message,
+    ):
+        """
+        Fill the pool of the template in a background thread
+
+        Only one refill per template runs at a time in a process.
+
+        Args:
+            system_message: The system message of the template
+            start_message: The start message of the template
+            init_message: The initial message to generate openings with
+        """
+        from .models import PrestartedOpening
+
+        template = PrestartedOpening.get_template(
+            system_message, start_message
+        )
+
+        with self.refilling_lock:
+            if template in self.refilling:
+                return
+            self.refilling.add(template)
+
+        def run():
+            try:
+                self.refill(system_message, start_message, init_message)
+            except Exception as e:
+                logging.getLogger(__name__).error(
+                    f"Failed to refill opening pool: {e}"
+                )
+            finally:
+                with self.refilling_lock:
+                    self.refilling.discard(template)
+                connection.close()
+
+        threading.Thread(target=run, daemon=True).start()
+
+
+class AdventureArchiveManager(Manager):
+    """Manager for AdventureArchive"""
+
+    def archive(
+        self, adventure_id: int, idle_before: datetime
+    ) -> Optional["AdventureArchive"]:
+        """
+        Move the conversation of an idle adventure into an archive
+
+        The messages, summaries, chat completions and choices are written to
+        a compressed JSONL archive and deleted, leaving the adventure as a
+        stub with its token count.
+
+        Args:
+            adventure_id: The ID of the adventure
+            idle_before: The time before which the latest message was sent
+
+        Returns:
+            The created archive, None if the adventure is no longer idle
+        """
+        from .archive import (
+            compress,
+            dump_rows,
+            get_path,
+            remove_file,
+            write_file,
+        )
+        from .models import (
+            Adventure,
+            AdventureArchive,
+            Chatcmpl,
+            Choice,
+            Message,
+            Summary,
+        )
+
+        with transaction.atomic():
+            adventure = (
+                Adventure.objects.select_for_update()
+                .filter(id=adventure_id)
+                .first()
+            )
+            if adventure is None or not (
+                Adventure.objects.get_idle(idle_before)
+                .filter(id=adventure_id)
+                .exists()
+            ):
+                return None
+
+            messages = Message.objects.filter(adventure=adventure)
+            chatcmpls = Chatcmpl.objects.filter(adventure=adventure)
+            choices = Choice.objects.filter(chatcmpl__adventure=adventure)
+            summary_ids = list(
+                Summary.objects.filter(
+                    Q(choice__chatcmpl__adventure=adventure)
+                    | Q(chatcmpl__adventure=adventure)
+                    | Q(id=adventure.summary_id)
+                )
+                .values_list("id", flat=True)
+                .distinct()
+            )
+            summaries = Summary.objects.filter(id__in=summary_ids)
+
+            data = dump_rows(
+                chain(
+                    [adventure],
+                    messages.order_by("id").iterator(),
+                    summaries.order_by("id").iterator(),
+                    chatcmpls.order_by("created_at", "id").iterator(),
+                    choices.order_by("id").iterator(),
+                )
+            )
+            compressed = compress(data, archive_config.compression)
+
+            archive = AdventureArchive(
+                adventure=adventure,
+                compression=archive_config.compression,
+                message_count=messages.count(),
+                size=len(compressed),
+            )
+            if archive_config.storage == "disk":
+                archive.path = get_path(adventure.id, archive.compression)
+                write_file(archive.path, compressed)
+            else:
+                archive.data = compressed
+
+            try:
+                archive.save()
+
+                token_count = adventure.token_count
+                Adventure.objects.filter(id=adventure.id).update(
+                    summary=None,
+                    latest_message=None,
+                    archived_at=timezone.now(),
+                    archived_token_count=token_count,
+                )
+
+                # Delete from the leaves, so nothing cascades to the stub
+                chatcmpls.delete()
+                summaries.delete()
+                messages.delete()
+            except Exception:
+                if archive.path:
+                    remove_file(archive.path)
+                raise
+
+        return archive
+
+    def restore(self, adventure: "Adventure") -> "Adventure":
+        """
+        Restore the conversation of an archived adventure
+
+        Args:
+            adventure: The adventure
+
+        Returns:
+            The adventure, reloaded if it was restored
+        """
+        from .archive import load_rows, remove_file, save_rows
+        from .models import Adventure
+
+        if adventure.archived_at is None:
+            return adventure
+
+        with transaction.atomic():
+            adventure = Adventure.objects.select_for_update().get(
+                id=adventure.id
+            )
+            if adventure.archived_at is None:
+                return adventure
+
+            archive = self.get(adventure=adventure)
+            rows = load_rows(archive.read())
+            stored = next(rows).object
+            save_rows(rows)
+
+            adventure.summary_id = stored.summary_id
+            adventure.latest_message_id = stored.latest_message_id
+            adventure.archived_at = None
+            adventure.archived_token_count = 0
+            adventure.save()
+
+            archive.delete()
+            if archive.path:
+                path = archive.path
+                transaction.on_commit(lambda: remove_file(path))
+
+        return adventure
+
+
+class IdempotencyRecordManager(Manager):
+    """Manager for IdempotencyRecord"""
+
+    def get_expiry(self) -> datetime:
+        """
+        Get the creation time before which records are expired
+
+        Returns:
+            The expiry time
+        """
+        return timezone.now() - timedelta(seconds=idempotency_config.ttl)
+
+    def get_unexpired(
+        self, user: "User", key: str
+    ) -> Optional["IdempotencyRecord"]:
+        """
+        Get the unexpired record of an idempotency key of a user
+
+        An expired record is deleted, so the key can be used again.
+
+        Args:
+            user: The user
+            key: The idempotency key
+
+        Returns:
+            The record, None if there is none or it is expired
+        """
+        record = self.filter(user=user, key=key).first()
+        if record is not None and record.created_at < self.get_expiry():
+            record.delete()
+            return None
+        return record
+
+    def get_expired(self) -> QuerySet:
+        """
+        Get the expired records
+
+        Returns:
+            The query set of the expired records
+        """
+        return self.filter(created_at__lt=self.get_expiry())
+
+    def delete_expired(self, batch_size: int) -> int:
+        """
+        Delete the expired records in batches
+
+        Args:
+            batch_size: The number of records deleted per query
+
+        Returns:
+            The number of deleted records
+        """
+        expired = self.get_expired()
+        deleted = 0
+        while True:
+            ids = list(expired.values_list("id", flat=True)[:batch_size])
+            if not ids:
+                return deleted
+            deleted += self.filter(id__in=ids).delete()[0]
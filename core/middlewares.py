@@ -1,8 +1,21 @@
 import logging
 
-from django.http import HttpRequest, HttpResponse
+from django.core.exceptions import MiddlewareNotUsed
+from django.http import HttpRequest, HttpResponse, JsonResponse
+from rest_framework.request import Request
+from rest_framework.settings import api_settings
 
 from config.convo import convo_config
+from config.profiler import profiler_config
+from config.query_budget import query_budget_config
+
+from .profiler import profile_request, save_profile
+from .query_budget import (
+    QueryBudgetExceeded,
+    check_query_budget,
+    count_queries,
+    get_query_budget,
+)
 
 
 class RequestLogMiddleware:
@@ -27,10 +40,10 @@ class RequestLogMiddleware:
             "request_body": request.body,
         }
 
-        if request.method != "DELETE":
-            response: HttpResponse = self.get_response(request)
+        response: HttpResponse = self.get_response(request)
 
-            if response["content-type"] == "application/json":
+        if request.method != "DELETE":
+            if response.get("content-type") == "application/json":
                 if getattr(response, "streaming", False):
                     response_body = "<<<Streaming>>>"
                 else:
@@ -46,3 +59,123 @@ class RequestLogMiddleware:
         self.logger.debug("%s", log_data)
 
         return response
+
+
+class QueryBudgetMiddleware:
+    """
+    Check the database queries of requests against the budgets of the views
+
+    The budget of a view is its `query_budget` attribute. Exceeding it
+    raises `QueryBudgetExceeded` in strict mode, which is the default in
+    debug mode, and logs a warning with the repeated query fingerprints
+    otherwise. The queries of a streaming response made after it is
+    returned are not counted.
+    """
+
+    logger: logging.Logger
+    get_response: callable
+
+    def __init__(self, get_response):
+        if not query_budget_config.enabled:
+            raise MiddlewareNotUsed()
+
+        self.get_response = get_response
+        self.logger = logging.getLogger(__name__)
+        self.logger.setLevel(query_budget_config.log_level)
+
+    def __call__(self, request: HttpRequest):
+        """Count the queries of the request and check them"""
+        with count_queries() as counter:
+            response = self.get_response(request)
+
+        resolver_match = getattr(request, "resolver_match", None)
+        if resolver_match is None:
+            return response
+
+        budget = get_query_budget(resolver_match.func)
+        if budget is None:
+            return response
+
+        report = check_query_budget(budget, counter.queries)
+        if report is None:
+            return response
+
+        message = f"{request.method} {request.path}: {report}"
+        if query_budget_config.is_strict:
+            raise QueryBudgetExceeded(message)
+
+        self.logger.warning("%s", message)
+        return response
+
+
+class ProfileMiddleware:
+    """
+    Profile the requests of admins asking for it
+
+    A request is profiled if it has the profiler header or query parameter,
+    `inline` to return the profile instead of the response, or any other
+    value to save the profile to the profile directory. Other requests are
+    passed through untouched.
+    """
+
+    logger: logging.Logger
+    get_response: callable
+
+    def __init__(self, get_response):
+        if not profiler_config.enabled:
+            raise MiddlewareNotUsed()
+
+        self.get_response = get_response
+        self.logger = logging.getLogger(__name__)
+        self.logger.setLevel(profiler_config.log_level)
+
+    def __call__(self, request: HttpRequest):
+        """Profile the request if asked for by an admin"""
+        mode = request.headers.get(profiler_config.header) or request.GET.get(
+            profiler_config.query_param
+        )
+        if not mode or not self.is_admin(request):
+            return self.get_response(request)
+
+        response, profile, raw = profile_request(self.get_response, request)
+        self.logger.info(
+            "Profiled %s %s in %.1f ms with %d queries",
+            profile["method"],
+            profile["path"],
+            profile["ms"],
+            profile["query_count"],
+        )
+
+        if mode == "inline":
+            return JsonResponse(profile)
+
+        path = save_profile(profile, raw)
+        self.logger.info("Profile saved to %s", path)
+        response["X-Profile-Id"] = profile["id"]
+        return response
+
+    def is_admin(self, request: HttpRequest) -> bool:
+        """
+        Return if the request is made by an admin
+
+        The API authenticates in the views, so the request is authenticated
+        here too, only when profiling is asked for.
+
+        Args:
+            request: The request
+
+        Returns:
+            True if the user is a staff member, False otherwise
+        """
+        if request.user.is_authenticated:
+            return request.user.is_staff
+
+        for authenticator in api_settings.DEFAULT_AUTHENTICATION_CLASSES:
+            try:
+                result = authenticator().authenticate(Request(request))
+            except Exception:
+                return False
+            if result is not None:
+                return result[0].is_staff
+
+        return False
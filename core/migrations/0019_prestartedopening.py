@@ -0,0 +1,24 @@
+# Generated by Django 4.2.5 on 2026-10-19 13:53
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0018_alter_scenenpcadventurepair_adventure_and_more'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PrestartedOpening',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('template', models.CharField(db_index=True, max_length=64)),
+                ('system_message', models.TextField()),
+                ('start_message', models.TextField()),
+                ('chatcmpl', models.JSONField()),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+            ],
+        ),
+    ]
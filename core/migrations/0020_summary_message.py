@@ -0,0 +1,19 @@
+# Generated by Django 4.2.5 on 2026-10-19 13:55
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0019_prestartedopening'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='summary',
+            name='message',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='core.message'),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 4.2.5 on 2026-10-19 13:58
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0020_summary_message'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='scenenpc',
+            name='knowledge_version',
+            field=models.CharField(blank=True, max_length=64),
+        ),
+    ]
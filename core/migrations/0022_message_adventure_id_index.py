@@ -0,0 +1,17 @@
+# Generated by Django 4.2.5 on 2026-10-19 13:59
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0021_scenenpc_knowledge_version'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='message',
+            index=models.Index(fields=['adventure', 'id'], name='core_messag_adventu_d623e5_idx'),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 4.2.5 on 2026-10-19 14:00
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0022_message_adventure_id_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='scene',
+            name='version',
+            field=models.CharField(blank=True, max_length=64),
+        ),
+    ]
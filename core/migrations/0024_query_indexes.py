@@ -0,0 +1,51 @@
+# Generated by Django 4.2.5 on 2026-10-19 14:04
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0023_scene_version'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='adventure',
+            index=models.Index(fields=['user', '-id'], name='core_advent_user_id_62eeb2_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='chatcmpl',
+            index=models.Index(fields=['adventure'], include=('completion_tokens', 'prompt_tokens'), name='core_chatcmpl_adv_tokens_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='scenenpc',
+            index=models.Index(fields=['scene', 'index'], name='core_scenen_scene_i_ca03c4_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='scenenpcadventurepair',
+            index=models.Index(fields=['runner', 'npc'], name='core_scenen_runner__82c784_idx'),
+        ),
+        migrations.AlterField(
+            model_name='adventure',
+            name='user',
+            field=models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AlterField(
+            model_name='chatcmpl',
+            name='adventure',
+            field=models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, to='core.adventure'),
+        ),
+        migrations.AlterField(
+            model_name='scenenpc',
+            name='scene',
+            field=models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='npcs', to='core.scene'),
+        ),
+        migrations.AlterField(
+            model_name='scenenpcadventurepair',
+            name='runner',
+            field=models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, to='core.scenerunner'),
+        ),
+    ]
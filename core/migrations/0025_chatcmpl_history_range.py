@@ -0,0 +1,80 @@
+# Generated by Django 4.2.5 on 2026-10-19 14:06
+
+from django.db import migrations, models
+from django.db.models import Max, Min
+
+BATCH_SIZE = 1000
+
+
+def messages_to_history_range(apps, schema_editor):
+    Chatcmpl = apps.get_model('core', 'Chatcmpl')
+    Through = Chatcmpl.messages.through
+
+    ranges = (
+        Through.objects.order_by()
+        .values('chatcmpl_id')
+        .annotate(start=Min('message_id'), end=Max('message_id'))
+        .iterator(chunk_size=BATCH_SIZE)
+    )
+
+    batch = []
+    for r in ranges:
+        batch.append(
+            Chatcmpl(
+                id=r['chatcmpl_id'],
+                history_start=r['start'],
+                history_end=r['end'],
+            )
+        )
+        if len(batch) == BATCH_SIZE:
+            Chatcmpl.objects.bulk_update(batch, ['history_start', 'history_end'])
+            batch = []
+    Chatcmpl.objects.bulk_update(batch, ['history_start', 'history_end'])
+
+
+def history_range_to_messages(apps, schema_editor):
+    Chatcmpl = apps.get_model('core', 'Chatcmpl')
+    Message = apps.get_model('core', 'Message')
+    Through = Chatcmpl.messages.through
+
+    chatcmpls = Chatcmpl.objects.filter(history_start__isnull=False).values(
+        'id', 'adventure_id', 'history_start', 'history_end'
+    )
+    for c in chatcmpls.iterator(chunk_size=BATCH_SIZE):
+        message_ids = Message.objects.filter(
+            adventure_id=c['adventure_id'],
+            id__range=(c['history_start'], c['history_end']),
+        ).values_list('id', flat=True)
+        Through.objects.bulk_create(
+            [
+                Through(chatcmpl_id=c['id'], message_id=message_id)
+                for message_id in message_ids
+            ]
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0024_query_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='chatcmpl',
+            name='history_end',
+            field=models.PositiveBigIntegerField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='chatcmpl',
+            name='history_start',
+            field=models.PositiveBigIntegerField(blank=True, null=True),
+        ),
+        migrations.RunPython(
+            messages_to_history_range, history_range_to_messages
+        ),
+        migrations.RemoveField(
+            model_name='chatcmpl',
+            name='messages',
+        ),
+    ]
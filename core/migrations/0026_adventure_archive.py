@@ -0,0 +1,37 @@
+# Generated by Django 4.2.5 on 2026-10-19 14:09
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0025_chatcmpl_history_range'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='adventure',
+            name='archived_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='adventure',
+            name='archived_token_count',
+            field=models.PositiveIntegerField(blank=True, default=0),
+        ),
+        migrations.CreateModel(
+            name='AdventureArchive',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('compression', models.CharField(max_length=8)),
+                ('data', models.BinaryField(blank=True, null=True)),
+                ('path', models.TextField(blank=True)),
+                ('message_count', models.PositiveIntegerField()),
+                ('size', models.PositiveIntegerField()),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('adventure', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='archive', to='core.adventure')),
+            ],
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 4.2.5 on 2026-10-19 14:48
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0027_idempotency_record'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='UserQuota',
+            fields=[
+                ('user', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='quota', serialize=False, to=settings.AUTH_USER_MODEL)),
+                ('requests_per_minute', models.PositiveIntegerField(blank=True, null=True)),
+                ('tokens_per_day', models.PositiveIntegerField(blank=True, null=True)),
+            ],
+        ),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 4.2.5 on 2026-10-19 15:04
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0028_user_quota'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='adventure',
+            index=models.Index(condition=models.Q(('archived_at__isnull', False)), fields=['archived_at'], include=('archived_token_count',), name='core_adventure_archived_idx'),
+        ),
+    ]
@@ -0,0 +1,50 @@
+# Generated by Django 4.2.5 on 2026-10-19 15:10
+
+from django.db import migrations
+
+from data.scene import Knowledge
+from engine.knowledge import KnowledgeSchema
+
+BATCH_SIZE = 1000
+
+
+def backfill_knowledge_version(apps, schema_editor):
+    SceneNpc = apps.get_model('core', 'SceneNpc')
+
+    npcs = (
+        SceneNpc.objects.filter(knowledge_version='')
+        .only('id')
+        .prefetch_related('knowledges')
+    )
+
+    batch = []
+    for npc in npcs.iterator(chunk_size=BATCH_SIZE):
+        npc.knowledge_version = KnowledgeSchema.get_version(
+            [
+                Knowledge(
+                    id=k.id,
+                    name=k.name,
+                    description=k.description,
+                    knowledge=k.knowledge,
+                )
+                for k in npc.knowledges.all()
+            ]
+        )
+        batch.append(npc)
+        if len(batch) == BATCH_SIZE:
+            SceneNpc.objects.bulk_update(batch, ['knowledge_version'])
+            batch = []
+    SceneNpc.objects.bulk_update(batch, ['knowledge_version'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0029_adventure_archived_index'),
+    ]
+
+    operations = [
+        migrations.RunPython(
+            backfill_knowledge_version, migrations.RunPython.noop
+        ),
+    ]
@@ -0,0 +1,69 @@
+# Generated by Django 4.2.5 on 2026-10-19 15:14
+
+import hashlib
+
+from django.db import migrations
+from django.db.models import Prefetch
+
+from data import scene as scene_data
+
+
+def backfill_scene_version(apps, schema_editor):
+    Scene = apps.get_model('core', 'Scene')
+    SceneNpc = apps.get_model('core', 'SceneNpc')
+    Knowledge = apps.get_model('core', 'Knowledge')
+
+    # The order of the knowledges in the scene files is not stored, so they
+    # are ordered by ID to hash the same content to the same version
+    scenes = Scene.objects.filter(version='').prefetch_related(
+        Prefetch(
+            'npcs',
+            queryset=SceneNpc.objects.order_by('index').prefetch_related(
+                Prefetch('knowledges', queryset=Knowledge.objects.order_by('id'))
+            ),
+        )
+    )
+
+    batch = []
+    for scene in scenes:
+        data = scene_data.Scene(
+            id=scene.id,
+            name=scene.name,
+            system_message=scene.system_message,
+            npcs=[
+                scene_data.SceneNpc(
+                    id=npc.id,
+                    name=npc.name,
+                    title=npc.title,
+                    character=npc.character,
+                    knowledges=[
+                        scene_data.Knowledge(
+                            id=k.id,
+                            name=k.name,
+                            description=k.description,
+                            knowledge=k.knowledge,
+                        )
+                        for k in npc.knowledges.all()
+                    ],
+                )
+                for npc in scene.npcs.all()
+            ],
+        )
+        scene.version = hashlib.sha256(
+            data.model_dump_json().encode()
+        ).hexdigest()
+        batch.append(scene)
+    Scene.objects.bulk_update(batch, ['version'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0030_scenenpc_knowledge_version_backfill'),
+    ]
+
+    operations = [
+        migrations.RunPython(
+            backfill_scene_version, migrations.RunPython.noop
+        ),
+    ]
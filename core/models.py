@@ -1,6 +1,7 @@
 from __future__ import annotations
 
-from typing import Optional
+import hashlib
+from typing import Dict, List, Optional
 
 from django.contrib.auth.models import AbstractUser
 from django.db import models
@@ -8,8 +9,9 @@ from django.db import models
 import data.scene
 from config.adventure import adventure_config
 from engine import models as engine_models
+from engine.knowledge import KnowledgeSchema
 
-from . import enums, managers
+from . import archive, enums, managers, quotas
 
 
 class User(AbstractUser):
@@ -25,6 +27,13 @@ class Summary(models.Model):
     """Summary model"""
 
     summary = models.TextField()
+    message = models.ForeignKey(
+        "Message",
+        related_name="+",
+        null=True,
+        blank=True,
+        on_delete=models.SET_NULL,
+    )
 
     objects = managers.SummaryManager()
 
@@ -34,6 +43,8 @@ class Summary(models.Model):
         """
         Create a Summary from an engine Summary
 
+        The summary covers the messages up to the latest message.
+
         Args:
             adventure: The adventure
             summary: The engine summary Message
@@ -43,13 +54,14 @@ class Summary(models.Model):
         """
         return Summary(
             summary=summary.content,
+            message_id=adventure.latest_message_id,
         )
 
 
 class Adventure(models.Model):
     """Adventure model"""
 
-    user = models.ForeignKey(User, on_delete=models.CASCADE)
+    user = models.ForeignKey(User, db_index=False, on_delete=models.CASCADE)
     summary = models.OneToOneField(
         Summary,
         null=True,
@@ -70,6 +82,22 @@ class Adventure(models.Model):
         default=adventure_config.start_message, blank=True
     )
     iteration = models.PositiveIntegerField(default=0, blank=True)
+    archived_at = models.DateTimeField(null=True, blank=True)
+    archived_token_count = models.PositiveIntegerField(default=0, blank=True)
+
+    objects = managers.AdventureManager()
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["user", "-id"]),
+            # Covers the token count sums of the archived adventures
+            models.Index(
+                fields=["archived_at"],
+                include=["archived_token_count"],
+                condition=models.Q(archived_at__isnull=False),
+                name="core_adventure_archived_idx",
+            ),
+        ]
 
     @property
     def token_count(self) -> int:
@@ -84,7 +112,7 @@ class Adventure(models.Model):
                 token=models.F("completion_tokens") + models.F("prompt_tokens")
             ).aggregate(models.Sum("token"))["token__sum"]
             or 0
-        )
+        ) + self.archived_token_count
 
 
 class Scene(models.Model):
@@ -93,6 +121,7 @@ class Scene(models.Model):
     id = models.TextField(primary_key=True, unique=True)
     name = models.TextField()
     system_message = models.TextField()
+    version = models.CharField(max_length=64, blank=True)
 
     # Backward typehint
     npcs: models.QuerySet[SceneNpc]
@@ -113,18 +142,27 @@ class Scene(models.Model):
             id=scene_data.id,
             name=scene_data.name,
             system_message=scene_data.system_message,
+            version=hashlib.sha256(
+                scene_data.model_dump_json().encode()
+            ).hexdigest(),
         )
 
     def to_scene_data(self) -> data.scene.Scene:
         """
         Create an engine Scene from a Scene
 
+        The NPCs and their knowledges are prefetched unless they already
+        are, so the scene is read in three queries.
+
         Args:
             scene: The Scene
 
         Returns:
             The created engine Scene
         """
+        models.prefetch_related_objects(
+            [self], Scene.objects.get_npcs_prefetch()
+        )
         return data.scene.Scene(
             id=self.id,
             name=self.name,
@@ -190,9 +228,13 @@ class SceneNpc(models.Model):
     character = models.TextField()
     knowledges = models.ManyToManyField(Knowledge, related_name="npcs")
     scene = models.ForeignKey(
-        Scene, related_name="npcs", on_delete=models.CASCADE
+        Scene, related_name="npcs", db_index=False, on_delete=models.CASCADE
     )
     index = models.PositiveIntegerField()
+    knowledge_version = models.CharField(max_length=64, blank=True)
+
+    class Meta:
+        indexes = [models.Index(fields=["scene", "index"])]
 
     def from_scene_data_npc(
         npc: data.scene.SceneNpc, scene: Scene, index: int
@@ -215,6 +257,7 @@ class SceneNpc(models.Model):
             character=npc.character,
             scene=scene,
             index=index,
+            knowledge_version=KnowledgeSchema.get_version(npc.knowledges),
         )
         return npc
 
@@ -233,12 +276,21 @@ class SceneNpc(models.Model):
             name=self.name,
             title=self.title,
             character=self.character,
-            knowledges=[
-                knowledge.to_scene_data_knowledge()
-                for knowledge in self.knowledges.all()
-            ],
+            knowledges=self.get_scene_data_knowledges(),
         )
 
+    def get_scene_data_knowledges(self) -> List[data.scene.Knowledge]:
+        """
+        Create the engine Knowledges of the SceneNpc
+
+        Returns:
+            The created engine Knowledges
+        """
+        return [
+            knowledge.to_scene_data_knowledge()
+            for knowledge in self.knowledges.all()
+        ]
+
 
 class SceneRunner(models.Model):
     """Scene runner model"""
@@ -253,11 +305,16 @@ class SceneRunner(models.Model):
 class SceneNpcAdventurePair(models.Model):
     """Scene NPC adventure pair model"""
 
-    runner = models.ForeignKey(SceneRunner, on_delete=models.CASCADE)
+    runner = models.ForeignKey(
+        SceneRunner, db_index=False, on_delete=models.CASCADE
+    )
     npc = models.ForeignKey(SceneNpc, on_delete=models.CASCADE)
     adventure = models.OneToOneField(Adventure, on_delete=models.CASCADE)
     knowledge_selection_token_count = models.PositiveIntegerField(default=0)
 
+    class Meta:
+        indexes = [models.Index(fields=["runner", "npc"])]
+
     @property
     def token_count(self) -> int:
         """
@@ -289,12 +346,18 @@ class Message(models.Model):
 
     objects = managers.MessageManager()
 
+    class Meta:
+        indexes = [models.Index(fields=["adventure", "id"])]
+
     def from_engine_message(
         adventure: Adventure, message: engine_models.Message
     ) -> Message:
         """
         Create a Message from an engine Message
 
+        The message follows the latest message of the adventure instance,
+        which the couplers keep up to date.
+
         Args:
             adventure: The adventure
             message: The engine Message
@@ -302,11 +365,9 @@ class Message(models.Model):
         Returns:
             The created Message
         """
-        prev = Adventure.objects.get(id=adventure.id).latest_message
-
         return Message(
             adventure=adventure,
-            prev=prev,
+            prev_id=adventure.latest_message_id,
             role=enums.Role.from_engine_role(message.role),
             content=message.content,
             name=message.name,
@@ -333,11 +394,14 @@ class Chatcmpl(models.Model):
     """Chat completion model"""
 
     id = models.TextField(primary_key=True, unique=True)
-    adventure = models.ForeignKey(Adventure, on_delete=models.CASCADE)
+    adventure = models.ForeignKey(
+        Adventure, db_index=False, on_delete=models.CASCADE
+    )
     summary = models.ForeignKey(
         Summary, null=True, blank=True, on_delete=models.CASCADE
     )
-    messages = models.ManyToManyField(Message)
+    history_start = models.PositiveBigIntegerField(null=True, blank=True)
+    history_end = models.PositiveBigIntegerField(null=True, blank=True)
     kind = models.CharField(max_length=1, choices=enums.ChatcmplKind.choices)
     object_name = models.TextField()
     created_at = models.DateTimeField()
@@ -347,6 +411,36 @@ class Chatcmpl(models.Model):
 
     objects = managers.ChatcmplManager()
 
+    class Meta:
+        indexes = [
+            # Covers the token count sums by adventure
+            models.Index(
+                fields=["adventure"],
+                include=["completion_tokens", "prompt_tokens"],
+                name="core_chatcmpl_adv_tokens_idx",
+            )
+        ]
+
+    @property
+    def messages(self) -> models.QuerySet[Message]:
+        """
+        Return the history messages taken by the chat completion
+
+        The history is the range of message IDs from `history_start` to
+        `history_end` in the adventure, as messages of an adventure are
+        created in order.
+
+        Returns:
+            The queryset of messages in chronological order
+        """
+        if self.history_start is None:
+            return Message.objects.none()
+
+        return Message.objects.filter(
+            adventure_id=self.adventure_id,
+            id__range=(self.history_start, self.history_end),
+        ).order_by("id")
+
 
 class Choice(models.Model):
     """Message choice model given by Chatcmpl"""
@@ -388,3 +482,100 @@ class Choice(models.Model):
             summary=summary,
             finish_reason=choice.finish_reason,
         )
+
+
+class PrestartedOpening(models.Model):
+    """Pre-generated opening API response of an adventure template"""
+
+    template = models.CharField(max_length=64, db_index=True)
+    system_message = models.TextField()
+    start_message = models.TextField()
+    chatcmpl = models.JSONField()
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    objects = managers.PrestartedOpeningManager()
+
+    @staticmethod
+    def get_template(system_message: str, start_message: str) -> str:
+        """
+        Get the template key of the system and start messages
+
+        Args:
+            system_message: The system message
+            start_message: The start message
+
+        Returns:
+            The template key
+        """
+        return hashlib.sha256(
+            f"{system_message}\0{start_message}".encode()
+        ).hexdigest()
+
+
+class AdventureArchive(models.Model):
+    """Compressed archive of the conversation of an idle adventure"""
+
+    adventure = models.OneToOneField(
+        Adventure, related_name="archive", on_delete=models.CASCADE
+    )
+    compression = models.CharField(max_length=8)
+    data = models.BinaryField(null=True, blank=True)
+    path = models.TextField(blank=True)
+    message_count = models.PositiveIntegerField()
+    size = models.PositiveIntegerField()
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    objects = managers.AdventureArchiveManager()
+
+    def read(self) -> bytes:
+        """
+        Read the archived conversation
+
+        Returns:
+            The JSONL of the archived rows, the adventure first
+        """
+        data = (
+            archive.read_file(self.path)
+            if self.path
+            else bytes(self.data)
+        )
+        return archive.decompress(data, self.compression)
+
+
+class IdempotencyRecord(models.Model):
+    """Stored response of a request by its idempotency key"""
+
+    user = models.ForeignKey(User, db_index=False, on_delete=models.CASCADE)
+    key = models.CharField(max_length=255)
+    fingerprint = models.CharField(max_length=64)
+    status_code = models.PositiveSmallIntegerField()
+    response = models.JSONField()
+    created_at = models.DateTimeField(auto_now_add=True, db_index=True)
+
+    objects = managers.IdempotencyRecordManager()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=["user", "key"], name="core_idempotency_user_key"
+            )
+        ]
+
+
+class UserQuota(models.Model):
+    """Quota limits of a user, the defaults where null and none where 0"""
+
+    user = models.OneToOneField(
+        User, primary_key=True, related_name="quota", on_delete=models.CASCADE
+    )
+    requests_per_minute = models.PositiveIntegerField(null=True, blank=True)
+    tokens_per_day = models.PositiveIntegerField(null=True, blank=True)
+
+    def get_usages(self) -> Dict[str, quotas.QuotaUsage]:
+        """
+        Get the usages of the quotas by the user
+
+        Returns:
+            The usages by quota name
+        """
+        return quotas.get_usages(self.user_id)
@@ -0,0 +1,12 @@
+from rest_framework.pagination import CursorPagination
+
+from config.adventure import adventure_config
+
+
+class AdventureCursorPagination(CursorPagination):
+    """Cursor pagination for the adventure list, newest first"""
+
+    ordering = "-id"
+    page_size = adventure_config.list_page_size
+    page_size_query_param = "page_size"
+    max_page_size = adventure_config.list_page_size_max
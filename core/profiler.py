@@ -0,0 +1,175 @@
+import cProfile
+import io
+import json
+import marshal
+import os
+import pstats
+import time
+import traceback
+import uuid
+from contextlib import ExitStack, contextmanager
+from typing import Any, Callable, Dict, Iterator, List, Tuple
+
+from django.db import connections
+from django.http import HttpRequest, HttpResponse
+
+from config.profiler import profiler_config
+
+PROJECT_ROOT: str = os.path.dirname(
+    os.path.dirname(os.path.abspath(__file__))
+)
+ORIGIN_DEPTH: int = 3
+
+
+def get_origin() -> List[str]:
+    """
+    Get the project frames of the current stack
+
+    Frames of the libraries and of this module are skipped, so the origin
+    is the project code that ran a query.
+
+    Returns:
+        The innermost project frames formatted as `file:line in function`
+    """
+    frames = [
+        frame
+        for frame in traceback.extract_stack()
+        if frame.filename.startswith(PROJECT_ROOT)
+        and frame.filename != __file__
+        and "site-packages" not in frame.filename
+    ]
+    return [
+        f"{os.path.relpath(f.filename, PROJECT_ROOT)}:{f.lineno}"
+        f" in {f.name}"
+        for f in frames[-ORIGIN_DEPTH:]
+    ]
+
+
+class QueryRecorder:
+    """Database execute wrapper recording the queries with their timings"""
+
+    queries: List[Dict[str, Any]]
+
+    def __init__(self):
+        self.queries = []
+
+    def __call__(self, execute, sql, params, many, context):
+        """Execute and record a query"""
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.queries.append(
+                {
+                    "sql": sql,
+                    "many": many,
+                    "ms": round((time.perf_counter() - start) * 1e3, 3),
+                    "origin": get_origin(),
+                }
+            )
+
+
+@contextmanager
+def record_queries() -> Iterator[QueryRecorder]:
+    """
+    Record the queries of all database connections in this thread
+
+    Yields:
+        The query recorder
+    """
+    recorder = QueryRecorder()
+    with ExitStack() as stack:
+        for connection in connections.all():
+            stack.enter_context(connection.execute_wrapper(recorder))
+        yield recorder
+
+
+def profile_request(
+    get_response: Callable[[HttpRequest], HttpResponse],
+    request: HttpRequest,
+) -> Tuple[HttpResponse, Dict[str, Any], bytes]:
+    """
+    Get the response to a request under the profiler
+
+    The work of a streaming response is done after it is returned, so it
+    is not profiled.
+
+    Args:
+        get_response: The next middleware or view
+        request: The request
+
+    Returns:
+        The response, the profile, and the raw profiler output: the
+        `pstats` dump of `cprofile` or the HTML of `pyinstrument`
+    """
+    if profiler_config.profiler == "pyinstrument":
+        import pyinstrument
+
+        profiler = pyinstrument.Profiler()
+        start_profiler, stop_profiler = profiler.start, profiler.stop
+    else:
+        profiler = cProfile.Profile()
+        start_profiler, stop_profiler = profiler.enable, profiler.disable
+
+    with record_queries() as recorder:
+        start = time.perf_counter()
+        start_profiler()
+        try:
+            response = get_response(request)
+        finally:
+            stop_profiler()
+            seconds = time.perf_counter() - start
+
+    if profiler_config.profiler == "pyinstrument":
+        stats = profiler.output_text()
+        raw = profiler.output_html().encode()
+    else:
+        stream = io.StringIO()
+        pstats.Stats(profiler, stream=stream).sort_stats(
+            "cumulative"
+        ).print_stats(profiler_config.stats_limit)
+        stats = stream.getvalue()
+        raw = pstats_dump(profiler)
+
+    profile = {
+        "id": f"{time.strftime('%Y%m%d-%H%M%S')}-{uuid.uuid4().hex[:8]}",
+        "method": request.method,
+        "path": request.get_full_path(),
+        "status": response.status_code,
+        "ms": round(seconds * 1e3, 3),
+        "profiler": profiler_config.profiler,
+        "query_count": len(recorder.queries),
+        "query_ms": round(sum(q["ms"] for q in recorder.queries), 3),
+        "queries": recorder.queries,
+        "stats": stats,
+    }
+    return response, profile, raw
+
+
+def pstats_dump(profiler: cProfile.Profile) -> bytes:
+    """Get the `pstats` dump of a profiler, as written by `dump_stats`"""
+    profiler.create_stats()
+    return marshal.dumps(profiler.stats)
+
+
+def save_profile(profile: Dict[str, Any], raw: bytes) -> str:
+    """
+    Save a profile to the profile directory
+
+    Args:
+        profile: The profile
+        raw: The raw profiler output
+
+    Returns:
+        The path of the saved profile
+    """
+    os.makedirs(profiler_config.directory, exist_ok=True)
+    path = os.path.join(profiler_config.directory, profile["id"])
+
+    extension = "html" if profile["profiler"] == "pyinstrument" else "prof"
+    with open(f"{path}.{extension}", "wb") as f:
+        f.write(raw)
+    with open(f"{path}.json", "w", encoding="utf-8") as f:
+        json.dump(profile, f, indent=4)
+
+    return f"{path}.json"
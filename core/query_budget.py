@@ -0,0 +1,138 @@
+import re
+from collections import Counter
+from contextlib import ExitStack, contextmanager
+from typing import Callable, Iterator, List, Optional, Tuple, TypeVar
+
+from django.db import connections
+
+from config.query_budget import query_budget_config
+
+View = TypeVar("View")
+
+FINGERPRINT_PATTERNS: List[Tuple[re.Pattern, str]] = [
+    # String literals
+    (re.compile(r"'(?:[^']|'')*'"), "?"),
+    # Numeric literals and parameter placeholders
+    (re.compile(r"\b\d+(?:\.\d+)?\b|%s"), "?"),
+    # Lists of values, as in `IN (?, ?, ?)`
+    (re.compile(r"\(\s*\?(?:\s*,\s*\?)*\s*\)"), "(...)"),
+    (re.compile(r"\s+"), " "),
+]
+
+
+class QueryBudgetExceeded(Exception):
+    """A view made more database queries than its budget"""
+
+    pass
+
+
+def query_budget(budget: int) -> Callable[[View], View]:
+    """
+    Declare the query budget of a view class or function
+
+    It is the same as setting the `query_budget` attribute of the view.
+
+    Args:
+        budget: The maximum number of database queries of a request
+
+    Returns:
+        The decorator setting the budget of the view
+    """
+
+    def decorate(view: View) -> View:
+        view.query_budget = budget
+        return view
+
+    return decorate
+
+
+def get_query_budget(view_func: Callable) -> Optional[int]:
+    """
+    Get the query budget of a view
+
+    Args:
+        view_func: The view function, as resolved from the URL
+
+    Returns:
+        The query budget, None if the view has none
+    """
+    view = (
+        getattr(view_func, "cls", None)
+        or getattr(view_func, "view_class", None)
+        or view_func
+    )
+    return getattr(view, "query_budget", None)
+
+
+def fingerprint(sql: str) -> str:
+    """
+    Get the fingerprint of a query
+
+    The literals and parameters are replaced, so the repetitions of a query
+    with different values have the same fingerprint.
+
+    Args:
+        sql: The SQL of the query
+
+    Returns:
+        The fingerprint
+    """
+    for pattern, replacement in FINGERPRINT_PATTERNS:
+        sql = pattern.sub(replacement, sql)
+    return sql.strip()
+
+
+class QueryCounter:
+    """Database execute wrapper keeping the SQL of the queries"""
+
+    queries: List[str]
+
+    def __init__(self):
+        self.queries = []
+
+    def __call__(self, execute, sql, params, many, context):
+        """Execute and keep a query"""
+        self.queries.append(sql)
+        return execute(sql, params, many, context)
+
+
+@contextmanager
+def count_queries() -> Iterator[QueryCounter]:
+    """
+    Count the queries of all database connections in this thread
+
+    Yields:
+        The query counter
+    """
+    counter = QueryCounter()
+    with ExitStack() as stack:
+        for connection in connections.all():
+            stack.enter_context(connection.execute_wrapper(counter))
+        yield counter
+
+
+def check_query_budget(budget: int, queries: List[str]) -> Optional[str]:
+    """
+    Check the queries of a request against its budget
+
+    Args:
+        budget: The query budget
+        queries: The SQL of the queries made
+
+    Returns:
+        The report of the most repeated query fingerprints if the budget is
+        exceeded, None otherwise
+    """
+    if len(queries) <= budget:
+        return None
+
+    fingerprints = Counter(fingerprint(sql) for sql in queries)
+    return "\n".join(
+        [f"{len(queries)} queries over the budget of {budget}"]
+        + [
+            f"  {count}x {sql}"
+            for sql, count in fingerprints.most_common(
+                query_budget_config.fingerprint_limit
+            )
+        ]
+    )
@@ -0,0 +1,238 @@
+import time
+from datetime import datetime, timedelta
+from typing import Dict, NamedTuple, Optional, Tuple
+
+from django.core.cache import cache
+from django.utils import timezone
+from rest_framework import throttling
+
+from config.quota import quota_config
+
+from . import exceptions
+
+
+class Quota(NamedTuple):
+    """A quota of a user counted over a rolling window"""
+
+    name: str
+    description: str
+    window: int
+
+
+class QuotaUsage(NamedTuple):
+    """The usage of a quota by a user"""
+
+    limit: Optional[int]
+    used: float
+    wait: float
+    reset_at: Optional[datetime]
+
+
+REQUESTS_PER_MINUTE = Quota("requests_per_minute", "requests per minute", 60)
+TOKENS_PER_DAY = Quota("tokens_per_day", "tokens per day", 24 * 60 * 60)
+QUOTAS: Tuple[Quota, ...] = (REQUESTS_PER_MINUTE, TOKENS_PER_DAY)
+
+
+def get_counter_keys(
+    quota: Quota, user_id: int, now: float
+) -> Tuple[str, str]:
+    """
+    Get the cache keys of the counters of the current and previous windows
+
+    Args:
+        quota: The quota
+        user_id: The ID of the user
+        now: The current UNIX time
+
+    Returns:
+        The keys of the current and previous windows
+    """
+    index = int(now // quota.window)
+    prefix = f"quota:{quota.name}:{user_id}"
+    return f"{prefix}:{index}", f"{prefix}:{index - 1}"
+
+
+def get_limits_key(user_id: int) -> str:
+    """Get the cache key of the quota limits of a user"""
+    return f"quota:limits:{user_id}"
+
+
+def get_limits(user_id: int) -> Dict[str, Optional[int]]:
+    """
+    Get the quota limits of a user
+
+    The limits are cached for `QUOTA_LIMITS_TIMEOUT` seconds, so checking
+    the quotas does not query the database.
+
+    Args:
+        user_id: The ID of the user
+
+    Returns:
+        The limits by quota name, None if unlimited
+    """
+    from .models import UserQuota
+
+    key = get_limits_key(user_id)
+    limits = cache.get(key)
+    if limits is None:
+        user_quota = UserQuota.objects.filter(user_id=user_id).first()
+        limits = {}
+        for quota in QUOTAS:
+            limit = getattr(user_quota, quota.name, None)
+            if limit is None:
+                limit = getattr(quota_config, quota.name)
+            # A limit of 0 is no limit
+            limits[quota.name] = limit or None
+        cache.set(key, limits, quota_config.limits_timeout)
+    return limits
+
+
+def clear_limits(user_id: int):
+    """Clear the cached quota limits of a user, after they are changed"""
+    cache.delete(get_limits_key(user_id))
+
+
+def get_usage(quota: Quota, user_id: int, limit: Optional[int]) -> QuotaUsage:
+    """
+    Get the usage of a quota by a user
+
+    The usage over the rolling window is estimated from the counters of the
+    current and previous fixed windows, weighting the previous one by its
+    overlap with the rolling window, so it takes one cache read.
+
+    Args:
+        quota: The quota
+        user_id: The ID of the user
+        limit: The limit of the quota, None if unlimited
+
+    Returns:
+        The usage, with the seconds until it is below the limit again
+    """
+    now = time.time()
+    current_key, previous_key = get_counter_keys(quota, user_id, now)
+    counts = cache.get_many([current_key, previous_key])
+    current = counts.get(current_key, 0)
+    previous = counts.get(previous_key, 0)
+
+    elapsed = now % quota.window
+    used = previous * (1 - elapsed / quota.window) + current
+
+    wait = 0.0
+    if limit is not None and used >= limit:
+        if current >= limit:
+            # Once the current window becomes the previous one
+            wait = (quota.window - elapsed) + quota.window * (
+                1 - limit / max(current, 1)
+            )
+        else:
+            # As the previous window slides out
+            wait = quota.window * (1 - (limit - current) / previous) - elapsed
+        wait = max(wait, 0.0)
+
+    return QuotaUsage(
+        limit=limit,
+        used=used,
+        wait=wait,
+        reset_at=timezone.now() + timedelta(seconds=wait) if wait else None,
+    )
+
+
+def get_usages(user_id: int) -> Dict[str, QuotaUsage]:
+    """
+    Get the usages of the quotas by a user
+
+    Args:
+        user_id: The ID of the user
+
+    Returns:
+        The usages by quota name
+    """
+    limits = get_limits(user_id)
+    return {
+        quota.name: get_usage(quota, user_id, limits[quota.name])
+        for quota in QUOTAS
+    }
+
+
+def add_usage(quota: Quota, user_id: int, amount: int):
+    """
+    Add to the usage of a quota by a user in the current window
+
+    Args:
+        quota: The quota
+        user_id: The ID of the user
+        amount: The amount used
+    """
+    if amount <= 0:
+        return
+
+    key, _ = get_counter_keys(quota, user_id, time.time())
+    # The counter is read as the previous window during the next one
+    timeout = 2 * quota.window
+    cache.add(key, 0, timeout)
+    try:
+        cache.incr(key, amount)
+    except ValueError:
+        # The counter expired between adding and incrementing it
+        cache.set(key, amount, timeout)
+
+
+def check_quotas(user_id: int):
+    """
+    Check the quotas of a user before a turn
+
+    The turn is counted by `record_turn` once it is taken, so replayed
+    requests and turns refused while another is in progress are not.
+
+    Args:
+        user_id: The ID of the user
+
+    Raises:
+        QuotaExceededException: If the usage of a quota reached its limit
+    """
+    usages = get_usages(user_id)
+    for quota in QUOTAS:
+        usage = usages[quota.name]
+        if usage.limit is not None and usage.used >= usage.limit:
+            raise exceptions.QuotaExceededException(
+                wait=usage.wait,
+                detail=f"Quota of {usage.limit} {quota.description} exceeded.",
+            )
+
+
+def record_turn(user_id: int):
+    """
+    Count a turn taken by a user against their quota
+
+    Args:
+        user_id: The ID of the user
+    """
+    if quota_config.enabled:
+        add_usage(REQUESTS_PER_MINUTE, user_id, 1)
+
+
+def record_tokens(user_id: int, tokens: int):
+    """
+    Count the tokens used by a user against their quota
+
+    Args:
+        user_id: The ID of the user
+        tokens: The number of tokens used
+    """
+    if quota_config.enabled:
+        add_usage(TOKENS_PER_DAY, user_id, tokens)
+
+
+class UserQuotaThrottle(throttling.BaseThrottle):
+    """
+    Throttle of the turns of a user by their quotas
+
+    It raises instead of returning False, so the response tells which quota
+    is exceeded.
+    """
+
+    def allow_request(self, request, view) -> bool:
+        """Check the quotas of the user of the request"""
+        if quota_config.enabled and request.user.is_authenticated:
+            check_quotas(request.user.id)
+        return True
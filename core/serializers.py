@@ -1,5 +1,8 @@
 from rest_framework import serializers
 
+from config.convo import convo_config
+
+from . import export
 from .models import (
     Adventure,
     Knowledge,
@@ -8,6 +11,7 @@ from .models import (
     SceneNpc,
     SceneRunner,
     User,
+    UserQuota,
 )
 
 
@@ -59,6 +63,32 @@ class WhitelistSerializer(serializers.Serializer):
     username = serializers.CharField(required=True)
 
 
+class QuotaUsageSerializer(serializers.Serializer):
+    """Serializer for the QuotaUsagesSerializer"""
+
+    limit = serializers.IntegerField(allow_null=True)
+    used = serializers.IntegerField()
+    reset_at = serializers.DateTimeField(allow_null=True)
+
+
+class QuotaUsagesSerializer(serializers.Serializer):
+    """Serializer for the UserQuotaSerializer"""
+
+    requests_per_minute = QuotaUsageSerializer()
+    tokens_per_day = QuotaUsageSerializer()
+
+
+class UserQuotaSerializer(serializers.ModelSerializer):
+    """Serializer for the UserQuotaView"""
+
+    usage = QuotaUsagesSerializer(source="get_usages", read_only=True)
+
+    class Meta:
+        model = UserQuota
+        fields = ["user", "requests_per_minute", "tokens_per_day", "usage"]
+        read_only_fields = ["user"]
+
+
 class PingPongSerializer(serializers.Serializer):
     """Serializer for the PingPongView"""
 
@@ -73,6 +103,27 @@ class AdventureSerializer(serializers.ModelSerializer):
         fields = "__all__"
 
 
+class AdventureListSerializer(serializers.ModelSerializer):
+    """Serializer for listing the Adventure model"""
+
+    latest_message_timestamp = serializers.DateTimeField(
+        source="latest_message.timestamp", default=None, read_only=True
+    )
+    token_count = serializers.IntegerField(
+        source="total_tokens", read_only=True
+    )
+
+    class Meta:
+        model = Adventure
+        fields = [
+            "id",
+            "iteration",
+            "latest_message_timestamp",
+            "token_count",
+            "archived_at",
+        ]
+
+
 class AdventureOwnedSerializer(serializers.ModelSerializer):
     """Serializer for only user owned the Adventure model"""
 
@@ -90,10 +141,32 @@ class MessageSerializer(serializers.ModelSerializer):
         fields = "__all__"
 
 
+class ConvoHistoryQuerySerializer(serializers.Serializer):
+    """Serializer for the query parameters of the ConvoHistoryView"""
+
+    length = serializers.IntegerField(
+        min_value=1,
+        max_value=convo_config.history_page_size_max,
+        default=convo_config.history_length,
+    )
+    before = serializers.IntegerField(required=False)
+    after = serializers.IntegerField(required=False)
+
+    def validate(self, attrs):
+        """Validate that at most one cursor is given"""
+        if "before" in attrs and "after" in attrs:
+            raise serializers.ValidationError(
+                "Only one of before and after can be given."
+            )
+        return attrs
+
+
 class ConvoHistorySerializer(serializers.Serializer):
     """Serializer for the ConvoHistoryView"""
 
     history = serializers.ListField(child=MessageSerializer())
+    before = serializers.IntegerField(allow_null=True)
+    after = serializers.IntegerField(allow_null=True)
 
 
 class ConvoStartSerializer(serializers.Serializer):
@@ -110,6 +183,28 @@ class ConvoRespondSerializer(serializers.Serializer):
     summary = serializers.CharField(read_only=True, allow_blank=True)
 
 
+class SceneRunnerBroadcastSerializer(serializers.Serializer):
+    """Serializer for the SceneRunnerBroadcastView"""
+
+    user_response = serializers.CharField(required=True)
+    npcs = serializers.ListField(
+        child=serializers.CharField(),
+        required=False,
+        allow_empty=False,
+        help_text="The IDs of the NPCs to talk to, all NPCs if not given.",
+    )
+
+
+class SceneRunnerBroadcastTurnSerializer(serializers.Serializer):
+    """Serializer for an NPC turn of the SceneRunnerBroadcastView"""
+
+    npc = serializers.CharField()
+    user_response = serializers.CharField(allow_null=True)
+    api_response = serializers.CharField(allow_null=True)
+    summary = serializers.CharField(allow_null=True)
+    error = serializers.CharField(allow_null=True)
+
+
 class ConvoSummarySerializer(serializers.Serializer):
     """Serializer for the ConvoSummaryView"""
 
@@ -161,3 +256,56 @@ class SceneRunnerCreateSerializer(serializers.ModelSerializer):
         model = SceneRunner
         fields = ["id"]
         read_only_fields = ["id"]
+
+
+class ExportQuerySerializer(serializers.Serializer):
+    """Serializer for the query parameters of the ExportView"""
+
+    kinds = serializers.MultipleChoiceField(
+        choices=export.KINDS, default=export.KINDS
+    )
+    export_format = serializers.ChoiceField(
+        choices=export.FORMATS, default="jsonl"
+    )
+    chunk_size = serializers.IntegerField(
+        min_value=1, max_value=10000, default=export.CHUNK_SIZE
+    )
+    user = serializers.IntegerField(required=False)
+    scene = serializers.CharField(required=False)
+    since = serializers.DateTimeField(required=False)
+    until = serializers.DateTimeField(required=False)
+
+
+class DeploymentStatsSerializer(serializers.Serializer):
+    """Serializer for the DeploymentStatsView"""
+
+    name = serializers.CharField()
+    model = serializers.CharField()
+    kinds = serializers.ListField(child=serializers.CharField())
+    weight = serializers.FloatField()
+    outstanding = serializers.IntegerField()
+    requests = serializers.IntegerField()
+    failures = serializers.IntegerField()
+    ejections = serializers.IntegerField()
+    ewma_latency = serializers.FloatField(allow_null=True)
+    ejected = serializers.BooleanField()
+
+
+class SummaryPolicyStatsSerializer(serializers.Serializer):
+    """Serializer for the SummaryPolicyStatsView"""
+
+    policy = serializers.CharField()
+    evaluations = serializers.IntegerField()
+    summaries = serializers.IntegerField()
+    avoided = serializers.IntegerField()
+    skipped_over_budget = serializers.IntegerField()
+
+
+class SingleFlightStatsSerializer(serializers.Serializer):
+    """Serializer for the SingleFlightStatsView"""
+
+    calls = serializers.IntegerField()
+    upstream = serializers.IntegerField()
+    shared = serializers.IntegerField()
+    shared_across_processes = serializers.IntegerField()
+    in_flight = serializers.IntegerField()
@@ -0,0 +1,81 @@
+import json
+import time
+import uuid
+from typing import Optional, Tuple
+
+from django.core.cache import cache
+
+from config.openai import open_ai_config
+from engine.single_flight import BaseFlightStore, Result
+
+
+class CacheFlightStore(BaseFlightStore):
+    """
+    Store sharing the results of flights across processes by the cache
+
+    The flight of a key is claimed by adding its token to the cache, and its
+    result is published under the token, so a waiting process never reads
+    the result of an earlier flight. The cache must be shared by the
+    processes, unlike the default local memory cache.
+    """
+
+    timeout: float
+    poll_interval: float
+
+    def __init__(self, timeout: float, poll_interval: float):
+        self.timeout = timeout
+        self.poll_interval = poll_interval
+
+    @classmethod
+    def from_config(cls) -> "CacheFlightStore":
+        """Create the store configured by `OPENAI_SINGLE_FLIGHT_*`"""
+        return cls(
+            open_ai_config.single_flight_timeout,
+            open_ai_config.single_flight_poll_interval,
+        )
+
+    def get_claim_key(self, key: str) -> str:
+        """Get the cache key of the token of the flight of a key"""
+        return f"single-flight:{key}"
+
+    def get_result_key(self, key: str, token: str) -> str:
+        """Get the cache key of the result of a flight"""
+        return f"single-flight:{key}:{token}"
+
+    def claim(self, key: str) -> Tuple[str, bool]:
+        """Claim the flight of a key, see `BaseFlightStore.claim`"""
+        claim_key = self.get_claim_key(key)
+        token = uuid.uuid4().hex
+        if cache.add(claim_key, token, self.timeout):
+            return token, True
+
+        # If the flight landed in between, waiting on our token is over at
+        # once, so the call is made upstream
+        return cache.get(claim_key) or token, False
+
+    def publish(self, key: str, token: str, result: Result):
+        """Publish the result of a flight, see `BaseFlightStore.publish`"""
+        cache.set(
+            self.get_result_key(key, token), json.dumps(result), self.timeout
+        )
+
+    def release(self, key: str, token: str):
+        """Release a claimed flight, see `BaseFlightStore.release`"""
+        if cache.get(self.get_claim_key(key)) == token:
+            cache.delete(self.get_claim_key(key))
+
+    def wait(self, key: str, token: str) -> Optional[Result]:
+        """Wait for the result of a flight, see `BaseFlightStore.wait`"""
+        deadline = time.monotonic() + self.timeout
+        while time.monotonic() < deadline:
+            result = cache.get(self.get_result_key(key, token))
+            if result is not None:
+                return json.loads(result)
+
+            # Released without a result, the flight failed
+            if cache.get(self.get_claim_key(key)) != token:
+                result = cache.get(self.get_result_key(key, token))
+                return json.loads(result) if result is not None else None
+
+            time.sleep(self.poll_interval)
+        return None
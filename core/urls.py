@@ -29,6 +29,11 @@ user_urlpatterns = [
         views.UserDetailsView.as_view(),
         name="user-details",
     ),
+    path(
+        "user-utils/quota/<int:id>/",
+        views.UserQuotaView.as_view(),
+        name="user-quota",
+    ),
 ]
 
 convo_urlpatterns = [
@@ -80,6 +85,11 @@ scene_runner_urlpatterns = [
         views.SceneRunnerRespondView.as_view(),
         name="scene-runner-respond",
     ),
+    path(
+        "scene-runner/broadcast/<int:runner_id>/",
+        views.SceneRunnerBroadcastView.as_view(),
+        name="scene-runner-broadcast",
+    ),
 ]
 
 urlpatterns = [
@@ -88,4 +98,20 @@ urlpatterns = [
     *convo_urlpatterns,
     *scene_runner_urlpatterns,
     path("ping", views.PingPongView.as_view(), name="ping"),
+    path(
+        "deployment-stats/",
+        views.DeploymentStatsView.as_view(),
+        name="deployment-stats",
+    ),
+    path("export/", views.ExportView.as_view(), name="export"),
+    path(
+        "summary-policy-stats/",
+        views.SummaryPolicyStatsView.as_view(),
+        name="summary-policy-stats",
+    ),
+    path(
+        "single-flight-stats/",
+        views.SingleFlightStatsView.as_view(),
+        name="single-flight-stats",
+    ),
 ]
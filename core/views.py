@@ -1,17 +1,33 @@
+import hashlib
 import logging
-
+from collections import defaultdict
+from contextlib import ExitStack
+from typing import Any, Callable
+
+from django.core.cache import cache
+from django.db.models import F, Sum
+from django.http import StreamingHttpResponse
+from django.shortcuts import get_object_or_404
+from django.utils.cache import patch_cache_control, patch_vary_headers
 from rest_framework import exceptions as rest_exceptions
 from rest_framework import generics, permissions, response, views, viewsets
 
+from config.cache import cache_config
 from config.convo import convo_config
 from engine import models as engine_models
-from engine.convo import Convo
+from engine.convo import Convo, summary_policy
+from engine.openai_api import get_deployment_stats, get_single_flight_stats
 from engine.scene import Scene
 from rest_auth.permissions import IsWhitelisted
 
-from . import exceptions, models, serializers
+from . import exceptions, export, models, quotas, serializers
 from .couplers.convo import ConvoCoupler
 from .couplers.scene import SceneCoupler
+from .etag import format_etag, matches_if_none_match, not_modified
+from .idempotency import replay_response, save_response
+from .locks import LOCK_QUERIES, ReleasingStream, adventure_turn
+from .pagination import AdventureCursorPagination
+from .quotas import UserQuotaThrottle
 
 
 class UserView(
@@ -27,6 +43,15 @@ class UserView(
     queryset = models.User.objects.all()
     serializer_class = serializers.UserSerializer
     permission_classes = [permissions.IsAdminUser]
+    # Deleting a user cascades to the tables referencing it
+    query_budget = 11
+
+    def get_queryset(self):
+        """Return the queryset, with the relations of a page prefetched"""
+        queryset = super().get_queryset()
+        if self.action == "list":
+            queryset = queryset.prefetch_related("groups", "user_permissions")
+        return queryset
 
     def perform_create(self, serializer: serializers.UserSerializer):
         """Create the user"""
@@ -48,6 +73,7 @@ class UserMeView(views.APIView):
 
     serializer_class = serializers.UserSerializer
     permission_classes = [permissions.IsAuthenticated]
+    query_budget = 3
 
     def get(self, request, *args, **kwargs):
         """Return the logged in user"""
@@ -60,6 +86,7 @@ class UserDetailsView(views.APIView):
 
     serializer_class = serializers.UserDetailsSerializer
     permission_classes = [permissions.IsAdminUser]
+    query_budget = 5
 
     def get(self, request, id, *args, **kwargs):
         """Return the user details"""
@@ -68,20 +95,42 @@ class UserDetailsView(views.APIView):
 
         try:
             user = models.User.objects.get(id=id)
-            adventures = models.Adventure.objects.filter(
-                user=user, scenenpcadventurepair=None
-            )
-            scene_runners = models.SceneRunner.objects.filter(user=user)
-            scene_npcs = models.SceneNpcAdventurePair.objects.filter(
-                runner__in=scene_runners
+            token_count = models.Adventure.objects.get_token_count_subquery
+            adventures = (
+                models.Adventure.objects.filter(
+                    user=user, scenenpcadventurepair=None
+                )
+                .only("id")
+                .annotate(
+                    total_tokens=token_count() + F("archived_token_count")
+                )
             )
+            scene_runners = models.SceneRunner.objects.filter(
+                user=user
+            ).select_related("scene")
+            scene_npcs = defaultdict(list)
+            for n in (
+                models.SceneNpcAdventurePair.objects.filter(runner__user=user)
+                .select_related("npc")
+                .annotate(
+                    total_tokens=token_count("adventure")
+                    + F("adventure__archived_token_count")
+                    + F("knowledge_selection_token_count")
+                )
+            ):
+                scene_npcs[n.runner_id].append(n)
+
             serializer = self.serializer_class(
                 {
                     "num_adventures": len(adventures),
-                    "token_count": sum(a.token_count for a in adventures)
-                    + sum(n.token_count for n in scene_npcs),
+                    "token_count": sum(a.total_tokens for a in adventures)
+                    + sum(
+                        n.total_tokens
+                        for npcs in scene_npcs.values()
+                        for n in npcs
+                    ),
                     "adventures": [
-                        {"id": a.id, "token_count": a.token_count}
+                        {"id": a.id, "token_count": a.total_tokens}
                         for a in adventures
                     ],
                     "scenes": [
@@ -93,15 +142,12 @@ class UserDetailsView(views.APIView):
                                     "index": n.npc.index,
                                     "name": n.npc.name,
                                     "title": n.npc.title,
-                                    "token_count": n.token_count,
+                                    "token_count": n.total_tokens,
                                 }
-                                for n in scene_npcs
-                                if n.runner == s
+                                for n in scene_npcs[s.id]
                             ],
                             "token_count": sum(
-                                n.token_count
-                                for n in scene_npcs
-                                if n.runner == s
+                                n.total_tokens for n in scene_npcs[s.id]
                             ),
                         }
                         for s in scene_runners
@@ -123,6 +169,7 @@ class WhitelistView(generics.CreateAPIView, views.APIView):
 
     serializer_class = serializers.WhitelistSerializer
     permission_classes = [permissions.IsAdminUser]
+    query_budget = 3
 
     def create(self, request, *args, **kwargs):
         """Whitelist the user"""
@@ -143,11 +190,34 @@ class WhitelistView(generics.CreateAPIView, views.APIView):
             raise e
 
 
+class UserQuotaView(generics.RetrieveUpdateAPIView, views.APIView):
+    """View for getting and adjusting the quota limits of a user"""
+
+    serializer_class = serializers.UserQuotaSerializer
+    permission_classes = [permissions.IsAdminUser]
+    # The usage reads the limits again, and saving a new quota tries to
+    # update it first, as its primary key is set
+    query_budget = 6
+
+    def get_object(self) -> models.UserQuota:
+        """Return the quota of the user, unsaved if it has the defaults"""
+        user = get_object_or_404(models.User, id=self.kwargs["id"])
+        return models.UserQuota.objects.filter(
+            user=user
+        ).first() or models.UserQuota(user=user)
+
+    def perform_update(self, serializer):
+        """Save the quota limits and clear the cached ones"""
+        quota = serializer.save()
+        quotas.clear_limits(quota.user_id)
+
+
 class UnwhitelistView(generics.CreateAPIView, views.APIView):
     """View for unwhitelisting a user"""
 
     serializer_class = serializers.WhitelistSerializer
     permission_classes = [permissions.IsAdminUser]
+    query_budget = 3
 
     def create(self, request, *args, **kwargs):
         """Whitelist the user"""
@@ -173,6 +243,7 @@ class PingPongView(views.APIView):
 
     serializer_class = serializers.PingPongSerializer
     permission_classes = [IsWhitelisted]
+    query_budget = 1
 
     def get(self, request):
         """Return a pong response"""
@@ -181,6 +252,89 @@ class PingPongView(views.APIView):
         return response.Response(serializer.data)
 
 
+class DeploymentStatsView(views.APIView):
+    """View for getting the OpenAI deployment pool statistics"""
+
+    serializer_class = serializers.DeploymentStatsSerializer
+    permission_classes = [permissions.IsAdminUser]
+    query_budget = 1
+
+    def get(self, request, *args, **kwargs):
+        """Return the statistics of each deployment"""
+        serializer = self.serializer_class(
+            [s.model_dump() for s in get_deployment_stats()], many=True
+        )
+        return response.Response(serializer.data)
+
+
+class SummaryPolicyStatsView(views.APIView):
+    """View for getting the summary policy statistics"""
+
+    serializer_class = serializers.SummaryPolicyStatsSerializer
+    permission_classes = [permissions.IsAdminUser]
+    query_budget = 1
+
+    def get(self, request, *args, **kwargs):
+        """Return the statistics of the summary policy"""
+        serializer = self.serializer_class(summary_policy.stats().model_dump())
+        return response.Response(serializer.data)
+
+
+class SingleFlightStatsView(views.APIView):
+    """View for getting the statistics of the coalesced API calls"""
+
+    serializer_class = serializers.SingleFlightStatsSerializer
+    permission_classes = [permissions.IsAdminUser]
+    query_budget = 1
+
+    def get(self, request, *args, **kwargs):
+        """Return the statistics of the single-flight of the API calls"""
+        serializer = self.serializer_class(
+            get_single_flight_stats().model_dump()
+        )
+        return response.Response(serializer.data)
+
+
+class ExportView(views.APIView):
+    """View for streaming a bulk export of the conversations"""
+
+    permission_classes = [permissions.IsAdminUser]
+    # The export queries as it is streamed, after the budget is checked
+    query_budget = 1
+
+    def get(self, request, *args, **kwargs):
+        """Return the export as a stream of JSONL lines"""
+        logger = logging.getLogger(__name__)
+        logger.setLevel(convo_config.log_level)
+
+        try:
+            query = serializers.ExportQuerySerializer(
+                data=request.query_params
+            )
+            query.is_valid(raise_exception=True)
+            data = query.validated_data
+
+            lines = export.export(
+                [k for k in export.KINDS if k in data["kinds"]],
+                export_format=data["export_format"],
+                chunk_size=data["chunk_size"],
+                user_id=data.get("user"),
+                scene_id=data.get("scene"),
+                since=data.get("since"),
+                until=data.get("until"),
+            )
+
+            return StreamingHttpResponse(
+                lines, content_type="application/x-ndjson"
+            )
+        except Exception as e:
+            import traceback
+
+            traceback.print_exc()
+            logger.error(e)
+            raise e
+
+
 class AdventureView(
     generics.CreateAPIView,
     generics.RetrieveAPIView,
@@ -192,17 +346,24 @@ class AdventureView(
 
     queryset = models.Adventure.objects.all()
     permission_classes = [IsWhitelisted]
+    query_budget = 3
+
+    pagination_class = AdventureCursorPagination
 
     def get_serializer_class(self):
         """Return the serializer class"""
         if self.action in ["create", "update", "partial_update"]:
             return serializers.AdventureOwnedSerializer
+        if self.action == "list":
+            return serializers.AdventureListSerializer
         return serializers.AdventureSerializer
 
     def get_queryset(self):
         """Return the queryset"""
         if self.action in ["create", "update", "partial_update"]:
             return models.Adventure.objects.filter(user=self.request.user)
+        if self.action == "list":
+            return models.Adventure.objects.get_list(self.request.user)
         return models.Adventure.objects.all()
 
     def perform_create(self, serializer):
@@ -219,29 +380,74 @@ class ConvoHistoryView(views.APIView):
 
     serializer_class = serializers.ConvoHistorySerializer
     permission_classes = [IsWhitelisted]
+    # Restoring an archived adventure takes 9 queries
+    query_budget = 12
 
     def get(self, request, id, *args, **kwargs):
-        """Return the convo history"""
+        """
+        Return a page of the convo history
+
+        The page is the latest messages, or the messages before or after the
+        message ID cursor. The returned `before` and `after` are the cursors
+        of the adjacent pages, null if there are no more messages.
+        """
         logger = logging.getLogger(__name__)
         logger.setLevel(convo_config.log_level)
 
         try:
-            adventure = models.Adventure.objects.get(id=id)
+            try:
+                adventure = models.Adventure.objects.only(
+                    "id", "user_id", "latest_message_id", "archived_at"
+                ).get(id=id)
+            except models.Adventure.DoesNotExist:
+                raise rest_exceptions.NotFound(f"Adventure {id} not found")
 
-            if adventure.user != request.user:
+            if adventure.user_id != request.user.id:
                 raise exceptions.AdventureNotOwnedByUserException()
 
-            length = (
-                self.request.query_params.get("username")
-                or convo_config.history_length
+            adventure = models.AdventureArchive.objects.restore(adventure)
+
+            etag = format_etag(f"{adventure.id}-{adventure.latest_message_id}")
+            if matches_if_none_match(request, etag):
+                return not_modified(etag)
+
+            query = serializers.ConvoHistoryQuerySerializer(
+                data=request.query_params
             )
+            query.is_valid(raise_exception=True)
+            before = query.validated_data.get("before")
+            after = query.validated_data.get("after")
+
+            messages, has_more = models.Message.objects.get_page(
+                adventure,
+                query.validated_data["length"],
+                before=before,
+                after=after,
+            )
+
+            first = messages[0].id if messages else None
+            last = messages[-1].id if messages else None
+            if after is not None:
+                before_cursor = first
+                after_cursor = last if has_more else None
+            else:
+                before_cursor = first if has_more else None
+                after_cursor = (
+                    last
+                    if last is not None
+                    and last != adventure.latest_message_id
+                    else None
+                )
 
-            messages = models.Message.objects.get_latest_n_messages(
-                adventure, length
+            serializer = self.serializer_class(
+                {
+                    "history": messages,
+                    "before": before_cursor,
+                    "after": after_cursor,
+                }
             )
-            serializer = self.serializer_class({"history": messages})
             logger.debug("serializer: %s", serializer)
-            return response.Response(serializer.data)
+            return response.Response(serializer.data, headers={"ETag": etag})
         except Exception as e:
             import traceback
 
@@ -255,6 +461,10 @@ class ConvoStartView(generics.CreateAPIView, views.APIView):
 
     serializer_class = serializers.ConvoStartSerializer
     permission_classes = [IsWhitelisted]
+    throttle_classes = [UserQuotaThrottle]
+    # The turn lock takes queries on PostgreSQL, an idempotency key 3, and
+    # the quota limits 1 when not cached
+    query_budget = 16 + LOCK_QUERIES
 
     def create(self, request, id, *args, **kwargs):
         """Return first API response of the adventure"""
@@ -262,25 +472,34 @@ class ConvoStartView(generics.CreateAPIView, views.APIView):
         logger.setLevel(convo_config.log_level)
 
         try:
-            adventure = models.Adventure.objects.get(id=id)
+            with adventure_turn([id]):
+                replay = replay_response(request)
+                if replay is not None:
+                    return replay
 
-            if adventure.user != request.user:
-                raise exceptions.AdventureNotOwnedByUserException()
+                adventure = models.Adventure.objects.get(id=id)
 
-            # Validate this is the first call
-            if adventure.iteration != 0:
-                raise exceptions.AdventureStartedException()
+                if adventure.user_id != request.user.id:
+                    raise exceptions.AdventureNotOwnedByUserException()
 
-            convo_coupler = ConvoCoupler(adventure)
-            convo = Convo(convo_coupler)
+                # Validate this is the first call
+                if adventure.iteration != 0:
+                    raise exceptions.AdventureStartedException()
 
-            init_message = convo.init_story()
-            logger.debug("init_message: %s", init_message)
-            init_response = init_message.content
+                convo_coupler = ConvoCoupler(adventure)
+                convo = Convo(convo_coupler)
 
-            serializer = self.get_serializer({"response": init_response})
-            logger.debug("serializer: %s", serializer)
-            return response.Response(serializer.data)
+                init_message = convo.init_story()
+                logger.debug("init_message: %s", init_message)
+                quotas.record_turn(request.user.id)
+                init_response = init_message.content
+
+                serializer = self.get_serializer({"response": init_response})
+                logger.debug("serializer: %s", serializer)
+                resp = response.Response(serializer.data)
+                save_response(request, resp)
+
+            return resp
         except Exception as e:
             import traceback
 
@@ -294,6 +513,11 @@ class ConvoRespondView(generics.CreateAPIView, views.APIView):
 
     serializer_class = serializers.ConvoRespondSerializer
     permission_classes = [IsWhitelisted]
+    throttle_classes = [UserQuotaThrottle]
+    # Summarizing takes 8 queries, restoring an archive 9, an idempotency key
+    # 3, the quota limits 1 when not cached, and the turn lock takes queries
+    # on PostgreSQL
+    query_budget = 34 + LOCK_QUERIES
 
     def create(self, request, id, *args, **kwargs):
         """Return API response of the adventure"""
@@ -301,41 +525,53 @@ class ConvoRespondView(generics.CreateAPIView, views.APIView):
         logger.setLevel(convo_config.log_level)
 
         try:
-            adventure = models.Adventure.objects.get(id=id)
-
-            if adventure.user != request.user:
-                raise exceptions.AdventureNotOwnedByUserException()
-
-            convo_coupler = ConvoCoupler(adventure)
-            convo = Convo(convo_coupler)
-
             serializer = self.get_serializer(data=request.data)
             serializer.is_valid(raise_exception=True)
             user_response = serializer.validated_data["user_response"]
-            user_message = engine_models.Message(
-                role=engine_models.Role.USER,
-                content=user_response,
-            )
-            user_message = convo.process_user_response(user_message)
-            logger.debug("user_message: %s", user_message)
 
-            api_response = convo.process_api_response()
-            logger.debug("api_response: %s", api_response)
+            with adventure_turn([id]):
+                replay = replay_response(request)
+                if replay is not None:
+                    return replay
 
-            summary_message = convo.summarize()
-            logger.debug("summary_message: %s", summary_message)
+                adventure = models.Adventure.objects.get(id=id)
 
-            serializer = self.serializer_class(
-                {
-                    "user_response": user_message.content,
-                    "api_response": api_response.content,
-                    "summary": summary_message.content
-                    if summary_message
-                    else None,
-                }
-            )
-            logger.debug("serializer: %s", serializer)
-            return response.Response(serializer.data)
+                if adventure.user_id != request.user.id:
+                    raise exceptions.AdventureNotOwnedByUserException()
+
+                adventure = models.AdventureArchive.objects.restore(adventure)
+
+                convo_coupler = ConvoCoupler(adventure)
+                convo = Convo(convo_coupler)
+
+                user_message = engine_models.Message(
+                    role=engine_models.Role.USER,
+                    content=user_response,
+                )
+                user_message = convo.process_user_response(user_message)
+                logger.debug("user_message: %s", user_message)
+
+                api_response = convo.process_api_response()
+                logger.debug("api_response: %s", api_response)
+
+                summary_message = convo.summarize()
+                logger.debug("summary_message: %s", summary_message)
+                quotas.record_turn(request.user.id)
+
+                serializer = self.serializer_class(
+                    {
+                        "user_response": user_message.content,
+                        "api_response": api_response.content,
+                        "summary": summary_message.content
+                        if summary_message
+                        else None,
+                    }
+                )
+                logger.debug("serializer: %s", serializer)
+                resp = response.Response(serializer.data)
+                save_response(request, resp)
+
+            return resp
         except Exception as e:
             import traceback
 
@@ -349,6 +585,8 @@ class ConvoSummaryView(views.APIView):
 
     serializer_class = serializers.ConvoSummarySerializer
     permission_classes = [IsWhitelisted]
+    # Restoring an archived adventure takes 9 queries
+    query_budget = 12
 
     def get(self, request, id, *args, **kwargs):
         """Return summary of the adventure convo"""
@@ -356,7 +594,17 @@ class ConvoSummaryView(views.APIView):
         logger.setLevel(convo_config.log_level)
 
         try:
-            adventure = models.Adventure.objects.get(id=id)
+            try:
+                adventure = models.Adventure.objects.only(
+                    "id", "user_id", "summary", "archived_at"
+                ).get(id=id)
+            except models.Adventure.DoesNotExist:
+                raise rest_exceptions.NotFound(f"Adventure {id} not found")
+
+            if adventure.user_id != request.user.id:
+                raise exceptions.AdventureNotOwnedByUserException()
+
+            adventure = models.AdventureArchive.objects.restore(adventure)
 
             if adventure.summary is None:
                 raise exceptions.AdventureSummaryNotFoundException()
@@ -379,6 +627,7 @@ class ConvoTokenCountView(views.APIView):
 
     serializer_class = serializers.ConvoTokenCountSerializer
     permission_classes = [IsWhitelisted]
+    query_budget = 3
 
     def get(self, request, id, *args, **kwargs):
         """Return token count of the adventure convo"""
@@ -405,6 +654,7 @@ class ConvoTotalTokenCountView(views.APIView):
 
     serializer_class = serializers.ConvoTokenCountSerializer
     permission_classes = [IsWhitelisted]
+    query_budget = 3
 
     def get(self, request, *args, **kwargs):
         """Return token count of the adventure convo"""
@@ -412,8 +662,17 @@ class ConvoTotalTokenCountView(views.APIView):
         logger.setLevel(convo_config.log_level)
 
         try:
-            adventure = models.Adventure.objects.all()
-            token_count = sum(a.token_count for a in adventure)
+            token_count = (
+                models.Chatcmpl.objects.aggregate(
+                    token=Sum(F("completion_tokens") + F("prompt_tokens"))
+                )["token"]
+                or 0
+            ) + (
+                models.Adventure.objects.filter(
+                    archived_at__isnull=False
+                ).aggregate(token=Sum("archived_token_count"))["token"]
+                or 0
+            )
 
             serializer = self.serializer_class({"token_count": token_count})
             logger.debug("serializer: %s", serializer)
@@ -426,6 +685,46 @@ class ConvoTotalTokenCountView(views.APIView):
             raise e
 
 
+def get_cached_scene_response(
+    request,
+    key: str,
+    etag: str,
+    render: Callable[[], Any],
+    **cache_control: Any,
+) -> response.Response:
+    """
+    Get the response of scene data cached by its version
+
+    Scenes only change when loaded or removed by the management commands,
+    so the rendered data is cached under a key including the scene version.
+
+    Args:
+        request: The request
+        key: The cache key including the scene version
+        etag: The quoted ETag of the scene version
+        render: The function to render the scene data on a cache miss
+        cache_control: The Cache-Control directives of the response
+
+    Returns:
+        The response with the scene data or 304 Not Modified
+    """
+    if matches_if_none_match(request, etag):
+        scene_response = not_modified(etag)
+    else:
+        data = cache.get(key)
+        if data is None:
+            data = render()
+            cache.set(key, data, cache_config.scene_timeout)
+
+        scene_response = response.Response(data, headers={"ETag": etag})
+
+    patch_cache_control(
+        scene_response, max_age=cache_config.scene_max_age, **cache_control
+    )
+    patch_vary_headers(scene_response, ["Authorization"])
+    return scene_response
+
+
 class SceneView(
     generics.RetrieveAPIView,
     generics.ListAPIView,
@@ -433,9 +732,43 @@ class SceneView(
 ):
     """View for the Scene model"""
 
-    queryset = models.Scene.objects.all()
+    queryset = models.Scene.objects.with_npcs()
     serializer_class = serializers.SceneSerializer
     permission_classes = [IsWhitelisted]
+    query_budget = 5
+
+    def retrieve(self, request, pk=None, *args, **kwargs):
+        """Return the scene"""
+        scene = get_object_or_404(
+            models.Scene.objects.only("id", "version"), pk=pk
+        )
+
+        return get_cached_scene_response(
+            request,
+            f"scene:{scene.id}:{scene.version}",
+            format_etag(scene.version),
+            lambda: self.get_serializer(
+                models.Scene.objects.with_npcs().get(pk=scene.pk)
+            ).data,
+            public=True,
+        )
+
+    def list(self, request, *args, **kwargs):
+        """Return all scenes"""
+        versions = models.Scene.objects.order_by("id").values_list(
+            "id", "version"
+        )
+        version = hashlib.sha256(str(list(versions)).encode()).hexdigest()
+
+        return get_cached_scene_response(
+            request,
+            f"scenes:{version}",
+            format_etag(version),
+            lambda: self.get_serializer(
+                models.Scene.objects.with_npcs().order_by("id"), many=True
+            ).data,
+            public=True,
+        )
 
 
 class SceneRunnerCreateView(generics.CreateAPIView, views.APIView):
@@ -443,6 +776,8 @@ class SceneRunnerCreateView(generics.CreateAPIView, views.APIView):
 
     serializer_class = serializers.SceneRunnerCreateSerializer
     permission_classes = [IsWhitelisted]
+    # An adventure is created per NPC, in 2 queries each
+    query_budget = 25
 
     def create(self, request, scene_id: str, *args, **kwargs):
         """Return the scene runner"""
@@ -484,6 +819,10 @@ class SceneRunnerRespondView(generics.CreateAPIView, views.APIView):
 
     serializer_class = serializers.ConvoRespondSerializer
     permission_classes = [IsWhitelisted]
+    throttle_classes = [UserQuotaThrottle]
+    # Summarizing takes 8 queries, an idempotency key 3, the quota limits 1
+    # when not cached, and the turn lock takes queries on PostgreSQL
+    query_budget = 28 + LOCK_QUERIES
 
     def create(self, request, runner_id: int, npc_id: str, *args, **kwargs):
         """Return API response of the scene"""
@@ -492,59 +831,168 @@ class SceneRunnerRespondView(generics.CreateAPIView, views.APIView):
 
         try:
             try:
-                runner = models.SceneRunner.objects.get(id=runner_id)
+                runner = models.SceneRunner.objects.select_related(
+                    "scene"
+                ).get(id=runner_id)
             except models.SceneRunner.DoesNotExist:
                 raise rest_exceptions.NotFound(
                     f"SceneRunner {runner_id} not found"
                 )
 
-            if runner.user != request.user:
+            if runner.user_id != request.user.id:
                 raise exceptions.SceneRunnerNotOwnedByUserException()
 
             try:
-                npc = models.SceneNpc.objects.get(id=npc_id)
-            except models.SceneNpc.DoesNotExist:
+                npc_adv_pair = models.SceneNpcAdventurePair.objects.only(
+                    "adventure_id", "npc__index"
+                ).select_related("npc").get(runner=runner, npc_id=npc_id)
+            except models.SceneNpcAdventurePair.DoesNotExist:
                 raise rest_exceptions.NotFound(f"SceneNpc {npc_id} not found")
 
-            scene_coupler = SceneCoupler(runner)
-            scene = Scene(scene_coupler, runner.scene.to_scene_data())
+            serializer = self.get_serializer(data=request.data)
+            serializer.is_valid(raise_exception=True)
+            user_response = serializer.validated_data["user_response"]
+
+            with adventure_turn([npc_adv_pair.adventure_id]):
+                replay = replay_response(request)
+                if replay is not None:
+                    return replay
+
+                scene_coupler = SceneCoupler(runner)
+                scene = Scene(scene_coupler, runner.scene.to_scene_data())
+
+                convo_coupler = scene.process_user_selection(
+                    npc_adv_pair.npc.index
+                )
+                if convo_coupler is None:
+                    logger.error("Unreachable reached, convo coupler is None")
+                    raise rest_exceptions.APIException(
+                        "Unreachable reached, convo coupler is None"
+                    )
+
+                convo = Convo(convo_coupler)
+
+                user_message = engine_models.Message(
+                    role=engine_models.Role.USER,
+                    content=user_response,
+                )
+                user_message = convo.process_user_response(user_message)
+                logger.debug("user_message: %s", user_message)
+
+                api_response = convo.process_api_response()
+                logger.debug("api_response: %s", api_response)
+
+                summary_message = convo.summarize()
+                logger.debug("summary_message: %s", summary_message)
+                quotas.record_turn(request.user.id)
+
+                serializer = self.serializer_class(
+                    {
+                        "user_response": user_message.content,
+                        "api_response": api_response.content,
+                        "summary": summary_message.content
+                        if summary_message
+                        else None,
+                    }
+                )
+                logger.debug("serializer: %s", serializer)
+                resp = response.Response(serializer.data)
+                save_response(request, resp)
+
+            return resp
+        except Exception as e:
+            import traceback
+
+            traceback.print_exc()
+            logger.error(e)
+            raise e
+
 
-            convo_coupler = scene.process_user_selection(npc.index)
-            if convo_coupler is None:
-                logger.error("Unreachable reached, convo coupler is None")
-                raise rest_exceptions.APIException(
-                    "Unreachable reached, convo coupler is None"
+class SceneRunnerBroadcastView(generics.CreateAPIView, views.APIView):
+    """View for user responding to several NPCs of the scene at once"""
+
+    serializer_class = serializers.SceneRunnerBroadcastSerializer
+    permission_classes = [IsWhitelisted]
+    throttle_classes = [UserQuotaThrottle]
+    # The NPCs respond in worker threads, after the budget is checked, the
+    # quota limits take 1 query when not cached, and the turn lock of each
+    # NPC takes queries on PostgreSQL, for scenes of up to 10 NPCs
+    query_budget = 6 + 10 * LOCK_QUERIES
+
+    def create(self, request, runner_id: int, *args, **kwargs):
+        """Return the API responses of the NPCs as they complete"""
+        logger = logging.getLogger(__name__)
+        logger.setLevel(convo_config.log_level)
+
+        try:
+            try:
+                runner = models.SceneRunner.objects.select_related(
+                    "scene"
+                ).get(id=runner_id)
+            except models.SceneRunner.DoesNotExist:
+                raise rest_exceptions.NotFound(
+                    f"SceneRunner {runner_id} not found"
                 )
 
-            convo = Convo(convo_coupler)
+            if runner.user_id != request.user.id:
+                raise exceptions.SceneRunnerNotOwnedByUserException()
 
             serializer = self.get_serializer(data=request.data)
             serializer.is_valid(raise_exception=True)
-            user_response = serializer.validated_data["user_response"]
+            data = serializer.validated_data
+
+            pairs = models.SceneNpcAdventurePair.objects.filter(
+                runner=runner
+            ).values_list("npc__index", "npc_id", "adventure_id")
+            npcs = {index: npc_id for index, npc_id, _ in pairs}
+            adventures = {index: adv_id for index, _, adv_id in pairs}
+            if "npcs" in data:
+                not_found = set(data["npcs"]) - set(npcs.values())
+                if not_found:
+                    raise rest_exceptions.NotFound(
+                        f"SceneNpc {', '.join(sorted(not_found))} not found"
+                    )
+                npcs = {i: id for i, id in npcs.items() if id in data["npcs"]}
+
+            with ExitStack() as locks:
+                # The turns are held until the response is closed
+                locks.enter_context(
+                    adventure_turn(adventures[i] for i in npcs)
+                )
+
+                scene_coupler = SceneCoupler(runner)
+                scene = Scene(scene_coupler, runner.scene.to_scene_data())
+                held_locks = locks.pop_all()
+
+            quotas.record_turn(request.user.id)
+
             user_message = engine_models.Message(
                 role=engine_models.Role.USER,
-                content=user_response,
+                content=data["user_response"],
             )
-            user_message = convo.process_user_response(user_message)
-            logger.debug("user_message: %s", user_message)
-
-            api_response = convo.process_api_response()
-            logger.debug("api_response: %s", api_response)
-
-            summary_message = convo.summarize()
-            logger.debug("summary_message: %s", summary_message)
 
-            serializer = self.serializer_class(
-                {
-                    "user_response": user_message.content,
-                    "api_response": api_response.content,
-                    "summary": summary_message.content
-                    if summary_message
-                    else None,
-                }
+            def stream_turns():
+                for turn in scene.broadcast(sorted(npcs), user_message):
+                    logger.debug("turn: %s", turn)
+                    yield export.dump_line(
+                        serializers.SceneRunnerBroadcastTurnSerializer(
+                            {
+                                "npc": npcs[turn.index],
+                                "user_response": turn.user_response
+                                and turn.user_response.content,
+                                "api_response": turn.api_response
+                                and turn.api_response.content,
+                                "summary": turn.summary
+                                and turn.summary.content,
+                                "error": turn.error,
+                            }
+                        ).data
+                    )
+
+            return StreamingHttpResponse(
+                ReleasingStream(stream_turns(), held_locks),
+                content_type="application/x-ndjson",
             )
-            logger.debug("serializer: %s", serializer)
-            return response.Response(serializer.data)
         except Exception as e:
             import traceback
 
@@ -558,6 +1006,7 @@ class SceneRunnerSceneView(views.APIView):
 
     serializer_class = serializers.SceneSerializer
     permission_classes = [IsWhitelisted]
+    query_budget = 2
 
     def get(self, request, id: str, *args, **kwargs):
         """Return the scene runner scene"""
@@ -566,16 +1015,27 @@ class SceneRunnerSceneView(views.APIView):
 
         try:
             try:
-                runner = models.SceneRunner.objects.get(id=id)
+                runner = models.SceneRunner.objects.select_related(
+                    "scene"
+                ).only("id", "user_id", "scene__id", "scene__version").get(
+                    id=id
+                )
             except models.SceneRunner.DoesNotExist:
                 raise rest_exceptions.NotFound(f"SceneRunner {id} not found")
 
-            if runner.user != request.user:
+            if runner.user_id != request.user.id:
                 raise exceptions.SceneRunnerNotOwnedByUserException()
 
-            serializer = self.serializer_class(runner.scene)
-            logger.debug("serializer: %s", serializer)
-            return response.Response(serializer.data)
+            scene = runner.scene
+            return get_cached_scene_response(
+                request,
+                f"scene:{scene.id}:{scene.version}",
+                format_etag(scene.version),
+                lambda: self.serializer_class(
+                    models.Scene.objects.with_npcs().get(pk=scene.pk)
+                ).data,
+                private=True,
+            )
         except Exception as e:
             import traceback
 
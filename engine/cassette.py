@@ -0,0 +1,170 @@
+import gzip
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+import uuid
+from collections import defaultdict
+from typing import IO, Any, Dict, List, Optional
+
+from config.openai import open_ai_config
+
+logger = logging.getLogger(__name__)
+logger.setLevel(open_ai_config.log_level)
+
+
+class CassetteMissError(LookupError):
+    """A request has no recorded response in the replayed cassette"""
+
+    pass
+
+
+def get_request_key(request: Dict[str, Any]) -> str:
+    """
+    Get the canonical hash of a request
+
+    The request must not include the deployment, so a cassette replays the
+    same regardless of the deployment it was recorded on.
+
+    Args:
+        request: The request
+
+    Returns:
+        The SHA-256 hex digest of the canonical JSON of the request
+    """
+    return hashlib.sha256(
+        json.dumps(
+            request, sort_keys=True, ensure_ascii=False, separators=(",", ":")
+        ).encode()
+    ).hexdigest()
+
+
+def open_file(path: str, mode: str) -> IO[str]:
+    """Open a cassette file, compressed with gzip if it ends with `.gz`"""
+    if path.endswith(".gz"):
+        return gzip.open(path, f"{mode}t", encoding="utf-8")
+    return open(path, mode, encoding="utf-8")
+
+
+class Cassette:
+    """
+    Recorded chat completions keyed by their requests
+
+    In `record` mode, each response is appended to the cassette file as a
+    JSON line with the hash of its request. In `replay` mode, the responses
+    are served from the file in the recorded order of each request, after
+    the simulated latency, without calling the API.
+    """
+
+    path: str
+    mode: str
+    latency: float
+    responses: Dict[str, List[Dict[str, Any]]]
+    served: Dict[str, int]
+    lock: threading.Lock
+
+    def __init__(self, path: str, mode: str, latency: float = 0.0):
+        if mode not in ["record", "replay"]:
+            raise ValueError(f"Unknown cassette mode {mode}")
+
+        self.path = path
+        self.mode = mode
+        self.latency = latency
+        self.responses = defaultdict(list)
+        self.served = defaultdict(int)
+        self.lock = threading.Lock()
+
+        if mode == "replay":
+            self.load()
+
+    @classmethod
+    def from_config(cls) -> Optional["Cassette"]:
+        """
+        Create the cassette configured by `OPENAI_CASSETTE_*`
+
+        Returns:
+            The cassette, or None if the cassette mode is `off`
+        """
+        if open_ai_config.cassette_mode == "off":
+            return None
+
+        return cls(
+            open_ai_config.cassette_path,
+            open_ai_config.cassette_mode,
+            open_ai_config.cassette_latency,
+        )
+
+    def load(self):
+        """Load the recorded responses from the cassette file"""
+        with open_file(self.path, "r") as f:
+            for line in f:
+                entry = json.loads(line)
+                self.responses[entry["key"]].append(entry["response"])
+
+        logger.info(
+            f"Loaded {sum(len(r) for r in self.responses.values())}"
+            f" responses from cassette {self.path}"
+        )
+
+    def rewind(self):
+        """Serve the recorded responses from the start again"""
+        with self.lock:
+            self.served.clear()
+
+    def record(self, request: Dict[str, Any], response: Dict[str, Any]):
+        """
+        Record the response to a request
+
+        Args:
+            request: The request without the deployment
+            response: The response of the API
+        """
+        line = (
+            json.dumps(
+                {"key": get_request_key(request), "response": response},
+                ensure_ascii=False,
+                separators=(",", ":"),
+            )
+            + "\n"
+        )
+        with self.lock:
+            os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+            # Appended gzip members are read back as a single stream
+            with open_file(self.path, "a") as f:
+                f.write(line)
+
+    def replay(self, request: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Replay the recorded response to a request
+
+        Repeated requests are served their recorded responses in order,
+        the last one once they run out. Each response is given a unique ID,
+        as the IDs of chat completions are primary keys in the database.
+
+        Args:
+            request: The request without the deployment
+
+        Returns:
+            The recorded response
+
+        Raises:
+            CassetteMissError: If the request was not recorded
+        """
+        key = get_request_key(request)
+        with self.lock:
+            responses = self.responses.get(key)
+            if not responses:
+                raise CassetteMissError(
+                    f"Request {key} not recorded in cassette {self.path}"
+                )
+
+            index = min(self.served[key], len(responses) - 1)
+            self.served[key] += 1
+
+        if self.latency > 0:
+            time.sleep(self.latency)
+
+        response = responses[index]
+        return response | {"id": f"{response['id']}-{uuid.uuid4().hex[:12]}"}
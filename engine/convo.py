@@ -1,11 +1,15 @@
 import abc
 import logging
+import threading
 from typing import List, Optional
 
+from pydantic import BaseModel
+
 from config.convo import convo_config
 
-from .models import Chatcmpl, Message
+from .models import CallKind, Chatcmpl, Message
 from .openai_api import call_api
+from .transcript import encode_transcript, estimate_tokens
 
 
 class BaseConvoCoupler(abc.ABC):
@@ -21,6 +25,15 @@ class BaseConvoCoupler(abc.ABC):
         """
         pass
 
+    def get_prestarted_response(self) -> Optional[Chatcmpl]:
+        """
+        Get a pre-generated API response for the initial message
+
+        Returns:
+            The pre-generated API response, None to call the API
+        """
+        return None
+
     @abc.abstractclassmethod
     def save_api_response(self, chatcmpl: Chatcmpl) -> Message:
         """
@@ -60,10 +73,10 @@ class BaseConvoCoupler(abc.ABC):
     @abc.abstractclassmethod
     def get_summary_messages(self, history_length: int) -> List[Message]:
         """
-        Get the message history and previous summary for the summary
+        Get the messages since the previous summary and the previous summary
 
         Args:
-            n: The number of messages to build from history
+            n: The maximum number of messages since the previous summary
 
         Returns:
             The list of messages (summary system message, summary message,
@@ -71,6 +84,32 @@ class BaseConvoCoupler(abc.ABC):
         """
         pass
 
+    @abc.abstractclassmethod
+    def get_unsummarized_messages(self, max_length: int) -> List[Message]:
+        """
+        Get the messages since the previous summary
+
+        Args:
+            max_length: The maximum number of latest messages to get
+
+        Returns:
+            The list of messages not covered by the previous summary
+        """
+        pass
+
+    @abc.abstractclassmethod
+    def estimate_prompt_tokens(self, history_length: int) -> int:
+        """
+        Estimate the number of tokens of the next prompt
+
+        Args:
+            history_length: The number of messages to build from history
+
+        Returns:
+            The estimated number of tokens
+        """
+        pass
+
     @abc.abstractclassmethod
     def save_summary_response(self, chatcmpl: Chatcmpl) -> Message:
         """
@@ -114,17 +153,210 @@ class BaseConvoCoupler(abc.ABC):
         pass
 
 
+class SummaryPolicyStats(BaseModel):
+    """Statistics of a summary policy"""
+
+    policy: str
+    evaluations: int
+    summaries: int
+    avoided: int
+    skipped_over_budget: int
+
+
+class BaseSummaryPolicy(abc.ABC):
+    """
+    Abstract class for deciding when to summarize the conversation
+
+    It counts the summaries avoided compared to summarizing every
+    `summary_interval` iterations, and the turns over the prompt token
+    budget not summarized by the policy.
+    """
+
+    evaluations: int
+    summaries: int
+    avoided: int
+    skipped_over_budget: int
+
+    def __init__(self):
+        self.evaluations = 0
+        self.summaries = 0
+        self.avoided = 0
+        self.skipped_over_budget = 0
+        self._lock = threading.Lock()
+
+    @abc.abstractmethod
+    def should_summarize(self, coupler: BaseConvoCoupler) -> bool:
+        """
+        Return if the conversation should be summarized
+
+        Args:
+            coupler: The coupler of the conversation
+
+        Returns:
+            True if the conversation should be summarized, False otherwise
+        """
+        pass
+
+    def decide(self, coupler: BaseConvoCoupler) -> bool:
+        """
+        Return if the conversation should be summarized and record it
+
+        Args:
+            coupler: The coupler of the conversation
+
+        Returns:
+            True if the conversation should be summarized, False otherwise
+        """
+        summarize = self.should_summarize(coupler)
+        by_interval = coupler.should_summarize(
+            convo_config.history_length, convo_config.summary_interval
+        )
+
+        with self._lock:
+            self.evaluations += 1
+            self.summaries += summarize
+            self.avoided += by_interval and not summarize
+
+        return summarize
+
+    def count_skipped_over_budget(self):
+        """Count a turn over the prompt token budget not summarized"""
+        with self._lock:
+            self.skipped_over_budget += 1
+
+    def stats(self) -> SummaryPolicyStats:
+        """
+        Get the statistics of the policy
+
+        Returns:
+            The statistics of the policy
+        """
+        with self._lock:
+            return SummaryPolicyStats(
+                policy=type(self).__name__,
+                evaluations=self.evaluations,
+                summaries=self.summaries,
+                avoided=self.avoided,
+                skipped_over_budget=self.skipped_over_budget,
+            )
+
+
+class IntervalSummaryPolicy(BaseSummaryPolicy):
+    """Summarize every `summary_interval` iterations"""
+
+    def should_summarize(self, coupler: BaseConvoCoupler) -> bool:
+        """
+        Return if the conversation should be summarized
+
+        Args:
+            coupler: The coupler of the conversation
+
+        Returns:
+            True if the conversation should be summarized, False otherwise
+        """
+        return coupler.should_summarize(
+            convo_config.history_length, convo_config.summary_interval
+        )
+
+
+class TokenBudgetSummaryPolicy(BaseSummaryPolicy):
+    """
+    Summarize when enough new text accumulated since the previous summary
+
+    It summarizes when the tokens since the previous summary reach
+    `token_threshold`, or when the next prompt would exceed
+    `prompt_token_budget` and they reach `min_tokens`. A summary does not
+    shrink the prompt of the latest messages, so without `min_tokens` a
+    conversation of long messages would be summarized on every turn.
+    """
+
+    token_threshold: int
+    prompt_token_budget: int
+    min_tokens: int
+
+    def __init__(
+        self, token_threshold: int, prompt_token_budget: int, min_tokens: int
+    ):
+        super().__init__()
+
+        self.token_threshold = token_threshold
+        self.prompt_token_budget = prompt_token_budget
+        self.min_tokens = min_tokens
+
+    def should_summarize(self, coupler: BaseConvoCoupler) -> bool:
+        """
+        Return if the conversation should be summarized
+
+        Args:
+            coupler: The coupler of the conversation
+
+        Returns:
+            True if the conversation should be summarized, False otherwise
+        """
+        unsummarized = coupler.get_unsummarized_messages(
+            convo_config.summary_max_length
+        )
+        if not unsummarized:
+            return False
+
+        tokens = estimate_tokens(encode_transcript(unsummarized))
+        if tokens >= self.token_threshold:
+            return True
+
+        if (
+            coupler.estimate_prompt_tokens(convo_config.history_length)
+            <= self.prompt_token_budget
+        ):
+            return False
+
+        if tokens >= self.min_tokens:
+            return True
+
+        # Over budget, but too little is new to be worth a summary
+        self.count_skipped_over_budget()
+        return False
+
+
+def create_summary_policy() -> BaseSummaryPolicy:
+    """
+    Create the summary policy from the convo config
+
+    Returns:
+        The summary policy
+    """
+    if convo_config.summary_policy == "interval":
+        return IntervalSummaryPolicy()
+
+    return TokenBudgetSummaryPolicy(
+        convo_config.summary_token_threshold,
+        convo_config.prompt_token_budget,
+        int(
+            convo_config.summary_token_threshold
+            * convo_config.summary_min_token_fraction
+        ),
+    )
+
+
+summary_policy = create_summary_policy()
+
+
 class Convo:
     """Conversation class for OpenAI API"""
 
     logger: logging.Logger
     coupler: BaseConvoCoupler
+    summary_policy: BaseSummaryPolicy
 
-    def __init__(self, coupler: BaseConvoCoupler):
+    def __init__(
+        self,
+        coupler: BaseConvoCoupler,
+        policy: Optional[BaseSummaryPolicy] = None,
+    ):
         self.logger = logging.getLogger(__name__)
         self.logger.setLevel(convo_config.log_level)
 
         self.coupler = coupler
+        self.summary_policy = policy or summary_policy
 
         self.logger.info("Convo created")
 
@@ -140,7 +372,12 @@ class Convo:
         init_message = self.coupler.get_init_message()
         self.logger.info(f"Init message: {init_message}")
 
-        chatcmpl = call_api([init_message])
+        chatcmpl = self.coupler.get_prestarted_response()
+        if chatcmpl is None:
+            chatcmpl = call_api([init_message])
+        else:
+            self.logger.info("Using prestarted response")
+
         chosen = self.coupler.save_api_response(chatcmpl)
 
         self.logger.info("Story initialized")
@@ -190,19 +427,17 @@ class Convo:
         """
         self.logger.info("Summarizing conversation")
 
-        if not self.coupler.should_summarize(
-            convo_config.history_length, convo_config.summary_interval
-        ):
+        if not self.summary_policy.decide(self.coupler):
             self.logger.info("Conversation should not be summarized")
             return None
 
         # Summary messages
         messages = self.coupler.get_summary_messages(
-            convo_config.history_length
+            convo_config.summary_max_length
         )
 
         # Call API
-        chatcmpl = call_api(messages)
+        chatcmpl = call_api(messages, CallKind.SUMMARY)
         summary_message = self.coupler.save_summary_response(chatcmpl)
 
         self.logger.info("Conversation summarized")
@@ -0,0 +1,270 @@
+import logging
+import random
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, List, Optional
+
+from pydantic import BaseModel
+
+from config.openai import DeploymentConfig, OpenAIConfig
+
+from .models import CallKind
+
+
+class DeploymentStats(BaseModel):
+    """Statistics of a deployment in the pool"""
+
+    name: str
+    model: str
+    kinds: List[str]
+    weight: float
+    outstanding: int
+    requests: int
+    failures: int
+    ejections: int
+    ewma_latency: Optional[float]
+    ejected: bool
+
+
+class Deployment:
+    """A deployment in the pool with its routing state"""
+
+    config: DeploymentConfig
+    credentials: Dict[str, Any]
+    target: Dict[str, Any]
+    outstanding: int
+    requests: int
+    failures: int
+    consecutive_failures: int
+    ejections: int
+    ewma_latency: Optional[float]
+    ejected_until: float
+
+    def __init__(self, config: DeploymentConfig):
+        self.config = config
+        self.credentials = {
+            "api_key": config.key,
+            "api_base": config.url,
+            "api_type": config.api_type,
+            "api_version": config.version,
+        }
+        self.target = {
+            "deployment_id": config.deployment,
+            "model": config.model,
+        }
+        self.outstanding = 0
+        self.requests = 0
+        self.failures = 0
+        self.consecutive_failures = 0
+        self.ejections = 0
+        self.ewma_latency = None
+        self.ejected_until = 0.0
+
+    def is_ejected(self, now: float) -> bool:
+        """
+        Return if the deployment is temporarily ejected
+
+        Args:
+            now: The current monotonic time
+
+        Returns:
+            True if the deployment is ejected, False otherwise
+        """
+        return now < self.ejected_until
+
+    def score(self, strategy: str) -> float:
+        """
+        Get the routing score of the deployment, lower is better
+
+        Args:
+            strategy: The routing strategy
+
+        Returns:
+            The score of the deployment
+        """
+        load = (self.outstanding + 1) / self.config.weight
+
+        if strategy == "ewma_latency":
+            # Unmeasured deployments are tried first
+            return (self.ewma_latency or 0.0) * load
+
+        return load
+
+    def to_stats(self, now: float) -> DeploymentStats:
+        """
+        Get the statistics of the deployment
+
+        Args:
+            now: The current monotonic time
+
+        Returns:
+            The statistics of the deployment
+        """
+        return DeploymentStats(
+            name=self.config.name,
+            model=self.config.model,
+            kinds=self.config.kinds,
+            weight=self.config.weight,
+            outstanding=self.outstanding,
+            requests=self.requests,
+            failures=self.failures,
+            ejections=self.ejections,
+            ewma_latency=self.ewma_latency,
+            ejected=self.is_ejected(now),
+        )
+
+
+class DeploymentPool:
+    """Pool of deployments routed by load or latency"""
+
+    logger: logging.Logger
+    deployments: List[Deployment]
+    strategy: str
+    ewma_alpha: float
+    eject_failures: int
+    eject_seconds: float
+
+    def __init__(
+        self,
+        configs: List[DeploymentConfig],
+        strategy: str = "least_outstanding",
+        ewma_alpha: float = 0.3,
+        eject_failures: int = 3,
+        eject_seconds: float = 30.0,
+    ):
+        self.logger = logging.getLogger(__name__)
+
+        self.deployments = [Deployment(c) for c in configs]
+        self.strategy = strategy
+        self.ewma_alpha = ewma_alpha
+        self.eject_failures = eject_failures
+        self.eject_seconds = eject_seconds
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_config(cls, config: OpenAIConfig) -> "DeploymentPool":
+        """
+        Create a pool from the OpenAI config
+
+        Args:
+            config: The OpenAI config
+
+        Returns:
+            The created pool
+        """
+        pool = cls(
+            config.get_deployments(),
+            strategy=config.routing_strategy,
+            ewma_alpha=config.ewma_alpha,
+            eject_failures=config.eject_failures,
+            eject_seconds=config.eject_seconds,
+        )
+        pool.logger.setLevel(config.log_level)
+        return pool
+
+    def select(self, kind: CallKind) -> Deployment:
+        """
+        Select a deployment for the call and mark it outstanding
+
+        Ejected deployments are skipped, unless all deployments serving the
+        kind are ejected, then the one to recover soonest is used.
+
+        Args:
+            kind: The kind of the call
+
+        Returns:
+            The selected deployment
+        """
+        with self._lock:
+            now = time.monotonic()
+            candidates = [
+                d for d in self.deployments if kind in d.config.kinds
+            ]
+            if not candidates:
+                raise ValueError(f"No deployment serves {kind} calls")
+
+            available = [d for d in candidates if not d.is_ejected(now)]
+            if available:
+                best = min(d.score(self.strategy) for d in available)
+                chosen = random.choice(
+                    [d for d in available if d.score(self.strategy) == best]
+                )
+            else:
+                chosen = min(candidates, key=lambda d: d.ejected_until)
+
+            chosen.outstanding += 1
+            chosen.requests += 1
+            return chosen
+
+    def release(
+        self, deployment: Deployment, latency: float, succeeded: bool
+    ):
+        """
+        Release a deployment after the call and update its state
+
+        Args:
+            deployment: The deployment used for the call
+            latency: The latency of the call in seconds
+            succeeded: True if the call succeeded, False otherwise
+        """
+        with self._lock:
+            deployment.outstanding -= 1
+
+            if succeeded:
+                deployment.consecutive_failures = 0
+                deployment.ewma_latency = (
+                    latency
+                    if deployment.ewma_latency is None
+                    else self.ewma_alpha * latency
+                    + (1 - self.ewma_alpha) * deployment.ewma_latency
+                )
+                return
+
+            deployment.failures += 1
+            deployment.consecutive_failures += 1
+            if deployment.consecutive_failures >= self.eject_failures:
+                deployment.consecutive_failures = 0
+                deployment.ejections += 1
+                deployment.ejected_until = (
+                    time.monotonic() + self.eject_seconds
+                )
+                self.logger.warning(
+                    f"Deployment {deployment.config.name} ejected for"
+                    f" {self.eject_seconds} seconds"
+                )
+
+    @contextmanager
+    def use(self, kind: CallKind) -> Iterator[Deployment]:
+        """
+        Use a deployment for the duration of a call
+
+        Args:
+            kind: The kind of the call
+
+        Yields:
+            The selected deployment
+        """
+        deployment = self.select(kind)
+        self.logger.debug(f"Routing {kind} call to {deployment.config.name}")
+
+        start = time.perf_counter()
+        succeeded = False
+        try:
+            yield deployment
+            succeeded = True
+        finally:
+            self.release(
+                deployment, time.perf_counter() - start, succeeded
+            )
+
+    def stats(self) -> List[DeploymentStats]:
+        """
+        Get the statistics of all deployments
+
+        Returns:
+            The list of deployment statistics
+        """
+        with self._lock:
+            now = time.monotonic()
+            return [d.to_stats(now) for d in self.deployments]
@@ -0,0 +1,114 @@
+import hashlib
+import json
+import threading
+from typing import Any, Callable, Dict, List, Tuple
+
+from data.scene import Knowledge
+
+from .models import Function, Parameter, Parameters
+
+
+class KnowledgeSchema:
+    """
+    Compiled knowledge selection function of an NPC
+
+    The function JSON schema is dumped once, so it is reused byte-for-byte
+    by every knowledge selection call.
+    """
+
+    FUNCTION_NAME: str = "get_knowledge"
+    FUNCTION_DESCRIPTION: str = (
+        "Get the assistant's knowledge to use for responding the"
+        " user's message. The assistant and user refer to the"
+        " conversation messages in the JSON list."
+    )
+
+    version: str
+    function: Function
+    function_dump: Dict[str, Any]
+    knowledges: Dict[str, str]
+
+    def __init__(self, knowledges: List[Knowledge]):
+        knowledges = sorted(knowledges, key=lambda k: k.id)
+
+        self.version = self.get_version(knowledges)
+        self.function = Function(
+            name=self.FUNCTION_NAME,
+            description=self.FUNCTION_DESCRIPTION,
+            parameters=Parameters(
+                parameters={
+                    k.name: Parameter(
+                        type="boolean",
+                        description=k.description,
+                        required=True,
+                    )
+                    for k in knowledges
+                }
+            ),
+        )
+        self.function_dump = self.function.model_dump()
+        self.knowledges = {k.name: k.knowledge for k in knowledges}
+
+    @staticmethod
+    def get_version(knowledges: List[Knowledge]) -> str:
+        """
+        Get the version of a knowledge set
+
+        Args:
+            knowledges: The knowledges
+
+        Returns:
+            The content hash of the knowledges
+        """
+        content = json.dumps(
+            [
+                [k.id, k.name, k.description, k.knowledge]
+                for k in sorted(knowledges, key=lambda k: k.id)
+            ]
+        )
+        return hashlib.sha256(content.encode()).hexdigest()
+
+    def select(self, arguments: Dict[str, Any]) -> str:
+        """
+        Get the knowledge text selected by the function arguments
+
+        Args:
+            arguments: The parsed arguments of the function call
+
+        Returns:
+            The selected knowledge joined in schema order
+        """
+        return " ".join(
+            knowledge
+            for name, knowledge in self.knowledges.items()
+            if arguments.get(name)
+        )
+
+
+knowledge_schemas: Dict[str, Tuple[str, KnowledgeSchema]] = {}
+knowledge_schemas_lock = threading.Lock()
+
+
+def get_knowledge_schema(
+    key: str, version: str, load: Callable[[], List[Knowledge]]
+) -> KnowledgeSchema:
+    """
+    Get the cached knowledge schema of an NPC, compiling it if outdated
+
+    Args:
+        key: The key of the NPC
+        version: The current version of the NPC's knowledge set
+        load: The function to load the knowledges on a cache miss
+
+    Returns:
+        The knowledge schema
+    """
+    cached = knowledge_schemas.get(key)
+    if cached is not None and cached[0] == version:
+        return cached[1]
+
+    schema = KnowledgeSchema(load())
+    with knowledge_schemas_lock:
+        knowledge_schemas[key] = (version, schema)
+
+    return schema
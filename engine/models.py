@@ -17,6 +17,14 @@ class Role(StrEnum):
         return repr(self.value)
 
 
+class CallKind(StrEnum):
+    """Kind of OpenAI API call, used to route to deployments"""
+
+    MESSAGE = "message"
+    SUMMARY = "summary"
+    KNOWLEDGE = "knowledge"
+
+
 class Parameter(BaseModel):
     """Function parameter"""
 
@@ -106,7 +114,7 @@ class Message(BaseModel):
             dump["name"] = self.name
 
         if self.function_call is not None:
-            dump["function_call"] = self.function_call
+            dump["function_call"] = self.function_call.model_dump()
 
         return dump
 
@@ -136,6 +144,8 @@ class Chatcmpl(BaseModel):
     model: str
     choices: List[Choice]
     usage: Usage
+    # The usage is shared with the identical call which made the API call
+    shared: bool = Field(False)
 
 
 class ChatcmplRequest(BaseModel):
@@ -162,3 +172,15 @@ class ChatcmplRequest(BaseModel):
             dump.pop("function_call")
 
         return dump
+
+
+# Static fields of every request, from the defaults of ChatcmplRequest
+REQUEST_DEFAULTS: Dict[str, Any] = {
+    k: v
+    for k, v in ChatcmplRequest.model_construct(
+        deployment_id="", model="", messages=[]
+    )
+    .model_dump()
+    .items()
+    if k not in ["deployment_id", "model", "messages"]
+}
@@ -1,42 +1,99 @@
 import logging
-from typing import List
+import uuid
+from typing import Any, Dict, List
 
 import openai
 
 from config.logger import logger_config
 from config.openai import open_ai_config
 
-from .models import (
-    Chatcmpl,
-    ChatcmplRequest,
-    Function,
-    FunctionCallRequest,
-    Message,
-)
-
-openai.api_key = open_ai_config.key
-openai.api_base = open_ai_config.url
-openai.api_type = open_ai_config.api_type
-openai.api_version = open_ai_config.version
-
+from .cassette import Cassette, get_request_key
+from .deployment import DeploymentPool, DeploymentStats
+from .models import REQUEST_DEFAULTS, CallKind, Chatcmpl, Function, Message
+from .single_flight import SingleFlight, SingleFlightStats
 
 logger = logging.getLogger(__name__)
 logger.setLevel(logger_config.level)
 
+pool = DeploymentPool.from_config(open_ai_config)
+cassette = Cassette.from_config()
+# The store sharing the calls across processes is set by the app using it
+flights = SingleFlight()
+flights.logger.setLevel(open_ai_config.log_level)
 
-def call_api(messages: List[Message]) -> Chatcmpl:
-    """Call the OpenAI API with the given messages"""
-    request = ChatcmplRequest(
-        deployment_id=open_ai_config.deployment,
-        model=open_ai_config.model,
-        messages=[m.model_dump() for m in messages],
-    )
-    request = request.model_dump()
 
-    logger.debug(f"Calling API with messages: {request}")
+def create_chatcmpl(
+    kind: CallKind, request: Dict[str, Any], coalesce: bool = True
+) -> Chatcmpl:
+    """
+    Create a chat completion on a deployment selected from the pool
+
+    The static fields of the request are filled from `REQUEST_DEFAULTS`
+    and the deployment, so the request model is not built for every call.
+
+    If a cassette is configured, the response is recorded to it or
+    replayed from it instead of calling the API.
+
+    Identical requests made while one is in flight share its response,
+    unless `OPENAI_SINGLE_FLIGHT` is off. A shared response is given a
+    unique ID, as the IDs of chat completions are primary keys in the
+    database, and marked as shared, so its usage is counted once.
+
+    Args:
+        kind: The kind of the call
+        request: The messages and functions of the request
+        coalesce: Share the response of an identical request in flight
+
+    Returns:
+        The chat completion
+    """
+    request = REQUEST_DEFAULTS | request
+
+    def create() -> Dict[str, Any]:
+        with pool.use(kind) as deployment:
+            if cassette is not None and cassette.mode == "replay":
+                response = cassette.replay(request)
+            else:
+                logger.debug(
+                    f"Calling API on {deployment.config.name} with: {request}"
+                )
+
+                response = openai.ChatCompletion.create(
+                    **deployment.target, **request, **deployment.credentials
+                )
+
+        if cassette is not None and cassette.mode == "record":
+            cassette.record(request, response)
 
-    response = openai.ChatCompletion.create(**request)
-    response = Chatcmpl(**response)
+        return response
+
+    if not (coalesce and open_ai_config.single_flight):
+        return Chatcmpl.model_validate(create())
+
+    response, shared = flights.do(
+        f"{kind}:{get_request_key(request)}", create
+    )
+    if shared:
+        response = response | {
+            "id": f"{response['id']}-{uuid.uuid4().hex[:12]}",
+            "shared": True,
+        }
+    return Chatcmpl.model_validate(response)
+
+
+def call_api(
+    messages: List[Message],
+    kind: CallKind = CallKind.MESSAGE,
+    coalesce: bool = True,
+) -> Chatcmpl:
+    """
+    Call the OpenAI API with the given messages
+
+    Identical calls in flight share one response, unless `coalesce` is off.
+    """
+    response = create_chatcmpl(
+        kind, {"messages": [m.model_dump() for m in messages]}, coalesce
+    )
 
     logger.debug(f"API response: {response}")
 
@@ -47,21 +104,30 @@ def call_api(messages: List[Message]) -> Chatcmpl:
     return response
 
 
-def call_api_function(messages: List[Message], function: Function) -> Chatcmpl:
-    """Call the OpenAI API to provide arguments for the function"""
-    request = ChatcmplRequest(
-        deployment_id=open_ai_config.deployment,
-        model=open_ai_config.model,
-        messages=[m.model_dump() for m in messages],
-        functions=[function],
-        function_call=FunctionCallRequest(name=function.name),
+def call_api_function(
+    messages: List[Message],
+    function: Function | Dict[str, Any],
+    kind: CallKind = CallKind.KNOWLEDGE,
+    coalesce: bool = True,
+) -> Chatcmpl:
+    """
+    Call the OpenAI API to provide arguments for the function
+
+    The function may be given as its precompiled JSON schema dict. Identical
+    calls in flight share one response, unless `coalesce` is off.
+    """
+    if isinstance(function, Function):
+        function = function.model_dump()
+
+    response = create_chatcmpl(
+        kind,
+        {
+            "messages": [m.model_dump() for m in messages],
+            "functions": [function],
+            "function_call": {"name": function["name"]},
+        },
+        coalesce,
     )
-    request = request.model_dump()
-
-    logger.debug(f"Calling API with messages and function: {request}")
-
-    response = openai.ChatCompletion.create(**request)
-    response = Chatcmpl(**response)
 
     if response.choices[0].message.function_call is None:
         logger.error("API Function is not called.")
@@ -69,3 +135,13 @@ def call_api_function(messages: List[Message], function: Function) -> Chatcmpl:
 
     logger.debug(f"API response: {response}")
     return response
+
+
+def get_deployment_stats() -> List[DeploymentStats]:
+    """Get the statistics of the deployments in the pool"""
+    return pool.stats()
+
+
+def get_single_flight_stats() -> SingleFlightStats:
+    """Get the statistics of the calls coalesced by the single-flight"""
+    return flights.stats()
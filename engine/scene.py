@@ -1,11 +1,15 @@
 import abc
 import logging
-from typing import List, Optional
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Iterator, List, Optional
+
+from pydantic import BaseModel, Field
 
 from config.adventure import adventure_config
 from data.scene import Scene as SceneData
 from data.scene import SceneNpc
-from engine.convo import BaseConvoCoupler
+from engine.convo import BaseConvoCoupler, Convo
+from engine.models import Message
 
 
 class BaseSceneCoupler(abc.ABC):
@@ -49,6 +53,24 @@ class BaseSceneCoupler(abc.ABC):
         """
         pass
 
+    def end_broadcast_turn(self):
+        """
+        Releases the resources of the worker thread a broadcast turn ran in.
+
+        Called in the worker thread after each NPC turn of a broadcast.
+        """
+        pass
+
+
+class NpcTurn(BaseModel):
+    """The result of an NPC turn in a broadcast"""
+
+    index: int
+    user_response: Optional[Message] = Field(None)
+    api_response: Optional[Message] = Field(None)
+    summary: Optional[Message] = Field(None)
+    error: Optional[str] = Field(None)
+
 
 class Scene:
     """The Scene class for holding NPCs"""
@@ -87,3 +109,95 @@ class Scene:
 
         npc_coupler = self.coupler.get_npc_user_flow(index)
         return npc_coupler
+
+    def process_npc_turn(self, index: int, message: Message) -> NpcTurn:
+        """
+        Processes a turn of the user talking to an NPC.
+
+        Errors are returned in the turn instead of raised, so the other
+        NPCs of a broadcast are not affected.
+
+        Args:
+            index: The index of the NPC to talk to
+            message: The user message
+
+        Returns:
+            The turn of the NPC
+        """
+        turn = NpcTurn(index=index)
+        try:
+            convo_coupler = self.coupler.get_npc_user_flow(index)
+            if convo_coupler is None:
+                turn.error = f"NPC {index} not found"
+                return turn
+
+            convo = Convo(convo_coupler)
+            turn.user_response = convo.process_user_response(
+                message.model_copy()
+            )
+            if turn.user_response is None:
+                return turn
+
+            turn.api_response = convo.process_api_response()
+            turn.summary = convo.summarize()
+        except Exception as e:
+            self.logger.exception(f"NPC {index} turn failed")
+            turn.error = str(e)
+
+        return turn
+
+    def broadcast(
+        self,
+        indices: List[int],
+        message: Message,
+        max_workers: Optional[int] = None,
+    ) -> Iterator[NpcTurn]:
+        """
+        Sends a user message to several NPCs concurrently.
+
+        The turns run in a bounded pool of worker threads, so the wall time
+        is that of the slowest NPC rather than the sum of all.
+
+        Args:
+            indices: The indices of the NPCs to talk to
+            message: The user message
+            max_workers: The maximum number of turns run at once, defaults
+                to `adventure_config.broadcast_max_workers`
+
+        Yields:
+            The turns of the NPCs in the order they complete
+        """
+        if not indices:
+            return
+
+        max_workers = min(
+            max_workers or adventure_config.broadcast_max_workers,
+            len(indices),
+        )
+        self.logger.info(
+            f"Broadcasting to {len(indices)} NPCs"
+            f" with {max_workers} workers."
+        )
+
+        executor = ThreadPoolExecutor(
+            max_workers=max_workers, thread_name_prefix="broadcast"
+        )
+        try:
+            futures = [
+                executor.submit(self.__process_broadcast_turn, index, message)
+                for index in indices
+            ]
+            for future in as_completed(futures):
+                yield future.result()
+        finally:
+            # Do not start the remaining turns if the caller stops early
+            executor.shutdown(wait=True, cancel_futures=True)
+
+    def __process_broadcast_turn(
+        self, index: int, message: Message
+    ) -> NpcTurn:
+        """Processes an NPC turn of a broadcast in a worker thread"""
+        try:
+            return self.process_npc_turn(index, message)
+        finally:
+            self.coupler.end_broadcast_turn()
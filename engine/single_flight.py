@@ -0,0 +1,215 @@
+import abc
+import logging
+import threading
+from typing import Any, Callable, Dict, Optional, Tuple
+
+from pydantic import BaseModel
+
+Result = Dict[str, Any]
+
+
+class SingleFlightStats(BaseModel):
+    """Statistics of the coalesced calls"""
+
+    calls: int
+    upstream: int
+    shared: int
+    shared_across_processes: int
+    in_flight: int
+
+
+class BaseFlightStore(abc.ABC):
+    """
+    Abstract class for sharing the results of flights across processes
+
+    A flight is claimed by one process, which makes the call and publishes
+    its result, while the other processes wait for it.
+    """
+
+    @abc.abstractmethod
+    def claim(self, key: str) -> Tuple[str, bool]:
+        """
+        Claim the flight of a key, or join the flight claimed by another
+
+        Args:
+            key: The key of the flight
+
+        Returns:
+            The token of the flight, and True if it was claimed by this call
+        """
+        pass
+
+    @abc.abstractmethod
+    def publish(self, key: str, token: str, result: Result):
+        """
+        Publish the result of a claimed flight
+
+        Args:
+            key: The key of the flight
+            token: The token of the flight
+            result: The result of the call
+        """
+        pass
+
+    @abc.abstractmethod
+    def release(self, key: str, token: str):
+        """
+        Release a claimed flight, after publishing its result or failing
+
+        Args:
+            key: The key of the flight
+            token: The token of the flight
+        """
+        pass
+
+    @abc.abstractmethod
+    def wait(self, key: str, token: str) -> Optional[Result]:
+        """
+        Wait for the result of a flight claimed by another process
+
+        Args:
+            key: The key of the flight
+            token: The token of the flight
+
+        Returns:
+            The result, None if the flight failed or took too long
+        """
+        pass
+
+
+class Flight:
+    """A call in flight, waited on by the identical calls"""
+
+    done: threading.Event
+    result: Optional[Result]
+    error: Optional[BaseException]
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class SingleFlight:
+    """
+    Coalescing of identical concurrent calls into one
+
+    The first call of a key makes the call, and the calls of the key made
+    while it is in flight wait for it and share its result or error. With a
+    store, the calls of the processes sharing it are coalesced too.
+    """
+
+    logger: logging.Logger
+    store: Optional[BaseFlightStore]
+    flights: Dict[str, Flight]
+    calls: int
+    upstream: int
+    shared: int
+    shared_across_processes: int
+
+    def __init__(self, store: Optional[BaseFlightStore] = None):
+        self.logger = logging.getLogger(__name__)
+
+        self.store = store
+        self.flights = {}
+        self.calls = 0
+        self.upstream = 0
+        self.shared = 0
+        self.shared_across_processes = 0
+        self._lock = threading.Lock()
+
+    def do(self, key: str, call: Callable[[], Result]) -> Tuple[Result, bool]:
+        """
+        Make a call, or share the result of the identical one in flight
+
+        Args:
+            key: The key identifying identical calls
+            call: The function making the call
+
+        Returns:
+            The result, and True if it is shared from another call
+        """
+        with self._lock:
+            self.calls += 1
+            flight = self.flights.get(key)
+            leader = flight is None
+            if leader:
+                flight = self.flights[key] = Flight()
+            else:
+                self.shared += 1
+
+        if not leader:
+            flight.done.wait()
+            if flight.error is not None:
+                raise flight.error
+            return flight.result, True
+
+        try:
+            flight.result, shared = self.call_across_processes(key, call)
+            return flight.result, shared
+        except BaseException as e:
+            flight.error = e
+            raise
+        finally:
+            with self._lock:
+                del self.flights[key]
+            flight.done.set()
+
+    def call_across_processes(
+        self, key: str, call: Callable[[], Result]
+    ) -> Tuple[Result, bool]:
+        """
+        Make a call, or share the result of one in flight in another process
+
+        The processes sharing the store coalesce their identical calls.
+
+        Args:
+            key: The key identifying identical calls
+            call: The function making the call
+
+        Returns:
+            The result, and True if it is shared from another process
+        """
+        if self.store is None:
+            return self.call_upstream(call), False
+
+        token, claimed = self.store.claim(key)
+        if not claimed:
+            result = self.store.wait(key, token)
+            if result is not None:
+                with self._lock:
+                    self.shared_across_processes += 1
+                return result, True
+
+            # The other process failed or is too slow, so call on our own
+            self.logger.info(f"Flight {key} not shared, calling upstream")
+            return self.call_upstream(call), False
+
+        try:
+            result = self.call_upstream(call)
+            self.store.publish(key, token, result)
+            return result, False
+        finally:
+            self.store.release(key, token)
+
+    def call_upstream(self, call: Callable[[], Result]) -> Result:
+        """Make a call, counting it as upstream"""
+        with self._lock:
+            self.upstream += 1
+        return call()
+
+    def stats(self) -> SingleFlightStats:
+        """
+        Get the statistics of the coalesced calls
+
+        Returns:
+            The statistics
+        """
+        with self._lock:
+            return SingleFlightStats(
+                calls=self.calls,
+                upstream=self.upstream,
+                shared=self.shared,
+                shared_across_processes=self.shared_across_processes,
+                in_flight=len(self.flights),
+            )
@@ -0,0 +1,67 @@
+import json
+import math
+from typing import Any, Dict, List
+
+from .models import Message
+
+
+def message_to_dict(message: Message) -> Dict[str, Any]:
+    """
+    Convert a message to a dict without null fields
+
+    Args:
+        message: The message
+
+    Returns:
+        The dict of the message
+    """
+    dump: Dict[str, Any] = {"role": message.role.value}
+
+    if message.content is not None:
+        dump["content"] = message.content
+
+    if message.name is not None:
+        dump["name"] = message.name
+
+    if message.function_call is not None:
+        dump["function_call"] = {
+            "name": message.function_call.name,
+            "arguments": message.function_call.arguments,
+        }
+
+    return dump
+
+
+def encode_transcript(messages: List[Message]) -> str:
+    """
+    Encode messages as a compact transcript for prompts
+
+    The transcript is a minified JSON list of the messages without null
+    fields, so it is both canonical and token-efficient.
+
+    Args:
+        messages: The messages
+
+    Returns:
+        The encoded transcript
+    """
+    return json.dumps(
+        [message_to_dict(m) for m in messages],
+        ensure_ascii=False,
+        separators=(",", ":"),
+    )
+
+
+def estimate_tokens(text: str) -> int:
+    """
+    Estimate the number of tokens of a text
+
+    Uses the rule of thumb of about 4 characters per token for English.
+
+    Args:
+        text: The text
+
+    Returns:
+        The estimated number of tokens
+    """
+    return math.ceil(len(text) / 4)
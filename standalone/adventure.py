@@ -2,7 +2,7 @@ import logging
 import traceback
 
 from config.adventure import adventure_config
-from engine.convo import Convo
+from engine.convo import Convo, summary_policy
 from engine.models import Message, Role
 
 from .couplers.convo import ConvoCoupler
@@ -35,6 +35,7 @@ class Adventure:
 
         self.logger.info("Adventure ended")
         print(f"Used {self.convo_coupler.token_used} tokens")
+        print(f"Summary policy: {summary_policy.stats()}")
 
     def init_adventure(self):
         """Initialize the adventure"""
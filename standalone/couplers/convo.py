@@ -3,26 +3,28 @@ import logging
 from typing import List, Optional
 
 from config.adventure import adventure_config
+from config.convo import convo_config
+from config.standalone import standalone_config
 from data.scene import SceneNpc
 from engine.convo import BaseConvoCoupler
-from engine.models import (
-    Chatcmpl,
-    Function,
-    Message,
-    Parameter,
-    Parameters,
-    Role,
-)
+from engine.knowledge import KnowledgeSchema, get_knowledge_schema
+from engine.models import CallKind, Chatcmpl, Message, Role, Usage
 from engine.openai_api import call_api_function
+from engine.transcript import encode_transcript, estimate_tokens
+
+from ..history import ConvoHistory, get_spill_path
+from ..journal import Journal, JournalRecord
 
 
 class ConvoCoupler(BaseConvoCoupler):
     """Coupler for Adventure Convo"""
 
     logger: logging.Logger
-    message: List[Message]
-    chatcmpl: List[Chatcmpl]
+    name: str
+    history: ConvoHistory
+    journal: Optional[Journal]
     summary: Optional[str]
+    summarized_length: int
 
     system_message: str
     start_message: str
@@ -35,13 +37,24 @@ class ConvoCoupler(BaseConvoCoupler):
         start_message: Optional[str] = None,
         summary_system_message: Optional[str] = None,
         summary_system_message_no_prev: Optional[str] = None,
+        name: str = "adventure",
+        journal: Optional[Journal] = None,
     ):
         self.logger = logging.getLogger(__name__)
         self.logger.setLevel(adventure_config.log_level)
 
-        self.message = []
-        self.chatcmpl = []
+        self.name = name
+        self.journal = journal
+        self.history = ConvoHistory(
+            max(
+                standalone_config.history_window_size,
+                convo_config.history_length,
+                convo_config.summary_max_length,
+            ),
+            get_spill_path(name),
+        )
         self.summary = None
+        self.summarized_length = 0
 
         self.system_message = system_message or adventure_config.system_message
         self.start_message = start_message or adventure_config.start_message
@@ -63,7 +76,7 @@ class ConvoCoupler(BaseConvoCoupler):
         Returns:
             The number of tokens used
         """
-        return sum(c.usage.total_tokens for c in self.chatcmpl)
+        return self.history.total_tokens
 
     def get_init_message(self) -> Message:
         """
@@ -88,11 +101,19 @@ class ConvoCoupler(BaseConvoCoupler):
         Returns:
             The chosen response message
         """
-        self.chatcmpl.append(chatcmpl)
+        self.history.add_usage(chatcmpl.usage)
         chosen = chatcmpl.choices[
             adventure_config.default_choice_index
         ].message
-        self.message.append(chosen)
+        self.history.append(chosen)
+        self.write_journal(
+            {
+                "type": "chatcmpl",
+                "kind": CallKind.MESSAGE,
+                "usage": chatcmpl.usage.model_dump(),
+            }
+        )
+        self.write_journal({"type": "message", "message": chosen.model_dump()})
         self.logger.debug(f"API response saved: {chosen}")
 
         return chosen
@@ -104,7 +125,10 @@ class ConvoCoupler(BaseConvoCoupler):
         Args:
             message: The user message
         """
-        self.message.append(message)
+        self.history.append(message)
+        self.write_journal(
+            {"type": "message", "message": message.model_dump()}
+        )
         self.logger.debug(f"User response saved: {message}")
 
     def get_built_messages(self, history_length: int) -> List[Message]:
@@ -129,16 +153,16 @@ class ConvoCoupler(BaseConvoCoupler):
             )
         )
 
-        messages.extend(self.message[-history_length:])
+        messages.extend(self.history.latest(history_length))
 
         return messages
 
     def get_summary_messages(self, history_length: int) -> List[Message]:
         """
-        Get the message history and previous summary for the summary
+        Get the messages since the previous summary and the previous summary
 
         Args:
-            n: The number of messages to build from history
+            n: The maximum number of messages since the previous summary
 
         Returns:
             The list of messages (summary system message, summary message,
@@ -148,7 +172,7 @@ class ConvoCoupler(BaseConvoCoupler):
 
         messages = []
 
-        if self.summary is not None:
+        if self.summary is None:
             messages.append(
                 Message(
                     role=Role.SYSTEM,
@@ -169,9 +193,9 @@ class ConvoCoupler(BaseConvoCoupler):
                 )
             )
 
-        json_history_messages = [
-            m.model_dump() for m in self.message[-history_length:]
-        ]
+        json_history_messages = encode_transcript(
+            self.get_unsummarized_messages(history_length)
+        )
         messages.append(
             Message(
                 role=Role.ASSISTANT,
@@ -183,6 +207,36 @@ class ConvoCoupler(BaseConvoCoupler):
 
         return messages
 
+    def get_unsummarized_messages(self, max_length: int) -> List[Message]:
+        """
+        Get the messages since the previous summary
+
+        Args:
+            max_length: The maximum number of latest messages to get
+
+        Returns:
+            The list of messages not covered by the previous summary
+        """
+        return self.history.latest(max_length, start=self.summarized_length)
+
+    def estimate_prompt_tokens(self, history_length: int) -> int:
+        """
+        Estimate the number of tokens of the next prompt
+
+        Extra system message content added by subclasses is not included.
+
+        Args:
+            history_length: The number of messages to build from history
+
+        Returns:
+            The estimated number of tokens
+        """
+        return estimate_tokens(
+            encode_transcript(
+                ConvoCoupler.get_built_messages(self, history_length)
+            )
+        )
+
     def save_summary_response(self, chatcmpl: Chatcmpl) -> Message:
         """
         Save the summary message
@@ -193,11 +247,26 @@ class ConvoCoupler(BaseConvoCoupler):
         Returns:
             The summary message
         """
-        self.chatcmpl.append(chatcmpl)
+        self.history.add_usage(chatcmpl.usage)
         chosen = chatcmpl.choices[
             adventure_config.default_choice_index
         ].message
         self.summary = chosen.content
+        self.summarized_length = len(self.history)
+        self.write_journal(
+            {
+                "type": "chatcmpl",
+                "kind": CallKind.SUMMARY,
+                "usage": chatcmpl.usage.model_dump(),
+            }
+        )
+        self.write_journal(
+            {
+                "type": "summary",
+                "summary": self.summary,
+                "summarized_length": self.summarized_length,
+            }
+        )
         self.logger.debug(f"Summary response saved: {self.summary}")
 
         return chosen
@@ -227,7 +296,73 @@ class ConvoCoupler(BaseConvoCoupler):
         Returns:
             True if the conversation should be summarized, False otherwise
         """
-        return len(self.message) % summary_interval in [0, 1]
+        return len(self.history) % summary_interval in [0, 1]
+
+    def write_journal(self, record: JournalRecord):
+        """
+        Append a record of this conversation to the session journal
+
+        Args:
+            record: The record
+        """
+        if self.journal is not None:
+            self.journal.write({"convo": self.name} | record)
+
+    def restore_record(self, record: JournalRecord):
+        """
+        Restore a record of this conversation from the session journal
+
+        Args:
+            record: The record
+        """
+        if record["type"] == "message":
+            self.history.append(Message.model_validate(record["message"]))
+        elif record["type"] == "chatcmpl":
+            self.history.add_usage(Usage.model_validate(record["usage"]))
+        elif record["type"] == "summary":
+            self.summary = record["summary"]
+            self.summarized_length = record["summarized_length"]
+        elif record["type"] == "skip":
+            self.history.skip(record["count"])
+        else:
+            raise ValueError(f"Unknown journal record {record['type']}")
+
+    def get_snapshot_records(self) -> List[JournalRecord]:
+        """
+        Get the records restoring the current state of this conversation
+
+        Only the messages in the history window are kept.
+
+        Returns:
+            The records
+        """
+        messages = self.history.latest(len(self.history.window))
+        records = [
+            {"type": "skip", "count": len(self.history) - len(messages)},
+            *(
+                {"type": "message", "message": message.model_dump()}
+                for message in messages
+            ),
+            {
+                "type": "chatcmpl",
+                "kind": CallKind.MESSAGE,
+                "usage": {
+                    "prompt_tokens": self.history.prompt_tokens,
+                    "completion_tokens": self.history.completion_tokens,
+                    "total_tokens": self.history.total_tokens,
+                },
+            },
+        ]
+        if self.summary is not None:
+            records.append(
+                {
+                    "type": "summary",
+                    "summary": self.summary,
+                    "summarized_length": self.summarized_length,
+                }
+            )
+
+        return [{"convo": self.name} | record for record in records]
 
 
 class SceneNpcConvoCoupler(ConvoCoupler):
@@ -240,12 +375,20 @@ class SceneNpcConvoCoupler(ConvoCoupler):
     logger: logging.Logger
     scene_system_message: str
     npc: SceneNpc
+    knowledge_version: str
     knowledge_selection_token_used: int
 
-    def __init__(self, system_message: str, npc: SceneNpc):
+    def __init__(
+        self,
+        system_message: str,
+        npc: SceneNpc,
+        journal: Optional[Journal] = None,
+    ):
         super().__init__(
             system_message=f"{system_message} {npc.character}",
             start_message="",
+            name=npc.id,
+            journal=journal,
         )
 
         self.logger = logging.getLogger(__name__)
@@ -253,6 +396,7 @@ class SceneNpcConvoCoupler(ConvoCoupler):
 
         self.scene_system_message = system_message
         self.npc = npc
+        self.knowledge_version = KnowledgeSchema.get_version(npc.knowledges)
         self.knowledge_selection_token_used = 0
 
         self.logger.info(f"SceneNpcConvoCoupler for {npc.id} created")
@@ -298,6 +442,49 @@ class SceneNpcConvoCoupler(ConvoCoupler):
         """
         return message.content == "\\back"
 
+    def restore_record(self, record: JournalRecord):
+        """
+        Restore a record of this conversation from the session journal
+
+        Args:
+            record: The record
+        """
+        if (
+            record["type"] == "chatcmpl"
+            and record["kind"] == CallKind.KNOWLEDGE
+        ):
+            self.knowledge_selection_token_used += record["usage"][
+                "total_tokens"
+            ]
+            return
+
+        super().restore_record(record)
+
+    def get_snapshot_records(self) -> List[JournalRecord]:
+        """
+        Get the records restoring the current state of this conversation
+
+        Returns:
+            The records
+        """
+        records = super().get_snapshot_records()
+        if self.knowledge_selection_token_used:
+            # Only the total of the knowledge selection usage is kept
+            records.append(
+                {
+                    "convo": self.name,
+                    "type": "chatcmpl",
+                    "kind": CallKind.KNOWLEDGE,
+                    "usage": {
+                        "prompt_tokens": 0,
+                        "completion_tokens": 0,
+                        "total_tokens": self.knowledge_selection_token_used,
+                    },
+                }
+            )
+
+        return records
+
     def get_knowledge(self, convo_messages: List[Message]) -> str:
         """
         Get the knowledge to use for the NPC
@@ -311,23 +498,8 @@ class SceneNpcConvoCoupler(ConvoCoupler):
         self.logger.info("Getting knowledge to use")
 
         # Prepare the function and messages
-        function = Function(
-            name="get_knowledge",
-            description=(
-                "Get the assistant's knowledge to use for responding the"
-                " user's message. The assistant and user refer to the"
-                " conversation messages in the JSON list."
-            ),
-            parameters=Parameters(
-                parameters={
-                    k.name: Parameter(
-                        type="boolean",
-                        description=k.description,
-                        required=True,
-                    )
-                    for k in self.npc.knowledges
-                }
-            ),
+        schema = get_knowledge_schema(
+            self.npc.id, self.knowledge_version, lambda: self.npc.knowledges
         )
 
         messages = []
@@ -339,7 +511,7 @@ class SceneNpcConvoCoupler(ConvoCoupler):
             )
         )
 
-        json_convo_messages = [m.model_dump() for m in convo_messages]
+        json_convo_messages = encode_transcript(convo_messages)
 
         messages.append(
             Message(
@@ -351,12 +523,22 @@ class SceneNpcConvoCoupler(ConvoCoupler):
             )
         )
 
-        response = call_api_function(messages, function)
+        response = call_api_function(messages, schema.function_dump)
 
         self.knowledge_selection_token_used += response.usage.total_tokens
+        self.write_journal(
+            {
+                "type": "chatcmpl",
+                "kind": CallKind.KNOWLEDGE,
+                "usage": response.usage.model_dump(),
+            }
+        )
 
         # Parse the arguments
-        if response.choices[0].message.function_call.name != function.name:
+        if (
+            response.choices[0].message.function_call.name
+            != schema.FUNCTION_NAME
+        ):
             self.logger.warning("Function is not called.")
             return ""
 
@@ -366,6 +548,4 @@ class SceneNpcConvoCoupler(ConvoCoupler):
         self.logger.info(f"Arguments parsed: {arguments}")
 
         # Get the knowledge
-        return " ".join(
-            k.knowledge for k in self.npc.knowledges if arguments[k.name]
-        )
+        return schema.select(arguments)
@@ -7,6 +7,7 @@ from engine.convo import BaseConvoCoupler
 from engine.scene import BaseSceneCoupler
 
 from ..adventure import Adventure
+from ..journal import Journal, JournalRecord
 from .convo import SceneNpcConvoCoupler
 
 
@@ -15,16 +16,18 @@ class SceneCoupler(BaseSceneCoupler):
 
     logger: logging.Logger
     npcs: List[Tuple[Adventure, SceneNpc]]
+    journal: Optional[Journal]
 
     @property
     def token_used(self) -> int:
         """Gets the number of tokens used for all NPC in the scene"""
         return sum(adv[0].convo_coupler.token_used for adv in self.npcs)
 
-    def __init__(self):
+    def __init__(self, journal: Optional[Journal] = None):
         self.logger = logging.getLogger(__name__)
         self.logger.setLevel(adventure_config.log_level)
         self.npcs = []
+        self.journal = journal
 
     def get_npc_user_flow(self, index: int) -> Optional[BaseConvoCoupler]:
         """
@@ -61,6 +64,43 @@ class SceneCoupler(BaseSceneCoupler):
         """
         return [adv[1] for adv in self.npcs]
 
+    def restore_journal(self, journal: Journal) -> int:
+        """
+        Restores the conversations of the NPCs from a session journal.
+
+        Args:
+            journal: The session journal
+
+        Returns:
+            The number of records restored
+        """
+        couplers = {npc.id: adv.convo_coupler for adv, npc in self.npcs}
+
+        count = 0
+        for record in journal.read():
+            coupler = couplers.get(record["convo"])
+            if coupler is None:
+                self.logger.warning(f"Unknown NPC {record['convo']}")
+                continue
+
+            coupler.restore_record(record)
+            count += 1
+
+        return count
+
+    def get_snapshot_records(self) -> List[JournalRecord]:
+        """
+        Gets the records restoring the current state of all NPCs.
+
+        Returns:
+            The records
+        """
+        return [
+            record
+            for adv, _ in self.npcs
+            for record in adv.convo_coupler.get_snapshot_records()
+        ]
+
     def __parse_npc_to_adventure(
         self, scene: Scene, npc: SceneNpc
     ) -> Adventure:
@@ -69,5 +109,6 @@ class SceneCoupler(BaseSceneCoupler):
             convo_coupler=SceneNpcConvoCoupler(
                 scene.system_message,
                 npc,
+                self.journal,
             )
         )
@@ -0,0 +1,184 @@
+import json
+import os
+import time
+from collections import deque
+from typing import Deque, Iterator, List, Optional
+
+from config.standalone import standalone_config
+from engine.models import FunctionCall, Message, Role, Usage
+
+SESSION: str = time.strftime("%Y%m%d-%H%M%S")
+
+
+class HistoryRecord:
+    """A compact record of a message in the history"""
+
+    __slots__ = ("role", "content", "name", "function_call")
+
+    role: Role
+    content: Optional[str]
+    name: Optional[str]
+    function_call: Optional[FunctionCall]
+
+    def __init__(self, message: Message):
+        self.role = message.role
+        self.content = message.content
+        self.name = message.name
+        self.function_call = message.function_call
+
+    def to_message(self) -> Message:
+        """
+        Convert the record back to a message
+
+        Returns:
+            A new message, so the caller may modify it
+        """
+        return Message(
+            role=self.role,
+            content=self.content,
+            name=self.name,
+            function_call=self.function_call,
+        )
+
+
+class ConvoHistory:
+    """
+    Message history keeping only a fixed-size window of messages in memory
+
+    Messages older than the window are appended to a log on disk if a spill
+    path is given, and dropped otherwise. The token usage is kept as running
+    counters instead of the chat completions.
+    """
+
+    window: Deque[HistoryRecord]
+    window_size: int
+    spill_path: Optional[str]
+    length: int
+    prompt_tokens: int
+    completion_tokens: int
+    total_tokens: int
+
+    def __init__(self, window_size: int, spill_path: Optional[str] = None):
+        self.window = deque()
+        self.window_size = window_size
+        self.spill_path = spill_path
+        self.length = 0
+        self.prompt_tokens = 0
+        self.completion_tokens = 0
+        self.total_tokens = 0
+
+        if spill_path is not None:
+            os.makedirs(os.path.dirname(spill_path) or ".", exist_ok=True)
+
+    def __len__(self) -> int:
+        """Get the number of messages ever appended"""
+        return self.length
+
+    def append(self, message: Message):
+        """
+        Append a message, spilling the oldest one if the window is full
+
+        Args:
+            message: The message
+        """
+        if len(self.window) == self.window_size:
+            self.spill(self.window.popleft())
+
+        self.window.append(HistoryRecord(message))
+        self.length += 1
+
+    def skip(self, count: int):
+        """
+        Count messages that are not kept, e.g. compacted from a journal
+
+        Args:
+            count: The number of messages
+        """
+        self.length += count
+
+    def add_usage(self, usage: Usage):
+        """
+        Add the token usage of a chat completion
+
+        Args:
+            usage: The usage
+        """
+        self.prompt_tokens += usage.prompt_tokens
+        self.completion_tokens += usage.completion_tokens
+        self.total_tokens += usage.total_tokens
+
+    def latest(self, n: int, start: int = 0) -> List[Message]:
+        """
+        Get the latest messages
+
+        Only the messages in the window are returned.
+
+        Args:
+            n: The maximum number of messages
+            start: The index of the first message that may be returned
+
+        Returns:
+            The messages in order
+        """
+        n = min(n, self.length - start, len(self.window))
+        if n <= 0:
+            return []
+
+        # Iterate from the newest end, so only n records are visited
+        records = []
+        for record in reversed(self.window):
+            if len(records) == n:
+                break
+            records.append(record)
+
+        return [record.to_message() for record in reversed(records)]
+
+    def spill(self, record: HistoryRecord):
+        """
+        Append a record evicted from the window to the log on disk
+
+        Args:
+            record: The record
+        """
+        if self.spill_path is None:
+            return
+
+        with open(self.spill_path, "a", encoding="utf-8") as f:
+            f.write(
+                json.dumps(
+                    record.to_message().model_dump(), ensure_ascii=False
+                )
+                + "\n"
+            )
+
+    def read_spilled(self) -> Iterator[Message]:
+        """
+        Read the messages spilled to disk
+
+        Yields:
+            The spilled messages in order
+        """
+        if self.spill_path is None or not os.path.exists(self.spill_path):
+            return
+
+        with open(self.spill_path, encoding="utf-8") as f:
+            for line in f:
+                yield Message.model_validate(json.loads(line))
+
+
+def get_spill_path(name: str) -> Optional[str]:
+    """
+    Get the path of the history log of a conversation in this session
+
+    Args:
+        name: The name of the conversation
+
+    Returns:
+        The path, or None if spilling to disk is disabled
+    """
+    if standalone_config.history_directory is None:
+        return None
+
+    return os.path.join(
+        standalone_config.history_directory, f"{SESSION}-{name}.jsonl"
+    )
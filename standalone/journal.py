@@ -0,0 +1,151 @@
+import json
+import logging
+import mmap
+import os
+import threading
+from typing import IO, Any, Dict, Iterable, Iterator, Optional
+
+from config.standalone import standalone_config
+
+JournalRecord = Dict[str, Any]
+
+
+class Journal:
+    """
+    Append-only journal of the conversations of a standalone session
+
+    Each message, summary and chat completion usage is appended as a JSON
+    line tagged with the name of its conversation. The lines are flushed on
+    write and synced to disk every `sync_every` records, so a crash loses
+    no records and a power loss at most a batch.
+    """
+
+    logger: logging.Logger
+    path: str
+    sync_every: int
+    file: Optional[IO[str]]
+    pending: int
+    lock: threading.Lock
+
+    def __init__(self, path: str, sync_every: Optional[int] = None):
+        self.logger = logging.getLogger(__name__)
+        self.logger.setLevel(standalone_config.log_level)
+
+        self.path = path
+        self.sync_every = sync_every or standalone_config.journal_sync_every
+        self.file = None
+        self.pending = 0
+        # Broadcast turns of several NPCs write concurrently
+        self.lock = threading.Lock()
+
+    def open(self, truncate: bool = False):
+        """
+        Open the journal for appending
+
+        Args:
+            truncate: Whether to discard the existing records
+        """
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        if not truncate:
+            self.__truncate_partial_record()
+        self.file = open(self.path, "w" if truncate else "a", encoding="utf-8")
+
+    def write(self, record: JournalRecord):
+        """
+        Append a record
+
+        Args:
+            record: The record
+        """
+        if self.file is None:
+            return
+
+        line = json.dumps(record, ensure_ascii=False) + "\n"
+        with self.lock:
+            self.file.write(line)
+            self.file.flush()
+            self.pending += 1
+            if self.pending >= self.sync_every:
+                self.__sync()
+
+    def sync(self):
+        """Sync the records written to disk"""
+        with self.lock:
+            self.__sync()
+
+    def close(self):
+        """Sync and close the journal"""
+        if self.file is None:
+            return
+
+        self.sync()
+        self.file.close()
+        self.file = None
+
+    def read(self) -> Iterator[JournalRecord]:
+        """
+        Read the records by memory-mapping the journal
+
+        A partially written last line, left by a crash, is skipped.
+
+        Yields:
+            The records in order
+        """
+        if not os.path.exists(self.path) or os.path.getsize(self.path) == 0:
+            return
+
+        with open(self.path, "rb") as f, mmap.mmap(
+            f.fileno(), 0, access=mmap.ACCESS_READ
+        ) as m:
+            for line in iter(m.readline, b""):
+                if not line.endswith(b"\n"):
+                    self.logger.warning("Skipping a partially written record")
+                    break
+                yield json.loads(line)
+
+    def compact(self, records: Iterable[JournalRecord]):
+        """
+        Replace the records of the journal
+
+        The records are written to a temporary file first, so the journal is
+        never left partially compacted.
+
+        Args:
+            records: The records replacing the journal
+        """
+        reopen = self.file is not None
+        self.close()
+
+        count = 0
+        with open(f"{self.path}.tmp", "w", encoding="utf-8") as f:
+            for record in records:
+                f.write(json.dumps(record, ensure_ascii=False) + "\n")
+                count += 1
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(f"{self.path}.tmp", self.path)
+
+        self.logger.info(f"Journal compacted to {count} records")
+
+        if reopen:
+            self.open()
+
+    def __truncate_partial_record(self):
+        """Remove a partially written last line, left by a crash"""
+        if not os.path.exists(self.path) or os.path.getsize(self.path) == 0:
+            return
+
+        with open(self.path, "r+b") as f:
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as m:
+                size = len(m)
+                end = m.rfind(b"\n") + 1
+            if end < size:
+                f.truncate(end)
+
+    def __sync(self):
+        """Sync the records written to disk, holding the lock"""
+        if self.file is None or self.pending == 0:
+            return
+
+        os.fsync(self.file.fileno())
+        self.pending = 0
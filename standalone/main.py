@@ -1,7 +1,10 @@
+import argparse
 import logging
 
+from config.standalone import standalone_config
 from utils import formatter
 
+from .journal import Journal
 from .scene_runner import SceneRunner
 
 logging.basicConfig()
@@ -16,7 +19,34 @@ def main():
     """Main entry point"""
     from data.scene.power_plant import scene as scene_data
 
-    scene = SceneRunner(scene_data)
+    parser = argparse.ArgumentParser()
+    parser.add_argument(
+        "--journal",
+        type=str,
+        default=standalone_config.journal_path,
+        help="Session journal to record the conversations in.",
+    )
+    parser.add_argument(
+        "--resume",
+        action="store_true",
+        help="Resume the session recorded in the journal.",
+    )
+    parser.add_argument(
+        "--compact",
+        action="store_true",
+        help="Compact the journal to the live history before running.",
+    )
+    args = parser.parse_args()
+
+    if (args.resume or args.compact) and args.journal is None:
+        parser.error("--resume and --compact require a journal")
+
+    scene = SceneRunner(
+        scene_data,
+        journal=Journal(args.journal) if args.journal else None,
+        resume=args.resume or args.compact,
+        compact=args.compact,
+    )
     scene.run()
 
 
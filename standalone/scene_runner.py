@@ -1,12 +1,17 @@
 import logging
+import time
 import traceback
+from typing import Optional
 
 from config.adventure import adventure_config
 from data.scene import Scene as SceneData
+from engine.convo import summary_policy
+from engine.models import Message, Role
 from engine.scene import Scene
 from standalone.adventure import Adventure
 
 from .couplers.scene import SceneCoupler
+from .journal import Journal
 
 
 class SceneRunner:
@@ -15,12 +20,25 @@ class SceneRunner:
     logger: logging.Logger
     scene_coupler: SceneCoupler
     scene: Scene
-
-    def __init__(self, scene_data: SceneData):
+    journal: Optional[Journal]
+    resume: bool
+    compact: bool
+
+    def __init__(
+        self,
+        scene_data: SceneData,
+        journal: Optional[Journal] = None,
+        resume: bool = False,
+        compact: bool = False,
+    ):
         self.logger = logging.getLogger(__name__)
         self.logger.setLevel(adventure_config.log_level)
 
-        self.scene_coupler = SceneCoupler()
+        self.journal = journal
+        self.resume = resume
+        self.compact = compact
+
+        self.scene_coupler = SceneCoupler(journal)
         self.scene = Scene(self.scene_coupler, scene_data)
 
         self.logger.info("SceneRunner created.")
@@ -30,18 +48,44 @@ class SceneRunner:
         self.logger.info("Scene started.")
         self.init_scene_runner()
 
-        while self.user_flow():
-            pass
+        try:
+            while self.user_flow():
+                pass
+        finally:
+            if self.journal is not None:
+                self.journal.close()
 
         self.logger.info("Scene ended.")
         print(f"Used {self.scene_coupler.token_used} tokens")
+        print(f"Summary policy: {summary_policy.stats()}")
 
     def init_scene_runner(self):
         """Initializes the SceneRunner."""
         self.logger.info("Initializing scene runner.")
         self.scene.init_scene()
+
+        if self.journal is not None:
+            if self.resume:
+                self.resume_session()
+            if self.compact:
+                self.compact_journal()
+            self.journal.open(truncate=not self.resume)
+
         self.logger.info("Scene runner initialized.")
 
+    def resume_session(self):
+        """Restores the conversations of the NPCs from the journal."""
+        start = time.perf_counter()
+        count = self.scene_coupler.restore_journal(self.journal)
+        print(
+            f"Resumed {count} journal records in"
+            f" {(time.perf_counter() - start) * 1000:.1f} ms"
+        )
+
+    def compact_journal(self):
+        """Rewrites the journal to the current state of the NPCs."""
+        self.journal.compact(self.scene_coupler.get_snapshot_records())
+
     def user_flow(self) -> bool:
         """
         Runs a round of user input.
@@ -49,13 +93,21 @@ class SceneRunner:
         Returns:
             True if the user requests exiting, False otherwise.
         """
-        print("Type the index of the NPC you want to talk to, or 0 to exit.")
+        print(
+            "Type the index of the NPC you want to talk to, b to talk to"
+            " several NPCs at once, or 0 to exit."
+        )
         for i, npc in enumerate(self.scene_coupler.get_npcs()):
             print(f"{i + 1}. {npc.name:<10} - {npc.title}")
+        print("b. Broadcast")
         print("0. Exit")
         user_input = self.get_user_input()
 
         try:
+            if user_input.strip().lower() == "b":
+                self.broadcast_flow()
+                return True
+
             index = int(user_input) - 1
             convo_coupler = self.scene.process_user_selection(index)
             if convo_coupler is None:
@@ -69,6 +121,31 @@ class SceneRunner:
 
         return True
 
+    def broadcast_flow(self):
+        """Runs a round of user input to several NPCs at once."""
+        npcs = self.scene_coupler.get_npcs()
+
+        print("Type the indices of the NPCs separated by spaces, or all.")
+        user_input = self.get_user_input().strip().lower()
+        if user_input in ("", "all"):
+            indices = list(range(len(npcs)))
+        else:
+            indices = sorted({int(i) - 1 for i in user_input.split()})
+            if any(i < 0 or i >= len(npcs) for i in indices):
+                raise ValueError(f"Invalid NPC indices {user_input}")
+
+        user_message = Message(role=Role.USER, content=input("> "))
+        for turn in self.scene.broadcast(indices, user_message):
+            npc = npcs[turn.index]
+            if turn.error is not None:
+                print(f"{npc.name}: Error: {turn.error}")
+                continue
+            if turn.api_response is None:
+                continue
+            if turn.summary is not None:
+                print(f"{npc.name} summary: {turn.summary.content}")
+            print(f"{npc.name}: {turn.api_response.content}")
+
     def get_user_input(self) -> str:
         """Get user input"""
         return input("Scene > ")
@@ -13,6 +13,7 @@ https://docs.djangoproject.com/en/4.2/ref/settings/
 from datetime import timedelta
 from pathlib import Path
 
+from config.cache import cache_config
 from config.db import db_config
 from config.django import django_config
 from utils import formatter
@@ -52,6 +53,8 @@ MIDDLEWARE = [
     "django.middleware.clickjacking.XFrameOptionsMiddleware",
     "corsheaders.middleware.CorsMiddleware",
     "core.middlewares.RequestLogMiddleware",
+    "core.middlewares.QueryBudgetMiddleware",
+    "core.middlewares.ProfileMiddleware",
 ]
 
 CORS_ORIGIN_WHITELIST = ["http://localhost:3000"]
@@ -85,6 +88,14 @@ DATABASES = {
 }
 
 
+# Cache
+# https://docs.djangoproject.com/en/4.2/topics/cache/
+
+CACHES = {
+    "default": cache_config.to_settings(),
+}
+
+
 # Password validation
 # https://docs.djangoproject.com/en/4.2/ref/settings/#auth-password-validators
 